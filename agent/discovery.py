@@ -0,0 +1,129 @@
+"""Helpers of the discovery stages run before the full scans.
+
+The host discovery sweep (-sn) finds the live hosts of a range, so only those are port scanned.
+
+The two-phase scan runs a fast open-port discovery followed by a targeted enumeration. Hosts sharing the same open
+ports are grouped so each group is enumerated (-sV, -O, NSE scripts) by a single nmap run restricted to those ports, and
+the number of groups of a batch is capped.
+"""
+
+import dataclasses
+import itertools
+from typing import Dict, List, Tuple
+
+from agent import models
+
+OPEN_STATE = "open"
+UP_STATE = "up"
+# Enumeration runs of a batch, the hosts beyond are enumerated together on the union of their open ports.
+MAX_ENUMERATION_GROUPS = 4
+PROTOCOL_PREFIXES = {"tcp": "T", "udp": "U", "sctp": "S"}
+
+
+@dataclasses.dataclass
+class EnumerationGroup:
+    """Hosts enumerated together, on the ports found open on them, e.g. `T:80` or `U:53`."""
+
+    addresses: List[str]
+    ports: List[str]
+
+    @property
+    def port_spec(self) -> str:
+        """Ports in the syntax of the nmap `-p` option, e.g. `T:22,80,U:53`."""
+        specs = []
+        for prefix, ports in itertools.groupby(
+            self.ports, key=lambda port: port.partition(":")[0]
+        ):
+            numbers = ",".join(port.partition(":")[2] for port in ports)
+            specs.append(f"{prefix}:{numbers}")
+        return ",".join(specs)
+
+
+def live_hosts(scan_result: models.ScanResult) -> List[str]:
+    """Addresses of the hosts reported up by a host discovery sweep.
+
+    Args:
+        scan_result: result of the host discovery sweep.
+
+    Returns:
+        addresses of the live hosts, in the order reported by nmap.
+    """
+    return [
+        host.address
+        for host in scan_result.hosts
+        if host.address is not None and host.state == UP_STATE
+    ]
+
+
+def enumeration_groups(
+    scan_result: models.ScanResult, max_groups: int = MAX_ENUMERATION_GROUPS
+) -> List[EnumerationGroup]:
+    """Group the hosts of a discovery scan by their set of open ports.
+
+    On ranges where hosts have different open ports, every host would be enumerated by its own nmap run. The largest
+    groups are kept and the hosts beyond `max_groups` groups are enumerated together, on the union of their ports.
+
+    Args:
+        scan_result: result of the discovery scan.
+        max_groups: maximum number of groups, i.e. of enumeration runs.
+
+    Returns:
+        groups of hosts to enumerate, hosts without open ports are left out.
+    """
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for host in scan_result.hosts:
+        if host.address is None:
+            continue
+        ports = tuple(
+            sorted(
+                {_port(port) for port in host.ports if port.state == OPEN_STATE},
+                key=_port_order,
+            )
+        )
+        if len(ports) == 0:
+            continue
+        groups.setdefault(ports, []).append(host.address)
+
+    # Stable sort, groups of the same size keep the order in which nmap reported their first host.
+    by_size = sorted(groups.items(), key=lambda group: len(group[1]), reverse=True)
+    kept, merged = by_size[: max_groups - 1], by_size[max_groups - 1 :]
+    if len(merged) == 1:
+        kept, merged = by_size, []
+    enumeration = [
+        EnumerationGroup(addresses=addresses, ports=list(ports))
+        for ports, addresses in kept
+    ]
+    if len(merged) > 0:
+        enumeration.append(
+            EnumerationGroup(
+                addresses=[address for _, addresses in merged for address in addresses],
+                ports=sorted(
+                    {port for ports, _ in merged for port in ports}, key=_port_order
+                ),
+            )
+        )
+    return enumeration
+
+
+def _port(port: models.Port) -> str:
+    """Port prefixed with its protocol as in the nmap `-p` option, TCP when the protocol is unknown."""
+    return f"{PROTOCOL_PREFIXES.get(port.protocol or '', 'T')}:{port.port_id}"
+
+
+def _port_order(port: str) -> Tuple[str, int]:
+    prefix, _, number = port.partition(":")
+    return prefix, int(number)
+
+
+def merge_scan_results(scan_results: List[models.ScanResult]) -> models.ScanResult:
+    """Merge the results of several nmap runs into a single one.
+
+    Args:
+        scan_results: results of the runs.
+
+    Returns:
+        result holding the hosts of all the runs.
+    """
+    return models.ScanResult(
+        hosts=tuple(host for scan_result in scan_results for host in scan_result.hosts)
+    )
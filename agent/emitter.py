@@ -0,0 +1,184 @@
+"""Batching of the messages emitted by the agent for the services and fingerprints it finds.
+
+Messages go through a bounded queue to a sender thread, which sends them in batches: once `batch_size` messages are
+waiting, once the oldest one waited for `flush_interval` seconds, or when the caller flushes explicitly, e.g. before
+reporting the scan of the same hosts so the order of the messages on the bus is kept.
+
+When the bus is slower than the scans, the queue fills up and `emit` blocks until the sender thread catches up. The
+thread queueing the messages then stops consuming scan results, and the bounded buffers of the scheduler in turn pause
+the scan workers, instead of piling up messages in memory.
+"""
+
+import dataclasses
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 1000
+
+Send = Callable[[str, Dict[str, Any]], None]
+Message = Tuple[str, Dict[str, Any]]
+
+
+class _Flush:
+    """Marker asking the sender thread to send the messages queued before it."""
+
+
+class _Stop(_Flush):
+    """Marker asking the sender thread to send the messages queued before it and exit."""
+
+
+@dataclasses.dataclass
+class EmitterStats:
+    """Counters of the messages going through the emitter."""
+
+    queued: int = 0
+    sent: int = 0
+    failed: int = 0
+    batches: int = 0
+    send_seconds: float = 0.0
+    # Time spent by `emit` waiting for room in the queue, i.e. for the bus to catch up.
+    blocked_seconds: float = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self.queued - self.sent - self.failed
+
+
+class BatchingEmitter:
+    """Queues messages and sends them in batches from a sender thread.
+
+    Messages are sent in the order they were queued. The caller must flush before sending messages of its own, so the
+    bus is never used by two threads at the same time.
+
+    Usage:
+        emitter = emitter.BatchingEmitter(agent.emit)
+        for service in services:
+            emitter.emit("v3.asset.ip.v4.port.service", service)
+        emitter.flush()
+    """
+
+    def __init__(
+        self,
+        send: Send,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            send: function sending a single message to the bus.
+            batch_size: number of queued messages triggering a send.
+            flush_interval: seconds the oldest queued message waits before triggering a send.
+            max_pending: number of queued messages beyond which `emit` blocks until the sender thread catches up.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1, got {max_pending}")
+        self._send = send
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: queue.Queue[Message | _Flush] = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._error: Optional[Exception] = None
+        self.stats = EmitterStats()
+
+    def emit(self, selector: str, data: Dict[str, Any]) -> None:
+        """Queue a message, blocking while `max_pending` messages are waiting to be sent."""
+        self._start()
+        started_at = time.monotonic()
+        self._queue.put((selector, data))
+        with self._lock:
+            self.stats.queued += 1
+            self.stats.blocked_seconds += time.monotonic() - started_at
+
+    def flush(self) -> None:
+        """Send the queued messages and wait until they are sent.
+
+        Raises:
+            the first error raised by sending a message since the previous flush, the other messages are still sent.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_Flush())
+        self._queue.join()
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        """Send the queued messages and stop the sender thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_Stop())
+        self._thread.join()
+        self._thread = None
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="emitter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch, marker = self._next_batch()
+            self._send_batch(batch)
+            for _ in range(len(batch) + (marker is not None)):
+                self._queue.task_done()
+            if isinstance(marker, _Stop):
+                return
+
+    def _next_batch(self) -> Tuple[List[Message], Optional[_Flush]]:
+        """Wait for the next batch: `batch_size` messages, the messages received within `flush_interval` of the
+        first one, or the messages received before a flush."""
+        batch: List[Message] = []
+        deadline: Optional[float] = None
+        while len(batch) < self._batch_size:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if isinstance(item, _Flush):
+                return batch, item
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self._flush_interval
+        return batch, None
+
+    def _send_batch(self, batch: List[Message]) -> None:
+        if len(batch) == 0:
+            return
+        started_at = time.monotonic()
+        sent = failed = 0
+        for selector, data in batch:
+            try:
+                self._send(selector, data)
+                sent += 1
+            except Exception as e:  # noqa: BLE001
+                # The sender thread must survive a failed message, the error is raised by the next flush.
+                logger.exception("Could not send message of selector %s", selector)
+                failed += 1
+                with self._lock:
+                    self._error = self._error or e
+        with self._lock:
+            self.stats.sent += sent
+            self.stats.failed += failed
+            self.stats.batches += 1
+            self.stats.send_seconds += time.monotonic() - started_at
+        logger.debug("sent a batch of %s messages", len(batch))
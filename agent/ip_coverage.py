@@ -0,0 +1,191 @@
+"""Index of the IP space already scanned, used to only scan the parts of a range that were not scanned before.
+
+The index keeps the covered space as sorted and merged intervals of addresses: looking up a network is a binary
+search, and adjacent networks collapse into a single interval, so the index stays small on large contiguous ranges.
+"""
+
+import bisect
+import ipaddress
+import time
+from typing import Dict, Iterable, List, Optional, Protocol, Set, Tuple, Union
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+DEFAULT_FLUSH_SIZE = 256
+DEFAULT_REFRESH_INTERVAL = 300.0
+
+
+class CoverageIndex:
+    """Covered IP space as sorted, disjoint and non-adjacent intervals of addresses, one list per IP version.
+
+    Usage:
+        coverage = ip_coverage.CoverageIndex.from_members(persisted_networks)
+        for part in coverage.uncovered(network):
+            coverage.add(part)
+            scan(part)
+    """
+
+    def __init__(self) -> None:
+        # Half-open intervals [start, end) of integer addresses.
+        self._intervals: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+
+    @classmethod
+    def from_members(cls, members: Iterable[Union[bytes, str]]) -> "CoverageIndex":
+        """Index the networks of a persisted set, members that are not networks in CIDR notation are ignored.
+
+        Args:
+            members: members of the set, e.g. `10.0.0.0/24` or domain names.
+
+        Returns:
+            the index of the networks of the set.
+        """
+        coverage = cls()
+        for member in members:
+            if isinstance(member, bytes):
+                member = member.decode(errors="ignore")
+            try:
+                coverage.add(ipaddress.ip_network(member))
+            except ValueError:
+                continue
+        return coverage
+
+    def add(self, network: Network) -> None:
+        """Mark the addresses of a network as covered."""
+        intervals = self._intervals[network.version]
+        start = int(network.network_address)
+        end = int(network.broadcast_address) + 1
+        # First interval that may overlap or touch the new one.
+        index = bisect.bisect_left(intervals, (start, start))
+        if index > 0 and intervals[index - 1][1] >= start:
+            index -= 1
+        last = index
+        while last < len(intervals) and intervals[last][0] <= end:
+            start = min(start, intervals[last][0])
+            end = max(end, intervals[last][1])
+            last += 1
+        intervals[index:last] = [(start, end)]
+
+    def covers(self, network: Network) -> bool:
+        """Whether every address of the network is covered."""
+        return len(self.uncovered(network)) == 0
+
+    def uncovered(self, network: Network) -> List[Network]:
+        """Parts of the network not covered yet, as the fewest networks in CIDR notation.
+
+        Args:
+            network: network to subtract the covered space from.
+
+        Returns:
+            the uncovered networks, in address order. `[network]` if none of its addresses is covered.
+        """
+        intervals = self._intervals[network.version]
+        start = int(network.network_address)
+        end = int(network.broadcast_address) + 1
+        index = bisect.bisect_right(intervals, (start, start))
+        if index > 0 and intervals[index - 1][1] > start:
+            index -= 1
+
+        gaps: List[Tuple[int, int]] = []
+        cursor = start
+        while index < len(intervals) and intervals[index][0] < end:
+            covered_start, covered_end = intervals[index]
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+            index += 1
+        if cursor < end:
+            gaps.append((cursor, end))
+
+        if gaps == [(start, end)]:
+            return [network]
+        address_class = (
+            ipaddress.IPv4Address if network.version == 4 else ipaddress.IPv6Address
+        )
+        return [
+            part
+            for gap_start, gap_end in gaps
+            for part in ipaddress.summarize_address_range(
+                address_class(gap_start), address_class(gap_end - 1)
+            )
+        ]
+
+
+class Persist(Protocol):
+    """Set API of the agent persist backend."""
+
+    def set_add(self, key: Union[bytes, str], *value: Union[bytes, str]) -> bool: ...
+
+    def set_members(self, key: Union[bytes, str]) -> Set[bytes]: ...
+
+
+class CoverageStore:
+    """In memory coverage index of a persisted set of networks, synchronized with the set in batches.
+
+    Coverage checks only use the local index. Networks recorded locally are written behind, all at once when
+    `flush_size` networks are pending or when `flush` is called. The index is reloaded from the set every
+    `refresh_interval` seconds to pick up the networks recorded by other agent replicas.
+
+    Usage:
+        store = ip_coverage.CoverageStore(persist, b"agent_nmap_asset")
+        for part in store.index.uncovered(network):
+            store.record(part)
+        store.flush()
+    """
+
+    def __init__(
+        self,
+        persist: Persist,
+        key: bytes,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            persist: persist backend holding the set.
+            key: key of the set of networks.
+            flush_size: number of pending networks triggering a write to the set.
+            refresh_interval: seconds after which the index is reloaded from the set.
+        """
+        self._persist = persist
+        self._key = key
+        self._flush_size = flush_size
+        self._refresh_interval = refresh_interval
+        self._index: Optional[CoverageIndex] = None
+        self._loaded_at = 0.0
+        self._pending: List[str] = []
+
+    @property
+    def index(self) -> CoverageIndex:
+        """Local index, loaded from the set on first use and once it is older than the refresh interval."""
+        if (
+            self._index is None
+            or time.monotonic() - self._loaded_at >= self._refresh_interval
+        ):
+            # Pending networks are only known locally, they must reach the set before reloading from it.
+            self.flush()
+            self._index = CoverageIndex.from_members(
+                self._persist.set_members(self._key) or ()
+            )
+            self._loaded_at = time.monotonic()
+        return self._index
+
+    def record(self, network: Network) -> None:
+        """Mark a network as covered, it is written to the set with the next flush.
+
+        Networks already covered, e.g. a host of a scanned range, are not written again.
+        """
+        index = self.index
+        if index.covers(network) is True:
+            return
+        index.add(network)
+        self._pending.append(network.exploded)
+        if len(self._pending) >= self._flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending networks to the set in a single call."""
+        if len(self._pending) == 0:
+            return
+        self._persist.set_add(self._key, *self._pending)
+        self._pending = []
@@ -1,48 +1,130 @@
-"""Module responsible for markdown formatting."""
+"""Module responsible for rendering the scan results as markdown, CSV and JSON tables.
 
-from typing import Dict, List, Optional
+Tables are written row by row to a text stream, straight from the rows extracted from the scan result, so rendering
+never holds the whole table twice in memory. Markdown cells are not padded to a common width, which would require
+every row upfront: the rendered table is the same.
+"""
+
+import csv
 import io
+import json
+from typing import IO, Iterable, Iterator, List, Optional, Sequence
+
+from agent import models
+
+Row = Sequence[Optional[str | int]]
+
+TABLE_HEADERS = ["Host", "Version", "Port", "Protocol", "State", "Service"]
+# Columns holding numbers are right aligned.
+RIGHT_ALIGNED_HEADERS = {"Version", "Port"}
+# Two spaces before \n for a new line in markdown.
+MARKDOWN_LINE_END = "  \n"
 
-import pytablewriter
 
-from agent import generators
+def iter_rows(scan_result: models.ScanResult) -> Iterator[List[Optional[str | int]]]:
+    """Yield a row per port of the scan: the host, version, port, protocol, state, service, product, version, and
+    banner.
+
+    Args:
+        scan_result: Typed result of the nmap scan.
+    """
+    for host in scan_result.hosts:
+        for port in host.ports:
+            yield [
+                host.address,
+                host.version,
+                port.number,
+                port.protocol,
+                port.state,
+                port.service.name,
+                port.service.product,
+                port.service.version,
+                port.banner,
+            ]
 
 
 def prepare_data_for_markdown_formatting(
-    scans: Dict[
-        str, Dict[str, List[Dict[str, Dict[str, str]]] | Dict[str, Dict[str, str]]]
-    ],
-) -> List[List[Optional[str]]]:
-    """Method responsible for formatting the data into the correct form for the MarkdownTableWriter.
+    scan_result: models.ScanResult,
+) -> List[List[Optional[str | int]]]:
+    """Method responsible for formatting the data into the correct form for the markdown table.
     Args:
-        scans: Dictionary containing the scans, from the nmap scan response.
+        scan_result: Typed result of the nmap scan.
     Returns:
         data: List of lists, each containing the name of the host, port, version, protocol, state,
         and service of its scan.
     """
-    scan_data = []
-    if scans is not None:
-        for data in generators.get_services(scans):
-            row = list(data.values())
-            scan_data.append(row)
-    return scan_data
+    return list(iter_rows(scan_result))
 
 
-def table_markdown(data: List[List[Optional[str]]]) -> str:
-    """Method responsible for generating a markdown table from a dictionary.
+def _markdown_cell(value: Optional[str | int]) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("|", "\\|").replace("\r", " ").replace("\n", " ")
+
+
+def write_markdown_table(
+    rows: Iterable[Row], stream: IO[str], headers: Sequence[str] = TABLE_HEADERS
+) -> None:
+    """Write a markdown table, values beyond the headers are left out.
+
     Args:
-        data: List of the data to be transformed into markdown table.
-    Returns:
-        table: Complete markdown table
+        rows: rows of the table, consumed lazily.
+        stream: text stream receiving the table.
+        headers: headers of the table.
     """
-    headers = ["Host", "Version", "Port", "Protocol", "State", "Service"]
-    markdown_writer = pytablewriter.MarkdownTableWriter(
-        headers=headers, value_matrix=data
+    columns = len(headers)
+    stream.write(f"|{'|'.join(headers)}|{MARKDOWN_LINE_END}")
+    separators = (
+        "---:" if header in RIGHT_ALIGNED_HEADERS else "---" for header in headers
     )
-    markdown_writer.stream = io.StringIO()
-    markdown_writer.write_table()
-    table: str = markdown_writer.stream.getvalue()
-    # Two spaces \n for a new line  in markdown.
-    table = table.replace("\n", "  \n")
+    stream.write(f"|{'|'.join(separators)}|{MARKDOWN_LINE_END}")
+    for row in rows:
+        cells = "|".join(_markdown_cell(value) for value in row[:columns])
+        stream.write(f"|{cells}|{MARKDOWN_LINE_END}")
+
+
+def write_csv_table(
+    rows: Iterable[Row], stream: IO[str], headers: Sequence[str] = TABLE_HEADERS
+) -> None:
+    """Write a CSV table with a header line, values beyond the headers are left out.
 
-    return table
+    Args:
+        rows: rows of the table, consumed lazily.
+        stream: text stream receiving the table.
+        headers: headers of the table.
+    """
+    columns = len(headers)
+    writer = csv.writer(stream)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row[:columns])
+
+
+def write_json_table(
+    rows: Iterable[Row], stream: IO[str], headers: Sequence[str] = TABLE_HEADERS
+) -> None:
+    """Write a JSON array holding an object per row, keyed by the headers.
+
+    Args:
+        rows: rows of the table, consumed lazily.
+        stream: text stream receiving the table.
+        headers: headers of the table.
+    """
+    stream.write("[")
+    for index, row in enumerate(rows):
+        if index > 0:
+            stream.write(", ")
+        stream.write(json.dumps(dict(zip(headers, row))))
+    stream.write("]")
+
+
+def table_markdown(data: Iterable[Row]) -> str:
+    """Method responsible for generating a markdown table from rows.
+    Args:
+        data: rows to be transformed into markdown table.
+    Returns:
+        table: Complete markdown table
+    """
+    stream = io.StringIO()
+    write_markdown_table(data, stream)
+    return stream.getvalue()
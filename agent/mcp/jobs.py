@@ -0,0 +1,284 @@
+"""Queue of the scan jobs submitted to the MCP server.
+
+Jobs run as asyncio tasks on the server event loop, at most `max_concurrent_scans` at a time, so submitting a scan
+returns right away and the server keeps answering other clients while nmap runs. At most `max_pending_scans` jobs
+wait for their turn, further submissions are rejected until the backlog drains.
+"""
+
+import asyncio
+import collections
+import dataclasses
+import enum
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Mapping, Optional
+
+from agent.mcp import mcp_types
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_SCANS = 4
+MAX_CONCURRENT_SCANS_ENVIRONMENT_VARIABLE = "NMAP_MCP_MAX_CONCURRENT_SCANS"
+MAX_PENDING_SCANS = 64
+MAX_PENDING_SCANS_ENVIRONMENT_VARIABLE = "NMAP_MCP_MAX_PENDING_SCANS"
+# Finished jobs kept for polling, the oldest ones are forgotten first.
+MAX_FINISHED_JOBS = 256
+
+ProgressCallback = Callable[[float], None]
+ScanFunction = Callable[
+    [str, ProgressCallback], Awaitable[list[mcp_types.ServiceResult]]
+]
+
+
+class Error(Exception):
+    """Base exception for scan jobs."""
+
+
+class JobNotFoundError(Error):
+    """Error when no job matches the requested identifier."""
+
+
+class JobNotCompletedError(Error):
+    """Error when requesting the results of a job that did not complete."""
+
+
+class QueueFullError(Error):
+    """Error when submitting a job while `max_pending_scans` jobs are already waiting to run."""
+
+
+class JobStatus(enum.Enum):
+    """Lifecycle of a scan job."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+@dataclasses.dataclass
+class ScanJob:
+    """Scan of a single target, from submission to results."""
+
+    job_id: str
+    target: str
+    status: JobStatus = JobStatus.PENDING
+    progress: Optional[float] = None
+    results: Optional[list[mcp_types.ServiceResult]] = None
+    error: Optional[BaseException] = None
+    submitted_at: float = dataclasses.field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    task: Optional["asyncio.Task[None]"] = dataclasses.field(default=None, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def info(self) -> mcp_types.ScanJobInfo:
+        """Public view of the job returned to MCP clients."""
+        return mcp_types.ScanJobInfo(
+            job_id=self.job_id,
+            target=self.target,
+            status=self.status.value,
+            progress=self.progress,
+            error=str(self.error) if self.error is not None else None,
+            submitted_at=self.submitted_at,
+            finished_at=self.finished_at,
+        )
+
+
+class ScanJobQueue:
+    """Runs submitted scans with bounded concurrency and keeps their state for polling.
+
+    Usage:
+        queue = jobs.ScanJobQueue(scan=scan_target)
+        job = queue.submit("10.0.0.1")
+        ...
+        results = queue.get(job.job_id).results
+    """
+
+    def __init__(
+        self,
+        scan: ScanFunction,
+        max_concurrent_scans: int = MAX_CONCURRENT_SCANS,
+        max_finished_jobs: int = MAX_FINISHED_JOBS,
+        max_pending_scans: int = MAX_PENDING_SCANS,
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            scan: coroutine function scanning a target and reporting its progress.
+            max_concurrent_scans: maximum number of scans running at the same time.
+            max_finished_jobs: number of finished jobs kept for polling.
+            max_pending_scans: maximum number of submitted scans waiting for a free slot.
+        """
+        if max_concurrent_scans < 1:
+            raise ValueError(
+                f"max_concurrent_scans must be at least 1, got {max_concurrent_scans}"
+            )
+        if max_pending_scans < 0:
+            raise ValueError(
+                f"max_pending_scans must be at least 0, got {max_pending_scans}"
+            )
+        self._scan = scan
+        self._max_concurrent_scans = max_concurrent_scans
+        self._max_pending_scans = max_pending_scans
+        self._max_finished_jobs = max_finished_jobs
+        self._semaphore = asyncio.Semaphore(max_concurrent_scans)
+        self._jobs: collections.OrderedDict[str, ScanJob] = collections.OrderedDict()
+
+    def submit(self, target: str) -> ScanJob:
+        """Queue the scan of a target, must be called from the event loop running the scans.
+
+        Args:
+            target: IP address, network or domain name to scan.
+
+        Returns:
+            the pending job.
+
+        Raises:
+            QueueFullError: when `max_pending_scans` jobs are already waiting to run.
+        """
+        unfinished_count = sum(
+            1 for job in self._jobs.values() if job.is_finished is False
+        )
+        # Up to `max_concurrent_scans` of the unfinished jobs are running, or about to run.
+        if unfinished_count >= self._max_concurrent_scans + self._max_pending_scans:
+            raise QueueFullError(
+                f"Scan of `{target}` rejected, {self._max_pending_scans} scans are already waiting to run. "
+                "Retry once some of them completed."
+            )
+        job = ScanJob(job_id=uuid.uuid4().hex, target=target)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        self._forget_finished_jobs()
+        return job
+
+    def add_completed(
+        self, target: str, results: list[mcp_types.ServiceResult]
+    ) -> ScanJob:
+        """Record a job completed without running a scan, e.g. when its results are served from a cache.
+
+        Args:
+            target: IP address, network or domain name of the results.
+            results: services found on the target.
+
+        Returns:
+            the completed job.
+        """
+        job = ScanJob(
+            job_id=uuid.uuid4().hex,
+            target=target,
+            status=JobStatus.COMPLETED,
+            results=results,
+        )
+        job.finished_at = job.submitted_at
+        self._jobs[job.job_id] = job
+        self._forget_finished_jobs()
+        return job
+
+    def get(self, job_id: str) -> ScanJob:
+        """Job matching the identifier.
+
+        Raises:
+            JobNotFoundError: when the job is unknown or was forgotten.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFoundError(f"Scan job `{job_id}` not found.")
+        return job
+
+    def results(self, job_id: str) -> list[mcp_types.ServiceResult]:
+        """Results of a completed job.
+
+        Raises:
+            JobNotFoundError: when the job is unknown or was forgotten.
+            JobNotCompletedError: when the job is still running, failed or was cancelled.
+        """
+        job = self.get(job_id)
+        if job.status is not JobStatus.COMPLETED or job.results is None:
+            raise JobNotCompletedError(
+                f"Scan job `{job_id}` is {job.status.value}, results are not available."
+            )
+        return job.results
+
+    def cancel(self, job_id: str) -> ScanJob:
+        """Cancel a pending or running job, stopping its nmap process. Finished jobs are left untouched.
+
+        Raises:
+            JobNotFoundError: when the job is unknown or was forgotten.
+        """
+        job = self.get(job_id)
+        if job.is_finished is False and job.task is not None:
+            job.task.cancel()
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.time()
+        return job
+
+    async def wait(self, job_id: str) -> list[mcp_types.ServiceResult]:
+        """Wait for a job to finish and return its results.
+
+        Raises:
+            JobNotFoundError: when the job is unknown or was forgotten.
+            JobNotCompletedError: when the job was cancelled.
+            any error raised by the scan of the job.
+        """
+        job = self.get(job_id)
+        if job.task is not None:
+            await asyncio.wait([job.task])
+        if job.status is JobStatus.FAILED and job.error is not None:
+            raise job.error
+        return self.results(job_id)
+
+    async def _run(self, job: ScanJob) -> None:
+        async with self._semaphore:
+            job.status = JobStatus.RUNNING
+            logger.info("running scan job %s on %s", job.job_id, job.target)
+
+            def _report_progress(progress: float) -> None:
+                job.progress = progress
+
+            try:
+                job.results = await self._scan(job.target, _report_progress)
+                job.status = JobStatus.COMPLETED
+            except asyncio.CancelledError:
+                job.status = JobStatus.CANCELLED
+                raise
+            except Exception as e:  # noqa: BLE001
+                # Any error of the scan fails its job only, the client gets it when polling and the queue goes on.
+                logger.exception("scan job %s on %s failed", job.job_id, job.target)
+                job.status = JobStatus.FAILED
+                job.error = e
+            finally:
+                job.finished_at = job.finished_at or time.time()
+
+    def _forget_finished_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[: max(0, len(finished) - self._max_finished_jobs)]:
+            del self._jobs[job_id]
+
+
+def from_environment(
+    scan: ScanFunction, environment: Mapping[str, str]
+) -> ScanJobQueue:
+    """Queue configured by the `NMAP_MCP_MAX_*_SCANS` variables of `environment`, defaults are used for the unset ones.
+
+    Args:
+        scan: coroutine function scanning a target and reporting its progress.
+        environment: environment variables, usually `os.environ`.
+    """
+    return ScanJobQueue(
+        scan=scan,
+        max_concurrent_scans=int(
+            environment.get(
+                MAX_CONCURRENT_SCANS_ENVIRONMENT_VARIABLE, MAX_CONCURRENT_SCANS
+            )
+        ),
+        max_pending_scans=int(
+            environment.get(MAX_PENDING_SCANS_ENVIRONMENT_VARIABLE, MAX_PENDING_SCANS)
+        ),
+    )
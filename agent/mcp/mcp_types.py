@@ -53,3 +53,26 @@ class ServiceResult:
     banner: str
     version: str
     fingerprints: list[FingerprintResult] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class ScanJobInfo:
+    """State of a scan job submitted to the MCP server.
+
+    Attributes:
+        job_id: The identifier of the job.
+        target: The IP address, network or domain name being scanned.
+        status: The job status (pending, running, completed, failed, cancelled).
+        progress: The progress of the running nmap task in percent, if reported.
+        error: The reason of the failure of the job, if it failed.
+        submitted_at: The time the job was submitted, as a UNIX timestamp.
+        finished_at: The time the job finished, as a UNIX timestamp.
+    """
+
+    job_id: str
+    target: str
+    status: str
+    progress: float | None = None
+    error: str | None = None
+    submitted_at: float | None = None
+    finished_at: float | None = None
@@ -0,0 +1,194 @@
+"""Cache of the services found by the MCP scans.
+
+Results are keyed by the scanned target and the fingerprint of the nmap options, kept for a freshness window and
+evicted least recently used first. Scans that found no service are only kept for a short window, so a target that was
+down or filtered is scanned again soon. The cache can be persisted to a JSON file to survive server restarts.
+
+The MCP server runs in its own process, the agent configures its cache through the `NMAP_MCP_CACHE_*` environment
+variables.
+"""
+
+import collections
+import copy
+import dataclasses
+import ipaddress
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+from agent import nmap_options
+from agent.mcp import mcp_types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+# Freshness window of the scans that found no service.
+DEFAULT_EMPTY_TTL = 60
+DEFAULT_MAX_ENTRIES = 256
+TTL_ENVIRONMENT_VARIABLE = "NMAP_MCP_CACHE_TTL"
+MAX_ENTRIES_ENVIRONMENT_VARIABLE = "NMAP_MCP_CACHE_MAX_ENTRIES"
+PATH_ENVIRONMENT_VARIABLE = "NMAP_MCP_CACHE_PATH"
+
+
+@dataclasses.dataclass
+class _Entry:
+    results: list[mcp_types.ServiceResult]
+    stored_at: float
+
+
+def cache_key(target: str, options: nmap_options.NmapOptions) -> str:
+    """Key of the results of scanning `target` with `options`.
+
+    Targets are normalized, so `10.0.0.1` and `10.0.0.1/32` or `Example.com` and `example.com` share their results.
+    """
+    return f"{_normalize_target(target)}|{options.fingerprint()}"
+
+
+def _normalize_target(target: str) -> str:
+    target = target.strip()
+    try:
+        return str(ipaddress.ip_network(target, strict=False))
+    except ValueError:
+        return target.lower()
+
+
+class ResultCache:
+    """Thread-safe LRU cache of scan results with a freshness window.
+
+    Writing the persisted cache blocks, callers on an event loop run `put` and `clear` in a thread.
+
+    Usage:
+        cache = result_cache.ResultCache(ttl=600)
+        key = result_cache.cache_key(target, options)
+        results = cache.get(key)
+        if results is None:
+            results = await scan(target)
+            cache.put(key, results)
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        path: Optional[str] = None,
+        empty_ttl: float = DEFAULT_EMPTY_TTL,
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            ttl: seconds the results of a scan are served from the cache.
+            max_entries: maximum number of cached scans.
+            path: JSON file persisting the cache, the cache is kept in memory only if None.
+            empty_ttl: seconds the results of a scan that found no service are served from the cache.
+        """
+        self._ttl = ttl
+        self._empty_ttl = min(empty_ttl, ttl)
+        self._max_entries = max_entries
+        self._path = path
+        self._entries: collections.OrderedDict[str, _Entry] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Held from the snapshot of the entries to the end of the write, so files are written in the order of changes.
+        self._save_lock = threading.Lock()
+        if self._path is not None:
+            self._load(self._path)
+
+    def get(self, key: str) -> Optional[list[mcp_types.ServiceResult]]:
+        """Fresh results stored under `key`, None if there are none."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            ttl = self._ttl if len(entry.results) > 0 else self._empty_ttl
+            if time.time() - entry.stored_at >= ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            results = entry.results
+        # Callers own the returned results, mutating them must not alter the cache.
+        return copy.deepcopy(results)
+
+    def put(self, key: str, results: list[mcp_types.ServiceResult]) -> None:
+        """Store a copy of the results of a scan, evicting the least recently used ones beyond `max_entries`."""
+        entry = _Entry(results=copy.deepcopy(results), stored_at=time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        if self._path is not None:
+            self._save(self._path)
+
+    def clear(self) -> None:
+        """Drop all the cached results."""
+        with self._lock:
+            self._entries.clear()
+        if self._path is not None:
+            self._save(self._path)
+
+    def _load(self, path: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as o:
+                entries = json.load(o)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable scan results cache %s: %s", path, e)
+            return
+
+        for key, entry in entries.items():
+            self._entries[key] = _Entry(
+                results=[_service_from_dict(service) for service in entry["results"]],
+                stored_at=entry["stored_at"],
+            )
+
+    def _save(self, path: str) -> None:
+        with self._save_lock:
+            with self._lock:
+                snapshot = list(self._entries.items())
+            # Cached results are never mutated, they are serialized outside of the lock.
+            entries = {
+                key: {
+                    "results": [
+                        dataclasses.asdict(service) for service in entry.results
+                    ],
+                    "stored_at": entry.stored_at,
+                }
+                for key, entry in snapshot
+            }
+            directory = os.path.dirname(os.path.abspath(path))
+            # Written aside then renamed, so a crash never leaves a truncated cache behind.
+            with tempfile.NamedTemporaryFile(
+                "w", dir=directory, delete=False, encoding="utf-8"
+            ) as o:
+                json.dump(entries, o)
+            os.replace(o.name, path)
+
+
+def from_environment(environment: Mapping[str, str]) -> ResultCache:
+    """Cache configured by the `NMAP_MCP_CACHE_*` variables of `environment`, defaults are used for the unset ones.
+
+    Args:
+        environment: environment variables, usually `os.environ`.
+    """
+    return ResultCache(
+        ttl=float(environment.get(TTL_ENVIRONMENT_VARIABLE, DEFAULT_TTL)),
+        max_entries=int(
+            environment.get(MAX_ENTRIES_ENVIRONMENT_VARIABLE, DEFAULT_MAX_ENTRIES)
+        ),
+        path=environment.get(PATH_ENVIRONMENT_VARIABLE) or None,
+    )
+
+
+def _service_from_dict(service: dict[str, Any]) -> mcp_types.ServiceResult:
+    fingerprints = [
+        mcp_types.FingerprintResult(**fingerprint)
+        for fingerprint in service.get("fingerprints", [])
+    ]
+    return mcp_types.ServiceResult(
+        **{key: value for key, value in service.items() if key != "fingerprints"},
+        fingerprints=fingerprints,
+    )
@@ -1,17 +1,24 @@
 import logging
+import os
 import subprocess
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 RUN_SERVER_PATH = "/app/agent/mcp/server.py"
 
 
-def run() -> None:
-    """Start the MCP server with the streamable-http transport."""
+def run(environment: Optional[Dict[str, str]] = None) -> None:
+    """Start the MCP server with the streamable-http transport.
+
+    Args:
+        environment: variables added to the environment of the server process, e.g. its cache settings.
+    """
     logger.info("Starting MCP server.")
     subprocess.Popen(
         [
             "python3.14",
             RUN_SERVER_PATH,
-        ]
+        ],
+        env={**os.environ, **(environment or {})},
     )
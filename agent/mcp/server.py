@@ -15,7 +15,13 @@ MCP_SERVER_PORT = 50051
 
 mcp: fastmcp.FastMCP = fastmcp.FastMCP(
     name=MCP_SERVER_NAME,
-    tools=[mcp_tools.scan],
+    tools=[
+        mcp_tools.scan,
+        mcp_tools.submit_scan,
+        mcp_tools.get_scan_status,
+        mcp_tools.get_scan_results,
+        mcp_tools.cancel_scan,
+    ],
 )
 
 
@@ -1,15 +1,18 @@
 """MCP tools for port scanning."""
 
+import asyncio
 import ipaddress
 import logging
+import os
 import subprocess
-from typing import Any
-
 
+from agent import models
+from agent import nmap_async_wrapper
 from agent import nmap_options
-from agent import nmap_wrapper
 from agent import result_parser
+from agent.mcp import jobs
 from agent.mcp import mcp_types
+from agent.mcp import result_cache
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +25,9 @@ class CalledToolError(Error):
     """Generic exception raised when a tool call fails."""
 
 
-def scan(target: str) -> list[mcp_types.ServiceResult]:
+async def scan(
+    target: str, force_refresh: bool = False
+) -> list[mcp_types.ServiceResult]:
     """
     Scan a target and return discovered services with fingerprints.
 
@@ -30,18 +35,128 @@ def scan(target: str) -> list[mcp_types.ServiceResult]:
     - Service details: port, protocol, state, service name, banner
     - Fingerprint details: OS information and backend component information
 
+    The scan shares the bounded job queue of `submit_scan`, long scans are better submitted as jobs and polled.
+    Results of a recent scan of the same target are returned from the cache.
+
+    Args:
+        target: A string representing the scan target, can be an IP address or a domain name.
+        force_refresh: Run a new scan even if recent results of the target are cached.
+
+    Returns:
+        A list of ServiceResult objects, each containing service details
+        and associated fingerprint information.
+    """
+    try:
+        job = _submit(target, force_refresh)
+        return await scan_jobs.wait(job.job_id)
+    except jobs.Error as e:
+        raise CalledToolError(str(e)) from e
+
+
+async def submit_scan(
+    target: str, force_refresh: bool = False
+) -> mcp_types.ScanJobInfo:
+    """
+    Submit the scan of a target and return right away with the job to poll.
+
     Args:
         target: A string representing the scan target, can be an IP address or a domain name.
+        force_refresh: Run a new scan even if recent results of the target are cached, the job of cached results
+            is completed right away.
+
+    Returns:
+        The submitted job, its `job_id` is used to poll the status and fetch the results.
+
+    Raises:
+        CalledToolError: when too many scans are already waiting to run.
+    """
+    try:
+        return _submit(target, force_refresh).info()
+    except jobs.Error as e:
+        raise CalledToolError(str(e)) from e
+
+
+async def get_scan_status(job_id: str) -> mcp_types.ScanJobInfo:
+    """
+    Get the status and progress of a scan job.
+
+    Args:
+        job_id: The identifier returned by `submit_scan`.
+
+    Returns:
+        The job with its status: pending, running, completed, failed or cancelled.
+    """
+    try:
+        return scan_jobs.get(job_id).info()
+    except jobs.Error as e:
+        raise CalledToolError(str(e)) from e
+
+
+async def get_scan_results(job_id: str) -> list[mcp_types.ServiceResult]:
+    """
+    Get the discovered services with fingerprints of a completed scan job.
+
+    Args:
+        job_id: The identifier returned by `submit_scan`.
 
     Returns:
         A list of ServiceResult objects, each containing service details
         and associated fingerprint information.
     """
-    scan_results = _do_scan(target)
+    try:
+        return scan_jobs.results(job_id)
+    except jobs.Error as e:
+        raise CalledToolError(str(e)) from e
+
+
+async def cancel_scan(job_id: str) -> mcp_types.ScanJobInfo:
+    """
+    Cancel a pending or running scan job, stopping its nmap process.
+
+    Args:
+        job_id: The identifier returned by `submit_scan`.
+
+    Returns:
+        The job with its updated status.
+    """
+    try:
+        return scan_jobs.cancel(job_id).info()
+    except jobs.Error as e:
+        raise CalledToolError(str(e)) from e
 
-    port_services = result_parser.get_port_services(scan_results)
-    service_libraries = result_parser.get_service_libraries(scan_results)
-    os_fingerprints = result_parser.get_os_fingerprints(scan_results)
+
+def _submit(target: str, force_refresh: bool) -> jobs.ScanJob:
+    if target == "":
+        raise ValueError(f"Invalid target: `{target}`")
+    if force_refresh is False:
+        cached_results = scan_results_cache.get(
+            result_cache.cache_key(target, _scan_options())
+        )
+        if cached_results is not None:
+            logger.info("returning cached scan results of %s", target)
+            return scan_jobs.add_completed(target, cached_results)
+    return scan_jobs.submit(target)
+
+
+async def _scan_services(
+    target: str, report_progress: jobs.ProgressCallback
+) -> list[mcp_types.ServiceResult]:
+    options = _scan_options()
+    scan_result = await _do_scan(target, options, report_progress)
+    services = _to_service_results(scan_result)
+    # Persisting the cache writes a file, keep it off the event loop.
+    await asyncio.to_thread(
+        scan_results_cache.put, result_cache.cache_key(target, options), services
+    )
+    return services
+
+
+def _to_service_results(
+    scan_result: models.ScanResult,
+) -> list[mcp_types.ServiceResult]:
+    port_services = result_parser.get_port_services(scan_result)
+    service_libraries = result_parser.get_service_libraries(scan_result)
+    os_fingerprints = result_parser.get_os_fingerprints(scan_result)
 
     services: list[mcp_types.ServiceResult] = []
     for svc in port_services:
@@ -53,7 +168,7 @@ def scan(target: str) -> list[mcp_types.ServiceResult]:
             state=svc.get("state") or "",
             service=svc.get("service") or "",
             banner=svc.get("banner") or "",
-            version=svc.get("version") or "4",
+            version=str(svc.get("version") or "4"),
             fingerprints=[],
         )
         services.append(service)
@@ -61,7 +176,7 @@ def scan(target: str) -> list[mcp_types.ServiceResult]:
     for svc_fp in service_libraries:
         fp = mcp_types.FingerprintResult(
             host=svc_fp.get("host") or "unknown",
-            version=svc_fp.get("version") or "4",
+            version=str(svc_fp.get("version") or "4"),
             library_type=svc_fp.get("library_type") or "BACKEND_COMPONENT",
             port=int(svc_fp.get("port") or 0),
             protocol=svc_fp.get("protocol"),
@@ -93,11 +208,8 @@ def scan(target: str) -> list[mcp_types.ServiceResult]:
     return services
 
 
-def _do_scan(target: str) -> dict[str, Any]:
-    if target == "":
-        raise ValueError(f"Invalid target: `{target}`")
-
-    options = nmap_options.NmapOptions(
+def _scan_options() -> nmap_options.NmapOptions:
+    return nmap_options.NmapOptions(
         dns_resolution=False,
         ports="0-65535",
         timing_template=nmap_options.TimingTemplate.T3,
@@ -108,20 +220,36 @@ def _do_scan(target: str) -> dict[str, Any]:
         host_timeout=300,
         port_scanning_techniques=[nmap_options.PortScanningTechnique.TCP_CONNECT],
     )
-    client = nmap_wrapper.NmapWrapper(options)
+
+
+async def _do_scan(
+    target: str,
+    options: nmap_options.NmapOptions,
+    report_progress: jobs.ProgressCallback,
+) -> models.ScanResult:
+    client = nmap_async_wrapper.AsyncNmapWrapper(options)
+
+    def _progress_callback(progress: nmap_async_wrapper.ScanProgress) -> None:
+        report_progress(progress.percent)
 
     try:
         if _is_ip_or_cidr(target):
-            return _scan_ip(client, target)
+            return await _scan_ip(client, target, _progress_callback)
         else:
-            scan_results, _ = client.scan_domain(domain_name=target)
-            return scan_results
+            scan_result, _ = await client.scan_domain(
+                domain_name=target, progress_callback=_progress_callback
+            )
+            return scan_result
     except subprocess.CalledProcessError as e:
         logger.error("Nmap command failed to scan target %s", target)
         raise CalledToolError from e
 
 
-def _scan_ip(client: nmap_wrapper.NmapWrapper, target: str) -> dict[str, Any]:
+async def _scan_ip(
+    client: nmap_async_wrapper.AsyncNmapWrapper,
+    target: str,
+    progress_callback: nmap_async_wrapper.ProgressCallback,
+) -> models.ScanResult:
     if "/" in target:
         network = ipaddress.ip_network(target, strict=False)
         host = str(network.network_address)
@@ -131,8 +259,10 @@ def _scan_ip(client: nmap_wrapper.NmapWrapper, target: str) -> dict[str, Any]:
         mask = 128 if ip.version == 6 else 32
         host = target
 
-    scan_results, _ = client.scan_hosts(hosts=host, mask=mask)
-    return scan_results
+    scan_result, _ = await client.scan_hosts(
+        hosts=host, mask=mask, progress_callback=progress_callback
+    )
+    return scan_result
 
 
 def _is_ip_or_cidr(target: str) -> bool:
@@ -145,3 +275,7 @@ def _is_ip_or_cidr(target: str) -> bool:
         return True
     except ValueError:
         return False
+
+
+scan_jobs = jobs.from_environment(_scan_services, os.environ)
+scan_results_cache = result_cache.from_environment(os.environ)
@@ -0,0 +1,269 @@
+"""Typed model of an nmap scan result, extracted once and consumed by every emitter and the technical report.
+
+Classes are frozen, slotted dataclasses holding tuples: a port costs a few fixed-size objects instead of a tree of
+per-element dicts, which dominates memory on large scans, and a result can be buffered, cached or handed to another
+thread or process without copying it. Models are built either from the `xmltodict` layout or directly from the XML
+elements produced by `nmap_xml`.
+"""
+
+import dataclasses
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+IP_VERSIONS = {"ipv4": 4, "ipv6": 6}
+BANNER_SCRIPT_ID = "banner"
+
+
+def _as_list(value: Any) -> List[Any]:
+    """nmap elements appearing once are parsed as a dict and as a list otherwise, normalize them to a list."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _intern(value: str) -> str:
+    """Share the strings repeated on every port (protocols, states, service names, port ids) across the model."""
+    return sys.intern(value)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ScriptOutput:
+    """Output of an NSE script run against a port."""
+
+    id: str
+    output: Optional[str]
+
+    @classmethod
+    def from_dict(cls, script: Dict[str, Any]) -> "ScriptOutput":
+        output = script.get("@output")
+        return cls(
+            id=script.get("@id", ""),
+            output=str(output) if output is not None else None,
+        )
+
+    @classmethod
+    def from_element(cls, script: ElementTree.Element) -> "ScriptOutput":
+        return cls(id=_intern(script.get("id", "")), output=script.get("output"))
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Service:
+    """Service detected on a port."""
+
+    name: str = ""
+    product: str = ""
+    version: str = ""
+
+    @classmethod
+    def from_dict(cls, service: Dict[str, Any]) -> "Service":
+        return cls(
+            name=service.get("@name", ""),
+            product=service.get("@product", ""),
+            version=service.get("@version", ""),
+        )
+
+    @classmethod
+    def from_element(cls, service: ElementTree.Element) -> "Service":
+        return cls(
+            name=_intern(service.get("name", "")),
+            product=_intern(service.get("product", "")),
+            version=_intern(service.get("version", "")),
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Port:
+    """Scanned port with its state, service and script outputs."""
+
+    port_id: str
+    protocol: Optional[str]
+    state: str
+    service: Service
+    scripts: Tuple[ScriptOutput, ...] = ()
+
+    @property
+    def number(self) -> int:
+        return int(self.port_id)
+
+    @property
+    def banner(self) -> Optional[str]:
+        return self.script_output(BANNER_SCRIPT_ID)
+
+    def script_output(self, script_id: str) -> Optional[str]:
+        """Output of the first script with the given id, None if the script did not run."""
+        for script in self.scripts:
+            if script.id == script_id:
+                return script.output
+        return None
+
+    @classmethod
+    def from_dict(cls, port: Dict[str, Any]) -> "Port":
+        return cls(
+            port_id=port.get("@portid", ""),
+            protocol=port.get("@protocol"),
+            state=(port.get("state") or {}).get("@state", "closed"),
+            service=Service.from_dict(port.get("service") or {}),
+            scripts=tuple(
+                ScriptOutput.from_dict(script)
+                for script in _as_list(port.get("script"))
+            ),
+        )
+
+    @classmethod
+    def from_element(cls, port: ElementTree.Element) -> "Port":
+        state = port.find("state")
+        service = port.find("service")
+        protocol = port.get("protocol")
+        return cls(
+            port_id=_intern(port.get("portid", "")),
+            protocol=_intern(protocol) if protocol is not None else None,
+            state=_intern(state.get("state", "closed"))
+            if state is not None
+            else "closed",
+            service=Service.from_element(service) if service is not None else Service(),
+            scripts=tuple(
+                ScriptOutput.from_element(script) for script in port.iterfind("script")
+            ),
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class OsMatch:
+    """Most accurate operating system match of a host."""
+
+    name: Optional[str]
+    family: Optional[str]
+    generation: Optional[str]
+
+    @classmethod
+    def from_dict(cls, os: Optional[Dict[str, Any]]) -> Optional["OsMatch"]:
+        """Build the best OS match, None when nmap did not report a usable one."""
+        if os is None:
+            return None
+        os_match: Any = os.get("osmatch")
+        # Matches are sorted by accuracy, keep the first one.
+        while isinstance(os_match, list):
+            if len(os_match) == 0:
+                return None
+            os_match = os_match[0]
+        if isinstance(os_match, dict) is False:
+            return None
+
+        os_class: Any = os_match.get("osclass", {})
+        if isinstance(os_class, list):
+            if len(os_class) == 0:
+                return None
+            os_class = os_class[0]
+        os_class = os_class or {}
+        return cls(
+            name=os_match.get("@name"),
+            family=os_class.get("@osfamily"),
+            generation=os_class.get("@osgen"),
+        )
+
+    @classmethod
+    def from_element(cls, os: Optional[ElementTree.Element]) -> Optional["OsMatch"]:
+        """Build the best OS match, None when nmap did not report one."""
+        if os is None:
+            return None
+        os_match = os.find("osmatch")
+        if os_match is None:
+            return None
+        os_class = os_match.find("osclass")
+        return cls(
+            name=os_match.get("name"),
+            family=os_class.get("osfamily") if os_class is not None else None,
+            generation=os_class.get("osgen") if os_class is not None else None,
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Host:
+    """Scanned host with its addresses, state, hostnames, ports and OS match."""
+
+    address: Optional[str]
+    addr_type: Optional[str]
+    state: Optional[str] = None
+    hostnames: Tuple[str, ...] = ()
+    ports: Tuple[Port, ...] = ()
+    os_match: Optional[OsMatch] = None
+
+    @property
+    def version(self) -> int:
+        """IP version of the host address, defaults to 4."""
+        return IP_VERSIONS.get(self.addr_type or "", 4)
+
+    @classmethod
+    def from_dict(cls, host: Dict[str, Any]) -> "Host":
+        addresses = _as_list(host.get("address"))
+        # Hosts on the local network also report their MAC address, prefer the IP one.
+        address = next(
+            (a for a in addresses if a.get("@addrtype") in IP_VERSIONS),
+            addresses[0] if len(addresses) > 0 else {},
+        )
+        hostnames = host.get("hostnames") or {}
+        ports = host.get("ports") or {}
+        status = host.get("status") or {}
+        return cls(
+            address=address.get("@addr"),
+            addr_type=address.get("@addrtype"),
+            state=_intern(status["@state"]) if "@state" in status else None,
+            hostnames=tuple(
+                hostname.get("@name", "")
+                for hostname in _as_list(hostnames.get("hostname"))
+            ),
+            ports=tuple(Port.from_dict(port) for port in _as_list(ports.get("port"))),
+            os_match=OsMatch.from_dict(host.get("os")),
+        )
+
+    @classmethod
+    def from_element(cls, host: ElementTree.Element) -> "Host":
+        addresses = host.findall("address")
+        address = next(
+            (a for a in addresses if a.get("addrtype") in IP_VERSIONS),
+            addresses[0] if len(addresses) > 0 else None,
+        )
+        status = host.find("status")
+        state = status.get("state") if status is not None else None
+        return cls(
+            address=address.get("addr") if address is not None else None,
+            addr_type=address.get("addrtype") if address is not None else None,
+            state=_intern(state) if state is not None else None,
+            hostnames=tuple(
+                hostname.get("name", "")
+                for hostname in host.iterfind("hostnames/hostname")
+            ),
+            ports=tuple(
+                Port.from_element(port) for port in host.iterfind("ports/port")
+            ),
+            os_match=OsMatch.from_element(host.find("os")),
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ScanResult:
+    """Result of an nmap scan."""
+
+    hosts: Tuple[Host, ...] = ()
+
+    @classmethod
+    def from_dict(cls, scan_results: Optional[Dict[str, Any]]) -> "ScanResult":
+        """Extract the scan result from the `xmltodict` parsed XML output in a single pass.
+
+        Args:
+            scan_results: parsed XML output of the scan, an empty dict when parsing failed.
+
+        Returns:
+            the typed scan result.
+        """
+        if scan_results is None or scan_results.get("nmaprun") is None:
+            return cls()
+        return cls(
+            hosts=tuple(
+                Host.from_dict(host)
+                for host in _as_list(scan_results["nmaprun"].get("host"))
+            )
+        )
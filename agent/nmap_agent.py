@@ -6,11 +6,23 @@ and `v3.report.vulnerability` with a technical report of the scan.
 """
 
 import datetime
+import dataclasses
+import functools
 import ipaddress
 import logging
 import re
 import subprocess
-from typing import Dict, Any, Tuple, Optional, List, cast
+from typing import (
+    Dict,
+    Callable,
+    Iterable,
+    Iterator,
+    Tuple,
+    Optional,
+    List,
+    Sequence,
+    cast,
+)
 from urllib import parse
 
 from ostorlab.agent import agent, definitions as agent_definitions
@@ -24,10 +36,23 @@ from ostorlab.assets import ipv6 as ipv6_asset
 from ostorlab.runtimes import definitions as runtime_definitions
 from rich import logging as rich_logging
 
+from agent import discovery
+from agent import emitter
+from agent import ip_coverage
+from agent import models
 from agent import result_parser
+from agent import nmap_normal
 from agent import nmap_options
 from agent import nmap_wrapper
+from agent import nmap_xml
 from agent import process_scans
+from agent import scheduler
+from agent import scan_plan
+from agent import script_cache
+from agent import subnet_splitter
+from agent import workspace
+from agent.mcp import jobs as mcp_jobs
+from agent.mcp import result_cache
 from agent.mcp import runner as mcp_runner
 
 logging.basicConfig(
@@ -47,6 +72,14 @@ DNS_RESOLV_CONFIG_PATH = "/etc/resolv.conf"
 DEFAULT_MASK_IPV6 = 128
 # scan up to 65536 host
 IPV6_CIDR_LIMIT = 112
+# Agent arguments configuring the MCP server, passed to its process as environment variables.
+MCP_SERVER_ENVIRONMENT_ARGS = {
+    "mcp_cache_ttl": result_cache.TTL_ENVIRONMENT_VARIABLE,
+    "mcp_cache_max_entries": result_cache.MAX_ENTRIES_ENVIRONMENT_VARIABLE,
+    "mcp_cache_path": result_cache.PATH_ENVIRONMENT_VARIABLE,
+    "mcp_max_concurrent_scans": mcp_jobs.MAX_CONCURRENT_SCANS_ENVIRONMENT_VARIABLE,
+    "mcp_max_pending_scans": mcp_jobs.MAX_PENDING_SCANS_ENVIRONMENT_VARIABLE,
+}
 
 
 class Error(Exception):
@@ -57,6 +90,40 @@ class RunCommandError(Error):
     """Error when running a command using a subprocess."""
 
 
+# Called with a scanned batch and the number of hosts found up, once its results are emitted.
+ScannedCallback = Callable[[List[Tuple[str, int]], int], None]
+
+
+class _BatchScanned:
+    """Marker closing the stream of a batch, once every nmap run of the batch completed."""
+
+
+_BATCH_SCANNED = _BatchScanned()
+
+BatchStreamItem = models.Host | workspace.ScanWorkspace | _BatchScanned
+
+
+def _targets(batch: List[Tuple[str, int]]) -> List[str]:
+    """Networks of a batch in CIDR notation."""
+    return [f"{host}/{mask}" for host, mask in batch]
+
+
+def _uncovered_targets(
+    targets: Iterable[Tuple[str, int]], coverage: ip_coverage.CoverageIndex
+) -> List[Tuple[str, int]]:
+    """Parts of the networks to scan that were not processed before, fully uncovered networks are kept as is."""
+    uncovered = []
+    for host, mask in targets:
+        network = ipaddress.ip_network(f"{host}/{mask}", strict=False)
+        parts = coverage.uncovered(network)
+        if parts == [network]:
+            uncovered.append((host, mask))
+            continue
+        logger.debug("parts of target %s/%s were processed before", host, mask)
+        uncovered.extend((str(part.network_address), part.prefixlen) for part in parts)
+    return uncovered
+
+
 class NmapAgent(
     agent.Agent, vuln_mixin.AgentReportVulnMixin, persist_mixin.AgentPersistMixin
 ):
@@ -75,6 +142,27 @@ class NmapAgent(
         self._vpn_config: Optional[str] = self.args.get("vpn_config")
         self._dns_config: Optional[str] = self.args.get("dns_config")
         self._host_timeout: Optional[int] = self.args.get("host_timeout")
+        self._max_rate: Optional[int] = self.args.get("max_rate")
+        self._stream_results: bool = self.args.get("stream_results", False)
+        self._scan_batch_size = int(self.args.get("scan_batch_size", 1))
+        self._two_phase_scan: bool = self.args.get("two_phase_scan", False)
+        self._discovery_min_rate: Optional[int] = self.args.get("discovery_min_rate")
+        self._host_discovery: bool = self.args.get("host_discovery", False)
+        self._live_hosts_batch_size = int(self.args.get("live_hosts_batch_size", 64))
+        self._adaptive_split: bool = self.args.get("adaptive_split", False)
+        self._target_scan_duration = float(
+            self.args.get(
+                "target_scan_duration", subnet_splitter.DEFAULT_TARGET_DURATION
+            )
+        )
+        self._script_cache = script_cache.ScriptCache()
+        self._coverage = ip_coverage.CoverageStore(self, b"agent_nmap_asset")
+        self._emitter = emitter.BatchingEmitter(self.emit)
+        self._scheduler = scheduler.ScanScheduler(
+            max_workers=int(
+                self.args.get("scan_workers", scheduler.DEFAULT_MAX_WORKERS)
+            )
+        )
 
         self.should_start_mcp_server: bool = self.args.get(
             "should_start_mcp_server", False
@@ -84,9 +172,11 @@ class NmapAgent(
         if self._vpn_config is not None and self._dns_config is not None:
             self._connect_to_vpn()
 
+        self._script_cache.prefetch(self.args.get("scripts") or [])
+
         if self.should_start_mcp_server is True:
             logger.info("Running Nmap agent in MCP mode.")
-            mcp_runner.run()
+            mcp_runner.run(self._mcp_server_environment())
 
     def process(self, message: msg.Message) -> None:
         """Process messages of type v3.asset.ip.[v4,v6] and performs a network scan. Once the scan is completed, it
@@ -136,49 +226,394 @@ class NmapAgent(
             message.data.get("url") or message.data.get("endpoint_url"),
         )
 
-        if len(hosts) > 0:
-            logger.info("Scanning hosts `%s`.", hosts)
-            for host, mask in hosts:
-                if not self.add_ip_network(
-                    b"agent_nmap_asset",
+        try:
+            if len(hosts) > 0:
+                self._process_network(
                     ipaddress.ip_network(f"{host}/{mask}", strict=False),
-                ):
-                    logger.debug(
-                        "target %s/%s was processed before, exiting", host, mask
-                    )
+                    max_mask,
+                    hosts,
+                    domain_name,
+                )
+            elif domain_name is not None:
+                logger.info("Scanning domain `%s`.", domain_name)
+                if not self.set_add(b"agent_nmap_asset", domain_name):
+                    logger.debug("target %s was processed before, exiting", domain_name)
                     return
-                try:
-                    scan_results, normal_results = self._scan_host(host, mask)
-                except subprocess.CalledProcessError:
-                    logger.error("Nmap command failed to scan host %s", host)
-                    continue
-                logger.info("scan results %s", scan_results)
-
-                self._emit_services(scan_results, domain_name)
-                self._emit_network_scan_finding(scan_results, normal_results)
-                self._emit_fingerprints(scan_results, domain_name)
-        elif domain_name is not None:
-            logger.info("Scanning domain `%s`.", domain_name)
-            if not self.set_add(b"agent_nmap_asset", domain_name):
-                logger.debug("target %s was processed before, exiting", domain_name)
-                return
-            if self._is_domain_in_scope(domain_name) is False:
+                if self._is_domain_in_scope(domain_name) is False:
+                    return
+                if self._stream_results is True:
+                    self._process_domain_streamed(domain_name)
+                else:
+                    self._process_domain(domain_name)
+            else:
+                logger.error("Neither host or domain are set.")
+        finally:
+            # Messages and hosts marked as scanned are written to the bus and the persist backend in batches.
+            self._emitter.flush()
+            self._coverage.flush()
+            logger.debug("emitter stats: %s", self._emitter.stats)
+
+    def _process_network(
+        self,
+        network: ipaddress.IPv4Network | ipaddress.IPv6Network,
+        max_mask: int,
+        hosts: List[Tuple[str, int]],
+        domain_name: Optional[str],
+    ) -> None:
+        """Scan the subnets of a network, resuming the plan left by an interrupted scan of the same network."""
+        options = self._host_options()
+        batch_size = self._scan_batch_size
+        targets: Iterable[Tuple[str, int]] = hosts
+        splitter: Optional[subnet_splitter.AdaptiveSplitter] = None
+        plan = scan_plan.ScanPlan.load(self, network) if len(hosts) > 1 else None
+
+        if plan is not None:
+            logger.info("Resuming the scan of `%s`.", network)
+            if plan.kind is scan_plan.PlanKind.ADAPTIVE:
+                splitter = self._adaptive_splitter(
+                    plan.unfinished_networks(self._coverage.index), max_mask
+                )
+                targets = splitter
+            else:
+                targets = plan.unfinished_subnets()
+            if plan.kind is scan_plan.PlanKind.LIVE_HOSTS:
+                batch_size = self._live_hosts_batch_size
+                options = dataclasses.replace(options, no_ping=True)
+        else:
+            coverage = self._coverage.index
+            if coverage.covers(network) is True:
+                logger.debug("target %s was processed before, exiting", network)
                 return
+            kind = scan_plan.PlanKind.SPLIT
+            if self._host_discovery is True:
+                live_hosts = self._discover_live_hosts(network)
+                if live_hosts is not None:
+                    kind = scan_plan.PlanKind.LIVE_HOSTS
+                    targets = live_hosts
+                    batch_size = self._live_hosts_batch_size
+                    # The sweep already found the hosts up, pinging them again is wasted time.
+                    options = dataclasses.replace(options, no_ping=True)
+            if self._adaptive_split is True and targets is hosts and len(hosts) > 1:
+                kind = scan_plan.PlanKind.ADAPTIVE
+                splitter = self._adaptive_splitter(
+                    coverage.uncovered(network), max_mask
+                )
+                targets = splitter
+            else:
+                targets = _uncovered_targets(targets, coverage)
+            if len(hosts) > 1:
+                plan = scan_plan.ScanPlan.create(
+                    self, network, kind, targets if splitter is None else ()
+                )
+            if kind is scan_plan.PlanKind.LIVE_HOSTS:
+                # The sweep covered the whole range, redeliveries must not sweep it again. Live hosts were already
+                # filtered against the index, the plan resumes them if the scan is interrupted.
+                self._coverage.record(network)
+
+        if splitter is not None:
+            logger.info("Scanning `%s` in adaptive chunks.", network)
+        else:
+            logger.info("Scanning hosts `%s`.", targets)
+
+        def _on_scanned(batch: List[Tuple[str, int]], live_hosts: int) -> None:
+            if splitter is not None:
+                splitter.record(batch, live_hosts=live_hosts)
+            if plan is not None:
+                plan.mark(batch, scan_plan.SubnetState.DONE)
+
+        batches = self._target_batches(targets, batch_size)
+        if plan is not None:
+            batches = plan.track(batches)
+        if self._stream_results is True:
+            self._process_hosts_streamed(batches, options, domain_name, _on_scanned)
+        else:
+            self._process_hosts(batches, options, domain_name, _on_scanned)
+        if plan is not None:
+            plan.delete()
+
+    def _adaptive_splitter(
+        self,
+        networks: List[ipaddress.IPv4Network | ipaddress.IPv6Network],
+        max_mask: int,
+    ) -> subnet_splitter.AdaptiveSplitter:
+        return subnet_splitter.AdaptiveSplitter(
+            networks,
+            max_prefix=max_mask,
+            target_duration=self._target_scan_duration,
+        )
+
+    def _process_hosts(
+        self,
+        batches: Iterator[List[Tuple[str, int]]],
+        options: nmap_options.NmapOptions,
+        domain_name: Optional[str],
+        on_scanned: Optional[ScannedCallback] = None,
+    ) -> None:
+        for batch, scan in self._scheduler.run(
+            functools.partial(self._scan_host_batch, options=options), batches
+        ):
             try:
-                scan_results, normal_results = self._scan_domain(domain_name)
+                scan_result, normal_results = scan.result()
+            except subprocess.CalledProcessError:
+                logger.error("Nmap command failed to scan hosts %s", _targets(batch))
+                continue
+            logger.info("scan results %s", scan_result)
+
+            self._emit_scan_results(scan_result, normal_results, domain_name)
+            if on_scanned is not None:
+                on_scanned(batch, len(scan_result.hosts))
+
+    def _process_domain(self, domain_name: str) -> None:
+        try:
+            scan_result, normal_results = self._scan_domain(domain_name)
+        except subprocess.CalledProcessError:
+            logger.error("Nmap command failed to scan domain name %s", domain_name)
+            return
+        logger.info("scan results %s", scan_result)
+
+        self._emit_scan_results(scan_result, normal_results, domain_name)
+
+    def _process_hosts_streamed(
+        self,
+        batches: Iterator[List[Tuple[str, int]]],
+        options: nmap_options.NmapOptions,
+        domain_name: Optional[str],
+        on_scanned: Optional[ScannedCallback] = None,
+    ) -> None:
+        """Scan the hosts and emit the services and fingerprints of each host as soon as nmap reports it."""
+        live_hosts: Dict[Tuple[Tuple[str, int], ...], int] = {}
+        for batch, result in self._scheduler.stream(
+            functools.partial(self._stream_host_batch, options=options), batches
+        ):
+            if isinstance(result, _BatchScanned):
+                # Two-phase batches produce a workspace per enumeration group, or none without open ports.
+                if on_scanned is not None:
+                    on_scanned(batch, live_hosts.pop(tuple(batch), 0))
+            elif isinstance(result, workspace.ScanWorkspace):
+                with result:
+                    self._emit_streamed_network_scan_findings(result)
+            else:
+                live_hosts[tuple(batch)] = live_hosts.get(tuple(batch), 0) + 1
+                scan_result = models.ScanResult(hosts=(result,))
+                self._emit_services(scan_result, domain_name)
+                self._emit_fingerprints(scan_result, domain_name)
+                # Streamed hosts are emitted as soon as nmap reports them.
+                self._emitter.flush()
+
+    def _process_domain_streamed(self, domain_name: str) -> None:
+        """Scan the domain and emit the services and fingerprints of each host as soon as nmap reports it."""
+        client = nmap_wrapper.NmapWrapper(self._domain_options())
+        with workspace.ScanWorkspace() as scan_workspace:
+            logger.info("scanning domain %s", domain_name)
+            try:
+                for host in client.iter_scan_domain(domain_name, scan_workspace):
+                    scan_result = models.ScanResult(hosts=(host,))
+                    self._emit_services(scan_result, domain_name)
+                    self._emit_fingerprints(scan_result, domain_name)
+                    self._emitter.flush()
             except subprocess.CalledProcessError:
                 logger.error("Nmap command failed to scan domain name %s", domain_name)
                 return
-            logger.info("scan results %s", scan_results)
+            self._emit_streamed_network_scan_findings(scan_workspace)
 
-            self._emit_services(scan_results, domain_name)
-            self._emit_network_scan_finding(scan_results, normal_results)
-            self._emit_fingerprints(scan_results, domain_name)
-        else:
-            logger.error("Neither host or domain are set.")
+    def _stream_host_batch(
+        self, batch: List[Tuple[str, int]], options: nmap_options.NmapOptions
+    ) -> Iterator[BatchStreamItem]:
+        """Yield the hosts of a batch while it is scanned, then the opened workspace holding its outputs.
 
-    def _scan_host(self, host: str, mask: int) -> Tuple[Dict[str, Any], str]:
-        options = nmap_options.NmapOptions(
+        The stream ends with `_BATCH_SCANNED` once the batch is completely scanned, failed scans leave it out.
+        """
+        if self._two_phase_scan is True:
+            yield from self._stream_two_phase(batch, options)
+            return
+
+        client = nmap_wrapper.NmapWrapper(options)
+        scan_workspace = workspace.ScanWorkspace()
+        scan_workspace.open()
+        logger.info("scanning targets %s", _targets(batch))
+        try:
+            if len(batch) == 1:
+                host, mask = batch[0]
+                yield from client.iter_scan_hosts(host, mask, scan_workspace)
+            else:
+                yield from client.iter_scan_targets(_targets(batch), scan_workspace)
+        except subprocess.CalledProcessError:
+            logger.error("Nmap command failed to scan hosts %s", _targets(batch))
+            scan_workspace.close()
+            return
+        except BaseException:
+            scan_workspace.close()
+            raise
+        yield scan_workspace
+        yield _BATCH_SCANNED
+
+    def _stream_two_phase(
+        self, batch: List[Tuple[str, int]], options: nmap_options.NmapOptions
+    ) -> Iterator[BatchStreamItem]:
+        """Discover the open ports of a batch, then yield the hosts of each enumeration run and its workspace."""
+        try:
+            groups = self._discover_open_ports(batch, options)
+        except subprocess.CalledProcessError:
+            logger.error("Nmap command failed to discover hosts %s", _targets(batch))
+            return
+
+        completed = True
+        for group in groups:
+            client = nmap_wrapper.NmapWrapper(
+                self._enumeration_options(options, group.port_spec)
+            )
+            scan_workspace = workspace.ScanWorkspace()
+            scan_workspace.open()
+            logger.info("enumerating ports %s of %s", group.ports, group.addresses)
+            try:
+                yield from client.iter_scan_targets(group.addresses, scan_workspace)
+            except subprocess.CalledProcessError:
+                logger.error(
+                    "Nmap command failed to enumerate hosts %s", group.addresses
+                )
+                scan_workspace.close()
+                completed = False
+                continue
+            except BaseException:
+                scan_workspace.close()
+                raise
+            yield scan_workspace
+        if completed is True:
+            yield _BATCH_SCANNED
+
+    def _emit_streamed_network_scan_findings(
+        self, scan_workspace: workspace.ScanWorkspace
+    ) -> None:
+        with nmap_normal.NormalOutput.open(
+            scan_workspace.normal_output_path
+        ) as normal_output:
+            for host in nmap_xml.iter_host_elements(scan_workspace.xml_output_path):
+                self._emit_network_scan_finding(
+                    models.ScanResult(hosts=(models.Host.from_element(host),)),
+                    normal_output,
+                )
+
+    def _emit_scan_results(
+        self,
+        scan_result: models.ScanResult,
+        normal_results: str,
+        domain_name: Optional[str],
+    ) -> None:
+        self._emit_services(scan_result, domain_name)
+        self._emit_network_scan_finding(
+            scan_result, nmap_normal.NormalOutput.from_text(normal_results)
+        )
+        self._emit_fingerprints(scan_result, domain_name)
+
+    def _processed_networks(
+        self, hosts: Iterable[Tuple[str, int]]
+    ) -> Iterator[Tuple[str, int]]:
+        """Yield the networks to scan, recording each one as processed when it is handed to a worker."""
+        for host, mask in hosts:
+            self._coverage.record(ipaddress.ip_network(f"{host}/{mask}", strict=False))
+            yield host, mask
+
+    def _target_batches(
+        self, hosts: Iterable[Tuple[str, int]], batch_size: int
+    ) -> Iterator[List[Tuple[str, int]]]:
+        """Group the networks to scan in batches of `batch_size`, each batch being scanned by one nmap run."""
+        batch: List[Tuple[str, int]] = []
+        for target in self._processed_networks(hosts):
+            batch.append(target)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+
+    def _scan_host_batch(
+        self, batch: List[Tuple[str, int]], options: nmap_options.NmapOptions
+    ) -> Tuple[models.ScanResult, str]:
+        if self._two_phase_scan is True:
+            return self._scan_two_phase(batch, options)
+        if len(batch) == 1:
+            host, mask = batch[0]
+            return self._scan_host(host, mask, options)
+
+        client = nmap_wrapper.NmapWrapper(options)
+        logger.info("scanning targets %s with options %s", _targets(batch), options)
+        scan_result, normal_results = client.scan_targets(_targets(batch))
+        return scan_result, normal_results
+
+    def _scan_two_phase(
+        self, batch: List[Tuple[str, int]], options: nmap_options.NmapOptions
+    ) -> Tuple[models.ScanResult, str]:
+        """Sweep the batch for open ports, then enumerate only the open ports of the live hosts."""
+        scan_results = []
+        normal_results = []
+        for group in self._discover_open_ports(batch, options):
+            client = nmap_wrapper.NmapWrapper(
+                self._enumeration_options(options, group.port_spec)
+            )
+            logger.info("enumerating ports %s of %s", group.ports, group.addresses)
+            group_scan_result, group_normal_results = client.scan_targets(
+                group.addresses
+            )
+            scan_results.append(group_scan_result)
+            normal_results.append(group_normal_results)
+        return discovery.merge_scan_results(scan_results), "\n".join(normal_results)
+
+    def _discover_open_ports(
+        self, batch: List[Tuple[str, int]], options: nmap_options.NmapOptions
+    ) -> List[discovery.EnumerationGroup]:
+        client = nmap_wrapper.NmapWrapper(self._discovery_options(options))
+        logger.info("discovering open ports of %s", _targets(batch))
+        discovery_result, _ = client.scan_targets(_targets(batch))
+        return discovery.enumeration_groups(discovery_result)
+
+    def _discovery_options(
+        self, options: nmap_options.NmapOptions
+    ) -> nmap_options.NmapOptions:
+        """Fast SYN sweep finding the open ports, without service, OS or script probes."""
+        return dataclasses.replace(
+            options,
+            scripts=None,
+            script_default=False,
+            version_detection=False,
+            os_detection=False,
+            min_rate=self._discovery_min_rate,
+        )
+
+    def _enumeration_options(
+        self, options: nmap_options.NmapOptions, ports: str
+    ) -> nmap_options.NmapOptions:
+        """Full probing of the ports found open, the hosts are known to be up."""
+        return dataclasses.replace(
+            options,
+            ports=ports,
+            top_ports=None,
+            fast_mode=False,
+            no_ping=True,
+        )
+
+    def _discover_live_hosts(
+        self, network: ipaddress.IPv4Network | ipaddress.IPv6Network
+    ) -> Optional[List[Tuple[str, int]]]:
+        """Ping sweep the whole network in a single run, returns None if the sweep failed."""
+        options = dataclasses.replace(self._host_options(), ping_scan=True)
+        client = nmap_wrapper.NmapWrapper(options)
+        logger.info("discovering live hosts of %s", network)
+        try:
+            sweep_result, _ = client.scan_hosts(
+                hosts=str(network.network_address), mask=network.prefixlen
+            )
+        except subprocess.CalledProcessError:
+            logger.error(
+                "Nmap command failed to discover live hosts of %s, scanning all of it",
+                network,
+            )
+            return None
+        live_hosts = discovery.live_hosts(sweep_result)
+        logger.info("found %s live hosts in %s", len(live_hosts), network)
+        return [(address, network.max_prefixlen) for address in live_hosts]
+
+    def _host_options(self) -> nmap_options.NmapOptions:
+        return nmap_options.NmapOptions(
             dns_resolution=False,
             ports=self.args.get("ports"),
             tcp_syn_ping_ports=self.args.get("tcp_syn_ping_ports"),
@@ -190,15 +625,12 @@ class NmapAgent(
             script_default=self.args.get("script_default", False),
             version_detection=self.args.get("version_info", False),
             host_timeout=self._host_timeout,
+            max_rate=self._max_rate,
+            scripts_cache=self._script_cache,
         )
-        client = nmap_wrapper.NmapWrapper(options)
-
-        logger.info("scanning target %s/%s with options %s", host, mask, options)
-        scan_results, normal_results = client.scan_hosts(hosts=host, mask=mask)
-        return scan_results, normal_results
 
-    def _scan_domain(self, domain_name: str) -> Tuple[Dict[str, Any], str]:
-        options = nmap_options.NmapOptions(
+    def _domain_options(self) -> nmap_options.NmapOptions:
+        return nmap_options.NmapOptions(
             dns_resolution=False,
             ports=self.args.get("ports"),
             tcp_syn_ping_ports=self.args.get("tcp_syn_ping_ports"),
@@ -211,11 +643,25 @@ class NmapAgent(
             version_detection=self.args.get("version_info", False),
             os_detection=self.args.get("os", False),
             host_timeout=self._host_timeout,
+            max_rate=self._max_rate,
+            scripts_cache=self._script_cache,
         )
+
+    def _scan_host(
+        self, host: str, mask: int, options: nmap_options.NmapOptions
+    ) -> Tuple[models.ScanResult, str]:
+        client = nmap_wrapper.NmapWrapper(options)
+
+        logger.info("scanning target %s/%s with options %s", host, mask, options)
+        scan_result, normal_results = client.scan_hosts(hosts=host, mask=mask)
+        return scan_result, normal_results
+
+    def _scan_domain(self, domain_name: str) -> Tuple[models.ScanResult, str]:
+        options = self._domain_options()
         client = nmap_wrapper.NmapWrapper(options)
         logger.info("scanning domain %s with options %s", domain_name, options)
-        scan_results, normal_results = client.scan_domain(domain_name=domain_name)
-        return scan_results, normal_results
+        scan_result, normal_results = client.scan_domain(domain_name=domain_name)
+        return scan_result, normal_results
 
     def _is_domain_in_scope(self, domain: str) -> bool:
         """Check if a domain is in the scan scope with a regular expression."""
@@ -244,49 +690,22 @@ class NmapAgent(
             return None
 
     def _prepare_metadata(
-        self, ports: Dict[str, Any] | List[Dict[str, Any]]
+        self, ports: Sequence[models.Port]
     ) -> List[vuln_mixin.VulnerabilityLocationMetadata]:
-        ret = []
-        if isinstance(ports, List):
-            for port_dict in ports:
-                port = port_dict.get("@portid", "")
-                ret.append(
-                    vuln_mixin.VulnerabilityLocationMetadata(
-                        metadata_type=vuln_mixin.MetadataType.PORT, value=port
-                    )
-                )
-        elif isinstance(ports, Dict):
-            port = ports.get("@portid", "")
-            ret.append(
-                vuln_mixin.VulnerabilityLocationMetadata(
-                    metadata_type=vuln_mixin.MetadataType.PORT, value=port
-                )
+        return [
+            vuln_mixin.VulnerabilityLocationMetadata(
+                metadata_type=vuln_mixin.MetadataType.PORT, value=port.port_id
             )
-        return ret
+            for port in ports
+        ]
 
     def _emit_network_domain_name_finding(
         self,
-        domains: dict[str, dict[str, str]] | dict[str, list[dict[str, str]]],
+        hostnames: Sequence[str],
         technical_detail: str,
-        ports: list[dict[str, str]],
+        ports: Sequence[models.Port],
     ) -> None:
-        domains_hostname: dict[str, str] | list[dict[str, str]] = domains.get(
-            "hostname", {}
-        )
-        if isinstance(domains_hostname, list):
-            for domain_dict in domains_hostname:
-                domain = domain_dict.get("@name", "")
-                self.report_vulnerability(
-                    entry=kb.KB.NETWORK_PORT_SCAN,
-                    technical_detail=technical_detail,
-                    risk_rating=vuln_mixin.RiskRating.INFO,
-                    vulnerability_location=vuln_mixin.VulnerabilityLocation(
-                        metadata=self._prepare_metadata(ports),
-                        asset=domain_name_asset.DomainName(name=domain),
-                    ),
-                )
-        elif isinstance(domains_hostname, dict):
-            domain = domains_hostname.get("@name", "")
+        for domain in hostnames:
             self.report_vulnerability(
                 entry=kb.KB.NETWORK_PORT_SCAN,
                 technical_detail=technical_detail,
@@ -298,128 +717,135 @@ class NmapAgent(
             )
 
     def _emit_network_scan_finding(
-        self, scan_results: Dict[str, Any], normal_results: str
+        self, scan_result: models.ScanResult, normal_output: nmap_normal.NormalOutput
     ) -> None:
-        scan_result_technical_detail = process_scans.get_technical_details(scan_results)
-        if normal_results is not None:
-            technical_detail = (
-                f"{scan_result_technical_detail}\n```xml\n{normal_results}\n```"
+        # Services of the hosts go out before the report of their scan.
+        self._emitter.flush()
+        for host in scan_result.hosts:
+            # Each report only carries the services and the nmap output of its own host.
+            technical_detail = process_scans.get_host_technical_details(
+                host, normal_output
             )
-            hosts = scan_results.get("nmaprun", {}).get("host", {})
-            if isinstance(hosts, dict) is True:
-                hosts = [hosts]
-            for host in hosts:
-                domains = host.get("hostnames", {})
-                ports = host.get("ports", {}).get("port", "")
-                address = host.get("address", {})
-                if domains is not None and len(domains.values()) > 0:
-                    self._emit_network_domain_name_finding(
-                        domains, technical_detail, ports
-                    )
-                elif address.get("@addrtype", "") == "ipv4":
-                    self.report_vulnerability(
-                        entry=kb.KB.NETWORK_PORT_SCAN,
-                        technical_detail=technical_detail,
-                        risk_rating=vuln_mixin.RiskRating.INFO,
-                        vulnerability_location=vuln_mixin.VulnerabilityLocation(
-                            metadata=self._prepare_metadata(ports),
-                            asset=ipv4_asset.IPv4(host=address.get("@addr", "")),
-                        ),
-                    )
-                elif address.get("@addrtype", "") == "ipv6":
-                    self.report_vulnerability(
-                        entry=kb.KB.NETWORK_PORT_SCAN,
-                        technical_detail=technical_detail,
-                        risk_rating=vuln_mixin.RiskRating.INFO,
-                        vulnerability_location=vuln_mixin.VulnerabilityLocation(
-                            metadata=self._prepare_metadata(ports),
-                            asset=ipv6_asset.IPv6(host=address.get("@addr", "")),
-                        ),
-                    )
+            if len(host.hostnames) > 0:
+                self._emit_network_domain_name_finding(
+                    host.hostnames, technical_detail, host.ports
+                )
+            elif host.addr_type == "ipv4":
+                self.report_vulnerability(
+                    entry=kb.KB.NETWORK_PORT_SCAN,
+                    technical_detail=technical_detail,
+                    risk_rating=vuln_mixin.RiskRating.INFO,
+                    vulnerability_location=vuln_mixin.VulnerabilityLocation(
+                        metadata=self._prepare_metadata(host.ports),
+                        asset=ipv4_asset.IPv4(host=host.address or ""),
+                    ),
+                )
+            elif host.addr_type == "ipv6":
+                self.report_vulnerability(
+                    entry=kb.KB.NETWORK_PORT_SCAN,
+                    technical_detail=technical_detail,
+                    risk_rating=vuln_mixin.RiskRating.INFO,
+                    vulnerability_location=vuln_mixin.VulnerabilityLocation(
+                        metadata=self._prepare_metadata(host.ports),
+                        asset=ipv6_asset.IPv6(host=host.address or ""),
+                    ),
+                )
 
     def _emit_services(
-        self, scan_results: Dict[str, Any], domain_name: Optional[str]
+        self, scan_result: models.ScanResult, domain_name: Optional[str]
     ) -> None:
         if domain_name is not None:
             logger.info("Services targeting domain `%s`.", domain_name)
             for data in result_parser.get_domain_name_services(
-                scan_results, domain_name
+                scan_result, domain_name
             ):
                 logger.info("Domain Service Identified %s.", data)
-                self.emit("v3.asset.domain_name.service", dict(data))
+                self._emitter.emit("v3.asset.domain_name.service", dict(data))
 
-        port_services = result_parser.get_port_services(scan_results)
+        port_services = result_parser.get_port_services(scan_result)
         for service in port_services:
             addr_version = service.get("addr_version")
             address = service.get("address")
             if addr_version == "ipv4":
                 selector = "v3.asset.ip.v4.port.service"
-                self.set_add(b"agent_nmap_asset", f"{address}/32")
+                self._coverage.record(ipaddress.ip_network(f"{address}/32"))
             elif addr_version == "ipv6":
                 selector = "v3.asset.ip.v6.port.service"
-                self.set_add(b"agent_nmap_asset", f"{address}/64")
+                # Only the host itself is scanned, its neighbours in the /64 are not.
+                self._coverage.record(ipaddress.ip_network(f"{address}/128"))
             else:
                 raise ValueError(f"Incorrect ip version {addr_version}")
 
             service_dict = dict(service)
             service_dict.pop("address")
             service_dict.pop("addr_version")
-            self.emit(selector, service_dict)
+            self._emitter.emit(selector, service_dict)
 
     def _emit_fingerprints(
-        self, scan_results: Dict[str, Any], domain_name: Optional[str]
+        self, scan_result: models.ScanResult, domain_name: Optional[str]
     ) -> None:
-        self._emit_os_fingerprints(scan_results)
-        self._emit_service_library_fingerprints(scan_results)
-        self._emit_domain_name_service_library_fingerprints(domain_name, scan_results)
+        self._emit_os_fingerprints(scan_result)
+        self._emit_service_library_fingerprints(scan_result)
+        self._emit_domain_name_service_library_fingerprints(domain_name, scan_result)
 
     def _emit_domain_name_service_library_fingerprints(
-        self, domain_name: str | None, scan_results: dict[str, Any]
+        self, domain_name: str | None, scan_result: models.ScanResult
     ) -> None:
         if domain_name is not None:
             for (
                 fingerprint
             ) in result_parser.get_domain_name_service_library_fingerprints(
-                scan_results, domain_name
+                scan_result, domain_name
             ):
-                self.emit(
-                    selector="v3.fingerprint.domain_name.service.library",
-                    data=dict(fingerprint),
+                self._emitter.emit(
+                    "v3.fingerprint.domain_name.service.library", dict(fingerprint)
                 )
 
-    def _emit_service_library_fingerprints(self, scan_results: dict[str, Any]) -> None:
-        for data in result_parser.get_service_libraries(scan_results):
+    def _emit_service_library_fingerprints(
+        self, scan_result: models.ScanResult
+    ) -> None:
+        for data in result_parser.get_service_libraries(scan_result):
             version = data.get("addr_version")
             address = data.get("host")
             if version == "ipv4":
                 selector = "v3.fingerprint.ip.v4.service.library"
-                self.set_add(b"agent_nmap_asset", f"{address}/32")
+                self._coverage.record(ipaddress.ip_network(f"{address}/32"))
             elif version == "ipv6":
                 selector = "v3.fingerprint.ip.v6.service.library"
-                self.set_add(b"agent_nmap_asset", f"{address}/64")
+                # Only the host itself is scanned, its neighbours in the /64 are not.
+                self._coverage.record(ipaddress.ip_network(f"{address}/128"))
             else:
                 raise ValueError(f"Incorrect ip version {version}")
             data_dict = dict(data)
             data_dict.pop("addr_version")
-            self.emit(selector, data_dict)
+            self._emitter.emit(selector, data_dict)
 
-    def _emit_os_fingerprints(self, scan_results: dict[str, Any]) -> None:
-        os_fingerprints = result_parser.get_os_fingerprints(scan_results)
+    def _emit_os_fingerprints(self, scan_result: models.ScanResult) -> None:
+        os_fingerprints = result_parser.get_os_fingerprints(scan_result)
         for fingerprint in os_fingerprints:
             version = fingerprint.get("version")
             address = fingerprint.get("host")
             if version == "ipv4":
                 selector = "v3.fingerprint.ip.v4.service.library"
-                self.set_add(b"agent_nmap_asset", f"{address}/32")
+                self._coverage.record(ipaddress.ip_network(f"{address}/32"))
             elif version == "ipv6":
                 selector = "v3.fingerprint.ip.v6.service.library"
-                self.set_add(b"agent_nmap_asset", f"{address}/64")
+                # Only the host itself is scanned, its neighbours in the /64 are not.
+                self._coverage.record(ipaddress.ip_network(f"{address}/128"))
             else:
                 raise ValueError(f"Incorrect ip version {version}")
 
             fingerprint_dict = dict(fingerprint)
             fingerprint_dict.pop("version")
-            self.emit(selector, fingerprint_dict)
+            self._emitter.emit(selector, fingerprint_dict)
+
+    def _mcp_server_environment(self) -> Dict[str, str]:
+        """Environment variables configuring the MCP server from the agent arguments that are set."""
+        return {
+            variable: str(self.args[arg])
+            for arg, variable in MCP_SERVER_ENVIRONMENT_ARGS.items()
+            if self.args.get(arg) is not None
+        }
 
     def _connect_to_vpn(self) -> None:
         """Connect to VPN."""
@@ -0,0 +1,234 @@
+"""Asyncio client of the Nmap Security Scanner.
+
+Scans run as asyncio subprocesses, so a single event loop can drive many of them without a thread per scan. Scans
+can be cancelled, bounded by a timeout and report their progress as nmap prints it.
+"""
+
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import re
+import subprocess
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from agent import models
+from agent import nmap_options
+from agent import nmap_wrapper
+from agent import workspace
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two progress reports of nmap, used when a progress callback is given.
+PROGRESS_INTERVAL = 5
+PROGRESS_PATTERN = re.compile(
+    r"^(?P<task>.+?) Timing: About (?P<percent>\d+(?:\.\d+)?)% done"
+    r"(?:; ETC: .*\((?P<remaining>[^)]+) remaining\))?"
+)
+
+
+class Error(Exception):
+    """Base Custom Error Class."""
+
+
+class ScanTimeoutError(Error):
+    """Error when a scan does not complete within its timeout."""
+
+
+@dataclasses.dataclass
+class ScanProgress:
+    """Progress of the running nmap task, as printed by `--stats-every`."""
+
+    task: str
+    percent: float
+    remaining: Optional[str] = None
+
+
+ProgressCallback = Callable[[ScanProgress], None]
+
+
+def parse_progress(line: str) -> Optional[ScanProgress]:
+    """Parse a progress line of the nmap output.
+
+    Args:
+        line: line printed by nmap, e.g. `SYN Stealth Scan Timing: About 45.50% done; ETC: 15:32 (0:00:36 remaining)`.
+
+    Returns:
+        the progress, None if the line does not report progress.
+    """
+    match = PROGRESS_PATTERN.match(line.strip())
+    if match is None:
+        return None
+    return ScanProgress(
+        task=match.group("task"),
+        percent=float(match.group("percent")),
+        remaining=match.group("remaining"),
+    )
+
+
+class AsyncNmapWrapper:
+    """Asyncio wrapper class for the Nmap Security Scanner.
+
+    Usage:
+        client = nmap_async_wrapper.AsyncNmapWrapper(options)
+        results = await asyncio.gather(*[client.scan_hosts(host, 32, timeout=600) for host in hosts])
+    """
+
+    def __init__(self, options: nmap_options.NmapOptions) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            options: options of the nmap scan.
+        """
+        self._options = options
+
+    async def scan_hosts(
+        self,
+        hosts: str,
+        mask: int,
+        timeout: Optional[float] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Tuple[models.ScanResult, str]:
+        """Run the scan with nmap.
+
+        Args:
+            hosts: which hosts to be scanned.
+            mask: mask to be used in the scan.
+            timeout: seconds after which the scan is stopped, no limit if None.
+            progress_callback: called with the progress of the scan as nmap reports it.
+
+        Returns:
+            result of the scan.
+
+        Raises:
+            ScanTimeoutError: when the scan does not complete within `timeout`.
+            subprocess.CalledProcessError: when nmap exits with an error.
+        """
+        async with self._checkout_scripts() as options:
+            with workspace.ScanWorkspace() as scan_workspace:
+                command = self._client(
+                    options, progress_callback
+                ).construct_command_host(hosts, mask, scan_workspace)
+                return await self._scan(
+                    command, scan_workspace, timeout, progress_callback
+                )
+
+    async def scan_domain(
+        self,
+        domain_name: str,
+        timeout: Optional[float] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Tuple[models.ScanResult, str]:
+        """Run the scan with nmap.
+
+        Args:
+            domain_name: which domain name to be scanned.
+            timeout: seconds after which the scan is stopped, no limit if None.
+            progress_callback: called with the progress of the scan as nmap reports it.
+
+        Returns:
+            result of the scan.
+
+        Raises:
+            ScanTimeoutError: when the scan does not complete within `timeout`.
+            subprocess.CalledProcessError: when nmap exits with an error.
+        """
+        async with self._checkout_scripts() as options:
+            with workspace.ScanWorkspace() as scan_workspace:
+                command = self._client(
+                    options, progress_callback
+                ).construct_command_domain(domain_name, scan_workspace)
+                return await self._scan(
+                    command, scan_workspace, timeout, progress_callback
+                )
+
+    async def scan_targets(
+        self,
+        targets: List[str],
+        timeout: Optional[float] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Tuple[models.ScanResult, str]:
+        """Run the scan of a batch of targets with nmap.
+
+        Args:
+            targets: networks to be scanned, in CIDR notation.
+            timeout: seconds after which the scan is stopped, no limit if None.
+            progress_callback: called with the progress of the scan as nmap reports it.
+
+        Returns:
+            result of the scan.
+
+        Raises:
+            ScanTimeoutError: when the scan does not complete within `timeout`.
+            subprocess.CalledProcessError: when nmap exits with an error.
+        """
+        async with self._checkout_scripts() as options:
+            with workspace.ScanWorkspace() as scan_workspace:
+                command = self._client(
+                    options, progress_callback
+                ).construct_command_targets(targets, scan_workspace)
+                return await self._scan(
+                    command, scan_workspace, timeout, progress_callback
+                )
+
+    @contextlib.asynccontextmanager
+    async def _checkout_scripts(self) -> AsyncIterator[nmap_options.NmapOptions]:
+        """Options running the cached copies of the remote scripts, checked out in a thread as downloading them
+        blocks."""
+        with contextlib.ExitStack() as checkouts:
+            yield await asyncio.to_thread(
+                checkouts.enter_context, self._options.checkout_scripts()
+            )
+
+    def _client(
+        self,
+        options: nmap_options.NmapOptions,
+        progress_callback: Optional[ProgressCallback],
+    ) -> nmap_wrapper.NmapWrapper:
+        """Blocking wrapper building the commands, with progress reports enabled when they are consumed."""
+        if progress_callback is not None and options.stats_every is None:
+            options = dataclasses.replace(options, stats_every=PROGRESS_INTERVAL)
+        return nmap_wrapper.NmapWrapper(options)
+
+    async def _scan(
+        self,
+        command: List[str],
+        scan_workspace: workspace.ScanWorkspace,
+        timeout: Optional[float],
+        progress_callback: Optional[ProgressCallback],
+    ) -> Tuple[models.ScanResult, str]:
+        await self._run(command, timeout, progress_callback)
+        # Parsing large outputs is CPU bound, keep it off the event loop.
+        return await asyncio.to_thread(nmap_wrapper.read_outputs, scan_workspace)
+
+    async def _run(
+        self,
+        command: List[str],
+        timeout: Optional[float],
+        progress_callback: Optional[ProgressCallback],
+    ) -> None:
+        """Run nmap until it exits, killing it when the scan times out or the calling task is cancelled."""
+        logger.info("running the nmap scan")
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE if progress_callback is not None else None,
+        )
+        try:
+            async with asyncio.timeout(timeout):
+                if process.stdout is not None and progress_callback is not None:
+                    async for line in process.stdout:
+                        progress = parse_progress(line.decode(errors="replace"))
+                        if progress is not None:
+                            progress_callback(progress)
+                await process.wait()
+        except TimeoutError as e:
+            raise ScanTimeoutError(
+                f"nmap scan did not complete within {timeout} seconds"
+            ) from e
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode or 0, command)
@@ -0,0 +1,115 @@
+"""Index of the nmap normal output (-oN), split in the sections reported for each host.
+
+The index only keeps the offsets of the section of each host, and a section is decoded when it is looked up. When
+the output is read from its file, the file is memory-mapped, so attaching the section of a host to its report
+neither reads the whole output in memory nor copies it.
+"""
+
+import mmap
+import re
+from types import TracebackType
+from typing import Dict, Optional, Tuple, Type
+
+ENCODING = "utf-8"
+
+_SCAN_REPORT_PATTERN = re.compile(
+    rb"^Nmap scan report for (\S+)(?: \((\S+)\))?", re.MULTILINE
+)
+_COMMAND_PATTERN = re.compile(rb"^# Nmap [^\n]*? as: ([^\n]*?)\s*$", re.MULTILINE)
+_SCAN_DONE_PATTERN = re.compile(rb"^# Nmap done", re.MULTILINE)
+
+
+class NormalOutput:
+    """Normal output of an nmap run, indexed on the first lookup.
+
+    Usage:
+        with nmap_normal.NormalOutput.open(scan_workspace.normal_output_path) as normal_output:
+            section = normal_output.section("10.0.0.1")
+    """
+
+    def __init__(self, data: bytes | mmap.mmap) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            data: content of the normal output.
+        """
+        self._data = data
+        self._sections: Optional[Dict[str, Tuple[int, int]]] = None
+
+    @classmethod
+    def from_text(cls, normal_results: str) -> "NormalOutput":
+        """Index a normal output already read in memory."""
+        return cls(normal_results.encode(ENCODING))
+
+    @classmethod
+    def open(cls, path: str) -> "NormalOutput":
+        """Memory-map the normal output file, the mapping is released by `close`."""
+        with open(path, "rb") as normal_file:
+            # Empty files can not be mapped.
+            if normal_file.seek(0, 2) == 0:
+                return cls(b"")
+            return cls(mmap.mmap(normal_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __enter__(self) -> "NormalOutput":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    @property
+    def text(self) -> str:
+        """Whole output, only meant for outputs without host sections."""
+        return self._decode(0, len(self._data))
+
+    @property
+    def command(self) -> Optional[str]:
+        """nmap command line of the run, as recorded in the output header."""
+        match = _COMMAND_PATTERN.search(self._data)
+        if match is None:
+            return None
+        return match.group(1).decode(ENCODING, errors="replace")
+
+    @property
+    def size(self) -> int:
+        """Length of the output, in bytes."""
+        return len(self._data)
+
+    @property
+    def sections(self) -> Dict[str, Tuple[int, int]]:
+        """Offsets of the section of each reported host, by address."""
+        if self._sections is None:
+            self._sections = self._index()
+        return self._sections
+
+    def section(self, address: str) -> Optional[str]:
+        """Section of the output reporting the host, None if the host is not reported."""
+        bounds = self.sections.get(address)
+        if bounds is None:
+            return None
+        return self._decode(*bounds).rstrip()
+
+    def _decode(self, start: int, end: int) -> str:
+        return self._data[start:end].decode(ENCODING, errors="replace")
+
+    def _index(self) -> Dict[str, Tuple[int, int]]:
+        reports = list(_SCAN_REPORT_PATTERN.finditer(self._data))
+        done = _SCAN_DONE_PATTERN.search(
+            self._data, reports[-1].end() if len(reports) > 0 else 0
+        )
+        output_end = done.start() if done is not None else len(self._data)
+        sections: Dict[str, Tuple[int, int]] = {}
+        for index, report in enumerate(reports):
+            end = reports[index + 1].start() if index + 1 < len(reports) else output_end
+            # Hosts with a name are reported as `name (address)`.
+            address = report.group(2) or report.group(1)
+            sections.setdefault(address.decode(ENCODING), (report.start(), end))
+        return sections
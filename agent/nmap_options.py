@@ -1,12 +1,13 @@
 """Options defining an Nmap scan settings."""
 
+import contextlib
 import dataclasses
 import enum
+import hashlib
 import logging
-import tempfile
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
-import requests
+from agent import script_cache
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +64,13 @@ class NmapOptions:
     no_ping: bool = True
     privileged: Optional[bool] = None
     host_timeout: Optional[int] = None
+    max_rate: Optional[int] = None
+    min_rate: Optional[int] = None
+    stats_every: Optional[int] = None
+    ping_scan: bool = False
+    scripts_cache: Optional[script_cache.ScriptCache] = dataclasses.field(
+        default=None, compare=False, repr=False
+    )
 
     def _set_os_detection_option(self) -> List[str]:
         """Appends the os detection option to the list of nmap options."""
@@ -140,27 +148,101 @@ class NmapOptions:
     def _run_scripts_command(self, scripts: List[str]) -> List[str]:
         """Run nmap scan on the provided scripts"""
 
+        cache = self.scripts_cache or script_cache.default_cache()
         command = []
         for script in scripts:
-            if script.startswith("http"):
-                with tempfile.NamedTemporaryFile(delete=False) as t:
-                    r = requests.get(script, allow_redirects=True, timeout=60)
-                    t.write(r.content)
-                    command.extend(["--script", t.name])
+            if script_cache.is_remote_script(script):
+                try:
+                    command.extend(["--script", cache.get(script)])
+                except script_cache.ScriptDownloadError as e:
+                    logger.error("Skipping script: %s", e)
             else:
                 command += ["--script", script]
 
         return command
 
+    @contextlib.contextmanager
+    def checkout_scripts(self) -> Iterator["NmapOptions"]:
+        """Options running the cached copies of the remote scripts, which are kept in the cache until the block exits.
+
+        Scripts that can not be downloaded are skipped, as by `command_options`.
+        """
+        if (
+            self.scripts is None
+            or any(map(script_cache.is_remote_script, self.scripts)) is False
+        ):
+            yield self
+            return
+
+        cache = self.scripts_cache or script_cache.default_cache()
+        with contextlib.ExitStack() as checkouts:
+            scripts = []
+            for script in self.scripts:
+                if script_cache.is_remote_script(script) is False:
+                    scripts.append(script)
+                    continue
+                try:
+                    scripts.append(checkouts.enter_context(cache.checkout(script)))
+                except script_cache.ScriptDownloadError as e:
+                    logger.error("Skipping script: %s", e)
+            yield dataclasses.replace(self, scripts=scripts)
+
     def _set_host_timeout(self) -> List[str]:
         if self.host_timeout is not None:
             return ["--host-timeout", str(self.host_timeout)]
         else:
             return []
 
+    def _set_max_rate(self) -> List[str]:
+        """Caps the packets sent per second, bounding the resources a single scan may use."""
+        if self.max_rate is not None:
+            return ["--max-rate", str(self.max_rate)]
+        else:
+            return []
+
+    def _set_min_rate(self) -> List[str]:
+        """Keeps sending at least `min_rate` packets per second, used by fast discovery sweeps."""
+        if self.min_rate is not None:
+            return ["--min-rate", str(self.min_rate)]
+        else:
+            return []
+
+    def _set_stats_every(self) -> List[str]:
+        """Makes nmap print its progress every `stats_every` seconds."""
+        if self.stats_every is not None:
+            return ["--stats-every", f"{self.stats_every}s"]
+        else:
+            return []
+
+    def _ping_scan_command_options(self) -> List[str]:
+        """Options of a host discovery sweep (-sn), only reporting the hosts that are up."""
+        command_options = []
+        command_options.extend(self._set_dns_resolution_option())
+        command_options.extend(self._set_timing_option())
+        command_options.append("-sn")
+        if self.tcp_syn_ping_ports is not None:
+            command_options.append(f"-PS{self.tcp_syn_ping_ports}")
+        command_options.extend(self._set_privileged())
+        command_options.extend(self._set_host_timeout())
+        command_options.extend(self._set_max_rate())
+        command_options.extend(self._set_min_rate())
+        command_options.extend(self._set_stats_every())
+        return command_options
+
+    def fingerprint(self) -> str:
+        """Digest of the options, equal for options running the same scan."""
+        values = [
+            (field.name, getattr(self, field.name))
+            for field in dataclasses.fields(self)
+            if field.compare is True
+        ]
+        return hashlib.sha256(repr(values).encode()).hexdigest()
+
     @property
     def command_options(self) -> List[str]:
         """Computes the list of nmap options."""
+        if self.ping_scan is True:
+            return self._ping_scan_command_options()
         command_options = []
         command_options.extend(self._set_os_detection_option())
         command_options.extend(self._set_version_detection_option())
@@ -173,4 +255,7 @@ class NmapOptions:
         command_options.extend(self._set_scripts())
         command_options.extend(self._set_script_default())
         command_options.extend(self._set_host_timeout())
+        command_options.extend(self._set_max_rate())
+        command_options.extend(self._set_min_rate())
+        command_options.extend(self._set_stats_every())
         return command_options
@@ -1,17 +1,18 @@
 """Wrapper for Nmap Network Scanner."""
 
+import contextlib
 import ipaddress
 import logging
 import subprocess
 from xml.parsers import expat
-from typing import Any, Dict, List, Tuple
+from typing import Any, Iterator, List, Tuple
 
 import xmltodict
 
 from agent import nmap_options
-
-XML_OUTPUT_PATH = "/tmp/xmloutput"
-NORMAL_OUTPUT_PATH = "/tmp/normal"
+from agent import models
+from agent import nmap_xml
+from agent import workspace
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,31 @@ def parse_output(xml_output: str) -> dict[str, Any]:
         return {}
 
 
+def read_outputs(
+    scan_workspace: workspace.ScanWorkspace,
+) -> Tuple[models.ScanResult, str]:
+    """Read the XML and normal outputs of a completed scan.
+
+    Hosts are built one element at a time by the incremental parser, the XML output is never held whole in memory.
+
+    Args:
+        scan_workspace: workspace holding the outputs of the scan.
+
+    Returns:
+        typed XML output and normal output of the scan.
+    """
+    scan_result = models.ScanResult(
+        hosts=tuple(
+            models.Host.from_element(host)
+            for host in nmap_xml.iter_host_elements(scan_workspace.xml_output_path)
+        )
+    )
+
+    normal_results = scan_workspace.read_normal_output()
+
+    return scan_result, normal_results
+
+
 class NmapWrapper:
     """Wrapper class for the Nmap Security Scanner."""
 
@@ -46,13 +72,16 @@ class NmapWrapper:
         """
         self._options = options
 
-    def construct_command_host(self, host: str, mask: int) -> List[str]:
+    def construct_command_host(
+        self, host: str, mask: int, scan_workspace: workspace.ScanWorkspace
+    ) -> List[str]:
         """
         Construct the Nmap command to be run.
 
         Args:
             host: which host to be scanned.
             mask: mask to be used in the scan.
+            scan_workspace: workspace receiving the scan output files.
 
         Returns:
             list of the arguments that will be used to run the scan process.
@@ -62,21 +91,64 @@ class NmapWrapper:
             "nmap",
             *self._options.command_options,
             "-oX",
-            XML_OUTPUT_PATH,
+            scan_workspace.xml_output_path,
             "-oN",
-            NORMAL_OUTPUT_PATH,
+            scan_workspace.normal_output_path,
         ]
         if ip_version == 6:
             command.append("-6")
         command.append(f"{host}/{mask}")
         return command
 
-    def _construct_command_domain(self, domain_name: str) -> List[str]:
+    def construct_command_targets(
+        self, targets: List[str], scan_workspace: workspace.ScanWorkspace
+    ) -> List[str]:
+        """
+        Construct the Nmap command scanning a batch of targets in a single run.
+
+        The targets are written to the input list of the workspace and passed with `-iL`, so nmap loads its
+        scripts and fingerprint databases once for the whole batch.
+
+        Args:
+            targets: networks to be scanned, in CIDR notation, all of the same IP version.
+            scan_workspace: workspace receiving the input list and the scan output files.
+
+        Returns:
+            list of the arguments that will be used to run the scan process.
+
+        Raises:
+            ValueError: when the batch is empty or mixes IPv4 and IPv6 targets.
+        """
+        ip_versions = {
+            ipaddress.ip_network(target, strict=False).version for target in targets
+        }
+        if len(ip_versions) != 1:
+            raise ValueError("Targets of a batch must all share the same IP version.")
+
+        with open(scan_workspace.targets_path, "w", encoding="utf-8") as o:
+            o.write("\n".join(targets))
+        command = [
+            "nmap",
+            *self._options.command_options,
+            "-oX",
+            scan_workspace.xml_output_path,
+            "-oN",
+            scan_workspace.normal_output_path,
+        ]
+        if ip_versions.pop() == 6:
+            command.append("-6")
+        command.extend(["-iL", scan_workspace.targets_path])
+        return command
+
+    def construct_command_domain(
+        self, domain_name: str, scan_workspace: workspace.ScanWorkspace
+    ) -> List[str]:
         """
         Construct the Nmap command to be run.
 
         Args:
             domain: which domain to be scanned.
+            scan_workspace: workspace receiving the scan output files.
 
         Returns:
             list of the arguments that will be used to run the scan process.
@@ -85,37 +157,154 @@ class NmapWrapper:
             "nmap",
             *self._options.command_options,
             "-oX",
-            XML_OUTPUT_PATH,
+            scan_workspace.xml_output_path,
             "-oN",
-            NORMAL_OUTPUT_PATH,
+            scan_workspace.normal_output_path,
             domain_name,
         ]
         return command
 
-    def scan_hosts(self, hosts: str, mask: int) -> Tuple[Dict[str, Any], str]:
-        """Run the scan with nmap.
+    def run_scan_hosts(
+        self, hosts: str, mask: int, scan_workspace: workspace.ScanWorkspace
+    ) -> None:
+        """Run the scan with nmap, leaving its outputs in the workspace.
 
         Args:
             hosts: which hosts to be scanned.
             mask: mask to be used in the scan.
+            scan_workspace: opened workspace receiving the scan outputs.
+        """
+        logger.info("running the nmap scan")
+        with self._checkout_scripts() as client:
+            command = client.construct_command_host(hosts, mask, scan_workspace)
+            subprocess.run(command, check=True)
 
-        Returns:
-            result of the scan.
+    def run_scan_domain(
+        self, domain_name: str, scan_workspace: workspace.ScanWorkspace
+    ) -> None:
+        """Run the scan with nmap, leaving its outputs in the workspace.
+
+        Args:
+            domain_name: which domain name to be scanned.
+            scan_workspace: opened workspace receiving the scan outputs.
         """
         logger.info("running the nmap scan")
-        command = self.construct_command_host(hosts, mask)
+        with self._checkout_scripts() as client:
+            command = client.construct_command_domain(domain_name, scan_workspace)
+            subprocess.run(command, check=True)
 
-        subprocess.run(command, check=True)
+    def run_scan_targets(
+        self, targets: List[str], scan_workspace: workspace.ScanWorkspace
+    ) -> None:
+        """Run the scan of a batch of targets with nmap, leaving its outputs in the workspace.
 
-        with open(XML_OUTPUT_PATH, "r", encoding="utf-8") as o:
-            scan_results = parse_output(o.read())
+        Args:
+            targets: networks to be scanned, in CIDR notation.
+            scan_workspace: opened workspace receiving the scan outputs.
+        """
+        logger.info("running the nmap scan")
+        with self._checkout_scripts() as client:
+            command = client.construct_command_targets(targets, scan_workspace)
+            subprocess.run(command, check=True)
+
+    def iter_scan_hosts(
+        self, hosts: str, mask: int, scan_workspace: workspace.ScanWorkspace
+    ) -> Iterator[models.Host]:
+        """Run the scan with nmap and yield every host as soon as nmap reports it.
+
+        Args:
+            hosts: which hosts to be scanned.
+            mask: mask to be used in the scan.
+            scan_workspace: opened workspace receiving the scan outputs.
 
-        with open(NORMAL_OUTPUT_PATH, "r", encoding="utf-8") as o:
-            normal_results = o.read()
+        Yields:
+            every scanned host.
+
+        Raises:
+            subprocess.CalledProcessError: when nmap exits with an error, after the hosts it reported are yielded.
+        """
+        with self._checkout_scripts() as client:
+            command = client.construct_command_host(hosts, mask, scan_workspace)
+            yield from self._run_live(command, scan_workspace)
 
-        return scan_results, normal_results
+    def iter_scan_domain(
+        self, domain_name: str, scan_workspace: workspace.ScanWorkspace
+    ) -> Iterator[models.Host]:
+        """Run the scan with nmap and yield every host as soon as nmap reports it.
+
+        Args:
+            domain_name: which domain name to be scanned.
+            scan_workspace: opened workspace receiving the scan outputs.
+
+        Yields:
+            every scanned host.
+
+        Raises:
+            subprocess.CalledProcessError: when nmap exits with an error, after the hosts it reported are yielded.
+        """
+        with self._checkout_scripts() as client:
+            command = client.construct_command_domain(domain_name, scan_workspace)
+            yield from self._run_live(command, scan_workspace)
+
+    def iter_scan_targets(
+        self, targets: List[str], scan_workspace: workspace.ScanWorkspace
+    ) -> Iterator[models.Host]:
+        """Run the scan of a batch of targets with nmap and yield every host as soon as nmap reports it.
+
+        Args:
+            targets: networks to be scanned, in CIDR notation.
+            scan_workspace: opened workspace receiving the scan outputs.
 
-    def scan_domain(self, domain_name: str) -> Tuple[Dict[str, Any], str]:
+        Yields:
+            every scanned host.
+
+        Raises:
+            subprocess.CalledProcessError: when nmap exits with an error, after the hosts it reported are yielded.
+        """
+        with self._checkout_scripts() as client:
+            command = client.construct_command_targets(targets, scan_workspace)
+            yield from self._run_live(command, scan_workspace)
+
+    @contextlib.contextmanager
+    def _checkout_scripts(self) -> Iterator["NmapWrapper"]:
+        """Wrapper running the cached copies of the remote scripts, kept in the cache until the block exits."""
+        with self._options.checkout_scripts() as options:
+            yield NmapWrapper(options)
+
+    def _run_live(
+        self, command: List[str], scan_workspace: workspace.ScanWorkspace
+    ) -> Iterator[models.Host]:
+        """Run nmap in the background while tailing its XML output."""
+        logger.info("running the nmap scan")
+        process = subprocess.Popen(command)
+        try:
+            for host in nmap_xml.tail_host_elements(
+                scan_workspace.xml_output_path, lambda: process.poll() is None
+            ):
+                yield models.Host.from_element(host)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+    def scan_hosts(self, hosts: str, mask: int) -> Tuple[models.ScanResult, str]:
+        """Run the scan with nmap.
+
+        Args:
+            hosts: which hosts to be scanned.
+            mask: mask to be used in the scan.
+
+        Returns:
+            result of the scan.
+        """
+        with workspace.ScanWorkspace() as scan_workspace:
+            self.run_scan_hosts(hosts, mask, scan_workspace)
+            return read_outputs(scan_workspace)
+
+    def scan_domain(self, domain_name: str) -> Tuple[models.ScanResult, str]:
         """Run the scan with nmap.
 
         Args:
@@ -124,14 +313,19 @@ class NmapWrapper:
         Returns:
             result of the scan.
         """
-        logger.info("running the nmap scan")
-        command = self._construct_command_domain(domain_name)
-        subprocess.run(command, check=True)
+        with workspace.ScanWorkspace() as scan_workspace:
+            self.run_scan_domain(domain_name, scan_workspace)
+            return read_outputs(scan_workspace)
 
-        with open(XML_OUTPUT_PATH, "r", encoding="utf-8") as o:
-            scan_results = parse_output(o.read())
+    def scan_targets(self, targets: List[str]) -> Tuple[models.ScanResult, str]:
+        """Run the scan of a batch of targets with nmap.
 
-        with open(NORMAL_OUTPUT_PATH, "r", encoding="utf-8") as o:
-            normal_results = o.read()
+        Args:
+            targets: networks to be scanned, in CIDR notation.
 
-        return scan_results, normal_results
+        Returns:
+            result of the scan.
+        """
+        with workspace.ScanWorkspace() as scan_workspace:
+            self.run_scan_targets(targets, scan_workspace)
+            return read_outputs(scan_workspace)
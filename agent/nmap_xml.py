@@ -0,0 +1,198 @@
+"""Incremental parser of the nmap XML output.
+
+The parser yields every `<host>` element as soon as it is closed and detaches it from the document right after, so
+memory stays flat regardless of the size of the scan. Host elements are either converted to `models.Host` directly or
+to the same dict layout `xmltodict` produces.
+"""
+
+import contextlib
+import logging
+import os
+import time
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, cast
+from xml.etree import ElementTree
+
+logger = logging.getLogger(__name__)
+
+HOST_TAG = "host"
+READ_CHUNK_SIZE = 64 * 1024
+TAIL_POLL_INTERVAL = 0.5
+
+
+def element_to_dict(element: ElementTree.Element) -> Any:
+    """Convert an XML element to the structure produced by `xmltodict`.
+
+    Attributes are prefixed with `@`, repeated children are grouped in a list, text is stored under `#text` when the
+    element also has attributes or children, and empty elements are converted to `None`.
+
+    Args:
+        element: XML element to convert.
+
+    Returns:
+        dict, string or None representing the element.
+    """
+    data: Dict[str, Any] = {f"@{key}": value for key, value in element.attrib.items()}
+    for child in element:
+        child_data = element_to_dict(child)
+        existing = data.get(child.tag)
+        if child.tag not in data:
+            data[child.tag] = child_data
+        elif isinstance(existing, list):
+            existing.append(child_data)
+        else:
+            data[child.tag] = [existing, child_data]
+
+    text = element.text.strip() if element.text is not None else ""
+    if text != "":
+        if len(data) == 0:
+            return text
+        data["#text"] = text
+    if len(data) == 0:
+        return None
+    return data
+
+
+def as_scan_results(host: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap a single host in the layout of a complete parsed scan."""
+    return {"nmaprun": {"host": host}}
+
+
+class HostStreamParser:
+    """Push parser turning chunks of nmap XML output into host elements.
+
+    Usage:
+        parser = nmap_xml.HostStreamParser()
+        for chunk in chunks:
+            for host in parser.feed(chunk):
+                ...
+        for host in parser.close():
+            ...
+    """
+
+    def __init__(self) -> None:
+        self._parser: ElementTree.XMLPullParser[ElementTree.Element] = (
+            ElementTree.XMLPullParser(events=("start", "end"))
+        )
+        self._root: Optional[ElementTree.Element] = None
+        self._depth = 0
+
+    def feed(self, data: bytes) -> List[ElementTree.Element]:
+        """Feed a chunk of the XML output.
+
+        Args:
+            data: next chunk of the XML output.
+
+        Returns:
+            list of the hosts completed by this chunk.
+
+        Raises:
+            ElementTree.ParseError: when the XML output is malformed.
+        """
+        self._parser.feed(data)
+        return self._read_hosts()
+
+    def close(self) -> List[ElementTree.Element]:
+        """Signal the end of the XML output.
+
+        Returns:
+            list of the hosts completed by the last chunk.
+
+        Raises:
+            ElementTree.ParseError: when the XML output is malformed or truncated.
+        """
+        self._parser.close()
+        return self._read_hosts()
+
+    def _read_hosts(self) -> List[ElementTree.Element]:
+        hosts = []
+        events = cast(
+            Iterator[Tuple[str, ElementTree.Element]], self._parser.read_events()
+        )
+        for event, element in events:
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+                self._depth += 1
+                continue
+
+            self._depth -= 1
+            # Only direct children of the root are hosts, the `host` tag is not reused deeper in nmap outputs.
+            if element.tag == HOST_TAG and self._depth == 1:
+                hosts.append(element)
+                if self._root is not None:
+                    self._root.clear()
+        return hosts
+
+
+def iter_hosts(xml_output_path: str) -> Iterator[Dict[str, Any]]:
+    """Iterate over the hosts of an nmap XML output file.
+
+    Args:
+        xml_output_path: path of the XML output file.
+
+    Yields:
+        dict of every host of the scan, in the `xmltodict` layout.
+    """
+    for host in iter_host_elements(xml_output_path):
+        yield element_to_dict(host)
+
+
+def iter_host_elements(xml_output_path: str) -> Iterator[ElementTree.Element]:
+    """Iterate over the host elements of an nmap XML output file.
+
+    Malformed or truncated outputs are logged and stop the iteration after the last complete host.
+
+    Args:
+        xml_output_path: path of the XML output file.
+
+    Yields:
+        element of every host of the scan.
+    """
+    parser = HostStreamParser()
+    try:
+        with open(xml_output_path, "rb") as o:
+            while chunk := o.read(READ_CHUNK_SIZE):
+                yield from parser.feed(chunk)
+        yield from parser.close()
+    except ElementTree.ParseError as parsing_error:
+        logger.error("Error parsing XML output %s: %s", xml_output_path, parsing_error)
+
+
+def tail_host_elements(
+    xml_output_path: str,
+    is_running: Callable[[], bool],
+    poll_interval: float = TAIL_POLL_INTERVAL,
+) -> Iterator[ElementTree.Element]:
+    """Follow an nmap XML output file while nmap is writing it.
+
+    Hosts are yielded as soon as nmap flushes their closing tag. Once `is_running` returns False, the rest of the
+    file is consumed and the iteration ends.
+
+    Args:
+        xml_output_path: path of the XML output file, it does not need to exist yet.
+        is_running: callable returning whether nmap is still writing the file.
+        poll_interval: seconds to wait between two reads when no new data is available.
+
+    Yields:
+        element of every host of the scan.
+    """
+    parser = HostStreamParser()
+    xml_output: Optional[IO[bytes]] = None
+    try:
+        with contextlib.ExitStack() as files:
+            while True:
+                # Checked before reading, so the last read happens after nmap is done writing.
+                running = is_running()
+                if xml_output is None and os.path.exists(xml_output_path) is True:
+                    xml_output = files.enter_context(open(xml_output_path, "rb"))
+                if xml_output is not None:
+                    while chunk := xml_output.read(READ_CHUNK_SIZE):
+                        yield from parser.feed(chunk)
+                if running is False:
+                    break
+                time.sleep(poll_interval)
+
+            if xml_output is not None:
+                yield from parser.close()
+    except ElementTree.ParseError as parsing_error:
+        logger.error("Error parsing XML output %s: %s", xml_output_path, parsing_error)
@@ -1,22 +1,71 @@
 """Processing scans returned by the nmap agent."""
 
-from typing import Dict, List
+from typing import Optional, Tuple
 
 from agent import markdown
+from agent import models
+from agent import nmap_normal
 
+# Technical details are attached to the report of every host, they are truncated beyond this length.
+MAX_TECHNICAL_DETAIL_LENGTH = 100_000
 
-def get_technical_details(
-    scans: Dict[
-        str, Dict[str, List[Dict[str, Dict[str, str]]] | Dict[str, Dict[str, str]]]
-    ],
-) -> str:
+
+def get_technical_details(scans: models.ScanResult) -> str:
     """Returns a markdown table of the technical report of the scan.
     Each row presents a service with the host, port, version, protocol, state, and service name.
     Args:
-        scans : Dictionary of the scans.
+        scans : Typed result of the scan.
     Returns:
         technical_detail : Markdown table of the scans results.
     """
-    prepared_scans = markdown.prepare_data_for_markdown_formatting(scans)
-    technical_detail = markdown.table_markdown(prepared_scans)
-    return technical_detail
+    return markdown.table_markdown(markdown.iter_rows(scans))
+
+
+def get_host_technical_details(
+    host: models.Host,
+    normal_output: nmap_normal.NormalOutput,
+    max_length: int = MAX_TECHNICAL_DETAIL_LENGTH,
+) -> str:
+    """Returns the technical report of a single host: its services and its section of the nmap output.
+
+    Reports longer than `max_length` are truncated, table included, and end with a note giving the bytes of the nmap
+    normal output (-oN) holding the whole section of the host.
+
+    Args:
+        host: Typed result of the host.
+        normal_output: normal output of the nmap run that scanned the host.
+        max_length: length beyond which the report is truncated.
+    Returns:
+        technical_detail : Markdown table of the host services followed by the nmap output of the host.
+    """
+    table = get_technical_details(models.ScanResult(hosts=(host,)))
+    section, bounds = _host_section(host, normal_output)
+    technical_detail = table if section is None else f"{table}\n```xml\n{section}\n```"
+    if len(technical_detail) <= max_length:
+        return technical_detail
+
+    overflow = f"\nTruncated from {len(technical_detail)} to {max_length} characters."
+    if bounds is not None:
+        overflow += (
+            f" The whole nmap output of {host.address} is at bytes {bounds[0]} to "
+            f"{bounds[1]} of the normal output (-oN) of the scan."
+        )
+    available_length = max(max_length - len(overflow), 0)
+    section_length = available_length - len(table) - len("\n```xml\n\n```")
+    if section is None or section_length <= 0:
+        # Whole rows of the table are kept, the note alone is cut when it does not fit.
+        table = table[: table.rfind("\n", 0, available_length) + 1]
+        return f"{table}{overflow}".lstrip("\n")[:max_length]
+    return f"{table}\n```xml\n{section[:section_length]}\n```{overflow}"
+
+
+def _host_section(
+    host: models.Host, normal_output: nmap_normal.NormalOutput
+) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Section of the normal output reporting the host and its bounds in bytes, None if the host is not reported."""
+    if len(normal_output.sections) == 0:
+        # Outputs not following the nmap layout are kept whole.
+        return normal_output.text, (0, normal_output.size)
+    if host.address is None:
+        return None, None
+    return normal_output.section(host.address), normal_output.sections.get(host.address)
@@ -1,7 +1,6 @@
-from typing import Any
 from typing_extensions import TypedDict
 
-from agent import generators
+from agent import models
 
 
 class DomainNameService(TypedDict):
@@ -13,7 +12,7 @@ class DomainNameService(TypedDict):
 
 class PortService(TypedDict):
     host: str | None
-    version: str | None
+    version: int | str | None
     port: int
     protocol: str | None
     state: str | None
@@ -35,7 +34,7 @@ class OSFingerprint(TypedDict):
 class ServiceLibraryFingerprint(TypedDict):
     host: str | None
     mask: str
-    version: str | None
+    version: int | str | None
     library_type: str
     library_version: str | None
     service: str | None
@@ -60,205 +59,142 @@ BLACKLISTED_SERVICES = ["tcpwrapped"]
 
 
 def get_domain_name_services(
-    scan_results: dict[str, Any], domain_name: str
+    scan_result: models.ScanResult, domain_name: str
 ) -> list[DomainNameService]:
     domain_name_services = []
-    if scan_results is not None and scan_results.get("nmaprun") is not None:
-        for data in generators.get_services(scan_results):
-            if data.get("service") in BLACKLISTED_SERVICES:
+    for host in scan_result.hosts:
+        for port in host.ports:
+            if port.service.name in BLACKLISTED_SERVICES:
                 continue
             domain_name_service: DomainNameService = {
                 "name": domain_name,
-                "port": data.get("port"),
-                "schema": data.get("service"),
-                "state": data.get("state"),
+                "port": port.number,
+                "schema": port.service.name,
+                "state": port.state,
             }
             domain_name_services.append(domain_name_service)
     return domain_name_services
 
 
-def get_port_services(scan_results: dict[str, Any]) -> list[PortService]:
+def get_port_services(scan_result: models.ScanResult) -> list[PortService]:
     port_services = []
-    if scan_results is not None and scan_results.get("nmaprun") is not None:
-        up_hosts = scan_results["nmaprun"].get("host", [])
-        if isinstance(up_hosts, dict):
-            up_hosts = [up_hosts]
-
-        for host in up_hosts:
-            version = host.get("address", {}).get("@addrtype")
-            address = host.get("address", {}).get("@addr")
-            for data in generators.get_services(scan_results):
-                if data.get("service") in BLACKLISTED_SERVICES:
-                    continue
-                service: PortService = {
-                    "host": data.get("host"),
-                    "version": data.get("version"),
-                    "port": int(data.get("port") or 0),
-                    "protocol": data.get("protocol"),
-                    "state": data.get("state"),
-                    "service": data.get("service"),
-                    "banner": data.get("banner"),
-                    "address": address,
-                    "addr_version": version,
-                }
-                port_services.append(service)
+    for host in scan_result.hosts:
+        for port in host.ports:
+            if port.service.name in BLACKLISTED_SERVICES:
+                continue
+            service: PortService = {
+                "host": host.address,
+                "version": host.version,
+                "port": port.number,
+                "protocol": port.protocol,
+                "state": port.state,
+                "service": port.service.name,
+                "banner": port.banner,
+                "address": host.address,
+                "addr_version": host.addr_type,
+            }
+            port_services.append(service)
     return port_services
 
 
-def get_os_fingerprints(scan_results: dict[str, Any]) -> list[OSFingerprint]:
+def get_os_fingerprints(scan_result: models.ScanResult) -> list[OSFingerprint]:
     os_fingerprints = []
-    if (
-        scan_results is not None
-        and scan_results.get("nmaprun") is not None
-        and scan_results["nmaprun"].get("host") is not None
-    ):
-        up_hosts = scan_results["nmaprun"].get("host", [])
-        if isinstance(up_hosts, dict):
-            up_hosts = [up_hosts]
-
-        for host in up_hosts:
-            if (
-                host.get("os", {}) is not None
-                and host.get("os", {}).get("osmatch") is not None
-            ):
-                os_match = host.get("os").get("osmatch")
-                if isinstance(os_match, list):
-                    if len(os_match) > 0:
-                        os_match_highest = os_match[0]
-                        if isinstance(os_match_highest, dict):
-                            pass
-                        elif (
-                            isinstance(os_match_highest, list)
-                            and len(os_match_highest) > 0
-                        ):
-                            os_match_highest = os_match_highest[0]
-                        else:
-                            continue
-                    else:
-                        continue
-                elif isinstance(os_match, dict):
-                    os_match_highest = os_match
-                else:
-                    continue
-
-                os_class = os_match_highest.get("osclass", {})
-
-                if isinstance(os_class, list) and len(os_class) > 0:
-                    os_class = os_class[0]
-                elif os_class == []:
-                    continue
-
-                fingerprint: OSFingerprint = {
-                    "host": host.get("address", {}).get("@addr"),
-                    "version": host.get("address", {}).get("@addrtype"),
-                    "library_type": "OS",
-                    "library_name": os_class.get("@osfamily"),
-                    "library_version": os_class.get("@osgen"),
-                    "detail": os_match_highest.get("@name"),
-                }
-                os_fingerprints.append(fingerprint)
+    for host in scan_result.hosts:
+        if host.os_match is None:
+            continue
+        fingerprint: OSFingerprint = {
+            "host": host.address,
+            "version": host.addr_type,
+            "library_type": "OS",
+            "library_name": host.os_match.family,
+            "library_version": host.os_match.generation,
+            "detail": host.os_match.name,
+        }
+        os_fingerprints.append(fingerprint)
     return os_fingerprints
 
 
 def get_service_libraries(
-    scan_results: dict[str, Any],
+    scan_result: models.ScanResult,
 ) -> list[ServiceLibraryFingerprint]:
     libraries = []
-    if (
-        scan_results is not None
-        and scan_results.get("nmaprun") is not None
-        and scan_results["nmaprun"].get("host") is not None
-    ):
-        up_hosts = scan_results["nmaprun"].get("host", [])
-        if isinstance(up_hosts, dict):
-            up_hosts = [up_hosts]
-
-        for host in up_hosts:
-            version = host.get("address", {}).get("@addrtype")
-            default_mask: str
-            if version == "ipv4":
-                default_mask = "32"
-            elif version == "ipv6":
-                default_mask = "128"
-            else:
-                raise ValueError(f"Incorrect ip version {version}")
-
-            for data in generators.get_services(scan_results):
-                if data.get("service") in BLACKLISTED_SERVICES:
-                    continue
-                data_product = data.get("product")
-                data_banner = data.get("banner")
-                if data_product is not None and data_product != "":
-                    fingerprint: ServiceLibraryFingerprint = {
-                        "host": data.get("host"),
-                        "mask": data.get("mask") or default_mask,
-                        "version": data.get("version"),
-                        "library_type": "BACKEND_COMPONENT",
-                        "service": data.get("service"),
-                        "port": int(data.get("port") or 0),
-                        "protocol": data.get("protocol"),
-                        "library_name": data_product,
-                        "library_version": data.get("product_version"),
-                        "detail": data_product,
-                        "addr_version": version,
-                    }
-                    libraries.append(fingerprint)
-                if data_banner is not None and data_banner != "":
-                    fingerprint = {
-                        "host": data.get("host"),
-                        "mask": data.get("mask") or default_mask,
-                        "version": data.get("version"),
-                        "library_type": "BACKEND_COMPONENT",
-                        "service": data.get("service"),
-                        "port": int(data.get("port") or 0),
-                        "protocol": data.get("protocol"),
-                        "library_name": data_banner,
-                        "detail": data_banner,
-                        "addr_version": version,
-                        "library_version": None,
-                    }
-                    libraries.append(fingerprint)
+    for host in scan_result.hosts:
+        default_mask: str
+        if host.addr_type == "ipv4":
+            default_mask = "32"
+        elif host.addr_type == "ipv6":
+            default_mask = "128"
+        else:
+            raise ValueError(f"Incorrect ip version {host.addr_type}")
+
+        for port in host.ports:
+            if port.service.name in BLACKLISTED_SERVICES:
+                continue
+            product = port.service.product
+            banner = port.banner
+            if product != "":
+                fingerprint: ServiceLibraryFingerprint = {
+                    "host": host.address,
+                    "mask": default_mask,
+                    "version": host.version,
+                    "library_type": "BACKEND_COMPONENT",
+                    "service": port.service.name,
+                    "port": port.number,
+                    "protocol": port.protocol,
+                    "library_name": product,
+                    "library_version": port.service.version,
+                    "detail": product,
+                    "addr_version": host.addr_type,
+                }
+                libraries.append(fingerprint)
+            if banner is not None and banner != "":
+                fingerprint = {
+                    "host": host.address,
+                    "mask": default_mask,
+                    "version": host.version,
+                    "library_type": "BACKEND_COMPONENT",
+                    "service": port.service.name,
+                    "port": port.number,
+                    "protocol": port.protocol,
+                    "library_name": banner,
+                    "detail": banner,
+                    "addr_version": host.addr_type,
+                    "library_version": None,
+                }
+                libraries.append(fingerprint)
     return libraries
 
 
 def get_domain_name_service_library_fingerprints(
-    scan_results: dict[str, Any], domain_name: str
+    scan_result: models.ScanResult, domain_name: str
 ) -> list[DomainNameServiceLibraryFingerprint]:
     fingerprints = []
-    if (
-        scan_results is not None
-        and scan_results.get("nmaprun") is not None
-        and scan_results["nmaprun"].get("host") is not None
-    ):
-        up_hosts = scan_results["nmaprun"].get("host", [])
-        if isinstance(up_hosts, dict):
-            up_hosts = [up_hosts]
-
-        for data in generators.get_services(scan_results):
-            if data.get("service") in BLACKLISTED_SERVICES:
+    for host in scan_result.hosts:
+        for port in host.ports:
+            if port.service.name in BLACKLISTED_SERVICES:
                 continue
-            data_product = data.get("product")
-            data_banner = data.get("banner")
-            if data_product is not None and data_product != "":
+            product = port.service.product
+            banner = port.banner
+            if product != "":
                 fp: DomainNameServiceLibraryFingerprint = {
                     "name": domain_name,
-                    "port": int(data.get("port") or 0),
-                    "schema": data.get("service"),
-                    "library_name": data_product,
-                    "library_version": data.get("product_version"),
+                    "port": port.number,
+                    "schema": port.service.name,
+                    "library_name": product,
+                    "library_version": port.service.version,
                     "library_type": "BACKEND_COMPONENT",
-                    "detail": f"Nmap Detected {data_product} on {domain_name}",
+                    "detail": f"Nmap Detected {product} on {domain_name}",
                 }
                 fingerprints.append(fp)
-            if data_banner is not None and data_banner != "":
+            if banner is not None and banner != "":
                 fp = {
                     "name": domain_name,
-                    "port": int(data.get("port") or 0),
-                    "schema": data.get("service"),
-                    "library_name": data_banner,
+                    "port": port.number,
+                    "schema": port.service.name,
+                    "library_name": banner,
                     "library_version": None,
                     "library_type": "BACKEND_COMPONENT",
-                    "detail": f"Nmap Detected {data_banner} on {domain_name}",
+                    "detail": f"Nmap Detected {banner} on {domain_name}",
                 }
                 fingerprints.append(fp)
     return fingerprints
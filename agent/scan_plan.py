@@ -0,0 +1,215 @@
+"""Durable plan of the subnets scanned for an IP range, used to resume the scan of a range after a restart.
+
+The plan of a range is a hash of the persist backend mapping each subnet to its state. Subnets are marked running when
+handed to a worker and done once their results are emitted, so a restarted agent receiving the same range again only
+scans the subnets that were pending or interrupted. The plan is deleted once the whole range is scanned.
+
+Interrupted subnets are scanned again from scratch: the nmap outputs of the previous run live in a temporary
+workspace that does not survive the restart.
+"""
+
+import enum
+import ipaddress
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Tuple, Union
+
+from agent import ip_coverage
+
+logger = logging.getLogger(__name__)
+
+PLAN_KEY_PREFIX = "agent_nmap_scan_plan"
+# Subnets are stored in CIDR notation, so the kind field never collides with them.
+KIND_FIELD = b"kind"
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+class Persist(Protocol):
+    """Hash API of the agent persist backend."""
+
+    def hash_add(
+        self,
+        hash_name: Union[bytes, str],
+        mapping: Dict[Union[bytes, str], Union[bytes, str]],
+    ) -> bool: ...
+
+    def hash_get_all(self, hash_name: Union[bytes, str]) -> Dict[bytes, bytes]: ...
+
+    def delete(self, key: Union[bytes, str]) -> bool: ...
+
+
+class SubnetState(enum.Enum):
+    """Progress of the scan of a subnet."""
+
+    PENDING = b"pending"
+    RUNNING = b"running"
+    DONE = b"done"
+
+
+class PlanKind(enum.Enum):
+    """How the subnets of the range were chosen."""
+
+    SPLIT = b"split"
+    LIVE_HOSTS = b"live_hosts"
+    ADAPTIVE = b"adaptive"
+
+
+def _cidr(subnet: Tuple[str, int]) -> bytes:
+    host, mask = subnet
+    return f"{host}/{mask}".encode()
+
+
+def _subnet(cidr: bytes) -> Tuple[str, int]:
+    host, mask = cidr.decode().split("/")
+    return host, int(mask)
+
+
+class ScanPlan:
+    """Persisted state of the subnets of a range.
+
+    Usage:
+        plan = scan_plan.ScanPlan.load(persist, network)
+        if plan is None:
+            plan = scan_plan.ScanPlan.create(persist, network, scan_plan.PlanKind.SPLIT, subnets)
+        for batch in plan.track(batches):
+            ...
+            plan.mark(batch, scan_plan.SubnetState.DONE)
+        plan.delete()
+    """
+
+    def __init__(
+        self,
+        persist: Persist,
+        network: Network,
+        kind: PlanKind,
+        states: Dict[Tuple[str, int], SubnetState],
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            persist: persist backend storing the plan.
+            network: scanned range.
+            kind: how the subnets of the range were chosen.
+            states: state of the subnets known so far.
+        """
+        self._persist = persist
+        self._network = network
+        self._kind = kind
+        self._states = states
+
+    @staticmethod
+    def key(network: Network) -> str:
+        return f"{PLAN_KEY_PREFIX}:{network}"
+
+    @classmethod
+    def load(cls, persist: Persist, network: Network) -> Optional["ScanPlan"]:
+        """Plan left by a previous scan of the range, None if the range is not being scanned."""
+        fields = persist.hash_get_all(cls.key(network))
+        if len(fields) == 0 or KIND_FIELD not in fields:
+            return None
+        states = {
+            _subnet(cidr): SubnetState(state)
+            for cidr, state in fields.items()
+            if cidr != KIND_FIELD
+        }
+        return cls(persist, network, PlanKind(fields[KIND_FIELD]), states)
+
+    @classmethod
+    def create(
+        cls,
+        persist: Persist,
+        network: Network,
+        kind: PlanKind,
+        subnets: Iterable[Tuple[str, int]] = (),
+    ) -> "ScanPlan":
+        """Persist the plan of a range about to be scanned.
+
+        Args:
+            persist: persist backend storing the plan.
+            network: range about to be scanned.
+            kind: how the subnets of the range were chosen.
+            subnets: subnets to scan, adaptive plans record their subnets as they are generated.
+
+        Returns:
+            the persisted plan.
+        """
+        plan = cls(persist, network, kind, {})
+        mapping: Dict[Union[bytes, str], Union[bytes, str]] = {KIND_FIELD: kind.value}
+        for subnet in subnets:
+            plan._states[subnet] = SubnetState.PENDING
+            mapping[_cidr(subnet)] = SubnetState.PENDING.value
+        persist.hash_add(cls.key(network), mapping)
+        return plan
+
+    @property
+    def kind(self) -> PlanKind:
+        return self._kind
+
+    def mark(self, subnets: List[Tuple[str, int]], state: SubnetState) -> None:
+        """Persist the new state of subnets."""
+        for subnet in subnets:
+            self._states[subnet] = state
+        self._persist.hash_add(
+            self.key(self._network),
+            {_cidr(subnet): state.value for subnet in subnets},
+        )
+
+    def track(
+        self, batches: Iterable[List[Tuple[str, int]]]
+    ) -> Iterator[List[Tuple[str, int]]]:
+        """Mark each batch of subnets running when it is handed to a worker."""
+        for batch in batches:
+            self.mark(batch, SubnetState.RUNNING)
+            yield batch
+
+    def unfinished_subnets(self) -> List[Tuple[str, int]]:
+        """Pending and interrupted subnets, in address order."""
+        return sorted(
+            (
+                subnet
+                for subnet, state in self._states.items()
+                if state is not SubnetState.DONE
+            ),
+            key=lambda subnet: (int(ipaddress.ip_address(subnet[0])), subnet[1]),
+        )
+
+    def unfinished_networks(
+        self, coverage: Optional[ip_coverage.CoverageIndex] = None
+    ) -> List[Network]:
+        """Parts of the range not scanned yet: interrupted subnets and the space no subnet was generated for.
+
+        Args:
+            coverage: IP space scanned before, subtracted from the space no subnet was generated for. Interrupted
+                subnets are kept, they were marked covered when handed to a worker.
+
+        Returns:
+            the networks to scan, in address order.
+        """
+        remaining = [self._network]
+        for subnet in self._states:
+            subnet_network = ipaddress.ip_network(f"{subnet[0]}/{subnet[1]}")
+            remaining = [
+                part
+                for network in remaining
+                for part in (
+                    network.address_exclude(subnet_network)  # type: ignore[arg-type]
+                    if subnet_network.subnet_of(network)  # type: ignore[arg-type]
+                    else [network]
+                )
+            ]
+        if coverage is not None:
+            remaining = [
+                part for network in remaining for part in coverage.uncovered(network)
+            ]
+        interrupted = [
+            ipaddress.ip_network(f"{host}/{mask}")
+            for host, mask in self.unfinished_subnets()
+        ]
+        return sorted(
+            remaining + interrupted,
+            key=lambda network: int(network.network_address),
+        )
+
+    def delete(self) -> None:
+        """Forget the plan once the whole range is scanned."""
+        self._persist.delete(self.key(self._network))
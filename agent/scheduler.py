@@ -0,0 +1,204 @@
+"""Bounded-concurrency scheduler running nmap scans in parallel."""
+
+import collections
+import dataclasses
+import logging
+import queue
+import threading
+import types
+from concurrent import futures
+from typing import (
+    Callable,
+    Deque,
+    Generator,
+    Generic,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+logger = logging.getLogger(__name__)
+
+# Same default as the `scan_workers` argument of the agent in ostorlab.yaml.
+DEFAULT_MAX_WORKERS = 4
+# Items buffered per worker when streaming, producers block once the buffer is full.
+STREAM_BUFFER_SIZE = 64
+STREAM_PUT_TIMEOUT = 0.1
+
+Target = TypeVar("Target")
+Result = TypeVar("Result")
+Item = TypeVar("Item")
+
+
+@dataclasses.dataclass
+class _StreamItem(Generic[Target, Item]):
+    target: Target
+    item: Item
+
+
+@dataclasses.dataclass
+class _StreamDone:
+    error: Optional[BaseException] = None
+
+
+class ScanScheduler:
+    """Runs a scan function over a stream of targets with at most `max_workers` scans in flight.
+
+    Targets are pulled lazily from the input iterable, so persistence checks done while generating targets
+    happen on the calling thread and only when a worker slot is free. Completed scans are handed back as soon
+    as they finish, regardless of submission order.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            max_workers: maximum number of scans running concurrently.
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self._max_workers = max_workers
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def run(
+        self, scan: Callable[[Target], Result], targets: Iterable[Target]
+    ) -> Iterator[Tuple[Target, "futures.Future[Result]"]]:
+        """Run `scan` over every target and yield each target with its completed future.
+
+        Args:
+            scan: function performing the scan of a single target.
+            targets: targets to scan, consumed lazily.
+
+        Yields:
+            tuple of the target and its completed future. Calling `result()` on the future re-raises any
+            error raised by the scan.
+        """
+        targets_iterator = iter(targets)
+        in_flight: dict["futures.Future[Result]", Target] = {}
+        done_queue: Deque["futures.Future[Result]"] = collections.deque()
+
+        with futures.ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="nmap-scan"
+        ) as executor:
+            exhausted = False
+            while True:
+                while exhausted is False and len(in_flight) < self._max_workers:
+                    try:
+                        target = next(targets_iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight[executor.submit(scan, target)] = target
+
+                if len(in_flight) == 0:
+                    return
+
+                done, _ = futures.wait(
+                    in_flight.keys(), return_when=futures.FIRST_COMPLETED
+                )
+                done_queue.extend(done)
+                while len(done_queue) > 0:
+                    future = done_queue.popleft()
+                    yield in_flight.pop(future), future
+
+    def stream(
+        self, scan: Callable[[Target], Iterable[Item]], targets: Iterable[Target]
+    ) -> Generator[Tuple[Target, Item], None, None]:
+        """Run `scan` over every target and yield the items it produces while the scans are still running.
+
+        Items are handed over through a bounded buffer, so a slow consumer pauses the scans instead of piling up
+        results in memory. Closing the returned iterator, or a failing scan, stops the running scans: items they
+        produced that are never yielded are closed if they have a `close` method, e.g. scan workspaces.
+
+        Args:
+            scan: function returning the items produced by the scan of a single target.
+            targets: targets to scan, consumed lazily.
+
+        Yields:
+            tuple of the target and one item produced by its scan.
+
+        Raises:
+            any error raised by a scan, once the items it produced before failing are yielded.
+        """
+        events: queue.Queue[_StreamItem[Target, Item] | _StreamDone] = queue.Queue(
+            maxsize=self._max_workers * STREAM_BUFFER_SIZE
+        )
+        cancelled = threading.Event()
+
+        def _put(event: _StreamItem[Target, Item] | _StreamDone) -> bool:
+            while cancelled.is_set() is False:
+                try:
+                    events.put(event, timeout=STREAM_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _produce(target: Target) -> None:
+            items: Optional[Iterable[Item]] = None
+            try:
+                items = scan(target)
+                for item in items:
+                    if _put(_StreamItem(target, item)) is False:
+                        _close(item)
+                        return
+            except BaseException as e:  # noqa: BLE001
+                # Every error goes to the consumer, which raises it. Left in the future of the worker, it would be
+                # lost and the consumer would wait forever for the end of this target.
+                _put(_StreamDone(error=e))
+                return
+            finally:
+                # Stops the scan right away when the consumer went away, e.g. kills a running nmap.
+                if isinstance(items, types.GeneratorType):
+                    items.close()
+            _put(_StreamDone())
+
+        targets_iterator = iter(targets)
+        in_flight = 0
+        try:
+            with futures.ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="nmap-scan"
+            ) as executor:
+                # Cancelling before the executor shutdown releases producers blocked on a full buffer.
+                try:
+                    exhausted = False
+                    while True:
+                        while exhausted is False and in_flight < self._max_workers:
+                            try:
+                                target = next(targets_iterator)
+                            except StopIteration:
+                                exhausted = True
+                                break
+                            executor.submit(_produce, target)
+                            in_flight += 1
+
+                        if in_flight == 0:
+                            return
+
+                        event = events.get()
+                        if isinstance(event, _StreamDone):
+                            in_flight -= 1
+                            if event.error is not None:
+                                raise event.error
+                        else:
+                            yield event.target, event.item
+                finally:
+                    cancelled.set()
+        finally:
+            # The producers are stopped, the items left in the buffer are never consumed.
+            while events.empty() is False:
+                event = events.get_nowait()
+                if isinstance(event, _StreamItem):
+                    _close(event.item)
+
+
+def _close(item: object) -> None:
+    """Release the resources of an item that is never consumed, e.g. remove a scan workspace."""
+    close = getattr(item, "close", None)
+    if callable(close):
+        close()
@@ -0,0 +1,266 @@
+"""Cache of the NSE scripts downloaded from http(s) URLs.
+
+Scripts are stored by the sha256 of their content, so a script is written to disk once no matter how many URLs or
+scans reference it. Cached scripts are served as-is while they are fresh, then revalidated with the `ETag` and
+`Last-Modified` validators returned by the server. The total size of the stored scripts is bounded, the least
+recently used scripts are evicted first, except the ones checked out by running scans.
+"""
+
+import collections
+import contextlib
+import dataclasses
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_PREFIX = "nmap_scripts_"
+SCRIPT_EXTENSION = ".nse"
+DEFAULT_TTL = 3600
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+_default_cache: Optional["ScriptCache"] = None
+_default_cache_lock = threading.Lock()
+
+
+class Error(Exception):
+    """Base Custom Error Class."""
+
+
+class ScriptDownloadError(Error):
+    """Error when a script can not be downloaded and no cached copy is available."""
+
+
+@dataclasses.dataclass
+class _Entry:
+    digest: str
+    size: int
+    fetched_at: float
+    last_used_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def is_remote_script(script: str) -> bool:
+    """Whether the script is referenced by an http(s) URL and has to be downloaded."""
+    return script.startswith("http")
+
+
+class ScriptCache:
+    """Thread-safe, size-bounded cache of downloaded NSE scripts.
+
+    Usage:
+        cache = script_cache.ScriptCache()
+        with cache.checkout("https://example.com/script.nse") as script_path:
+            subprocess.run(["nmap", "--script", script_path, "10.0.0.1"])
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            cache_dir: directory storing the scripts, defaults to a new temporary directory created on first use.
+            ttl: seconds a downloaded script is used without revalidating it.
+            max_size: maximum size in bytes of the stored scripts.
+        """
+        self._cache_dir = cache_dir
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries: Dict[str, _Entry] = {}
+        # Number of running scans using each script, by digest.
+        self._checkouts: collections.Counter[str] = collections.Counter()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._directory_lock = threading.Lock()
+
+    def get(self, url: str) -> str:
+        """Path of the script downloaded from `url`, downloading or revalidating it when needed.
+
+        Args:
+            url: http(s) URL of the script.
+
+        Returns:
+            path of the cached script.
+
+        Raises:
+            ScriptDownloadError: when the script can not be downloaded and no cached copy is available.
+        """
+        return self._path(self._get(url, checkout=False))
+
+    @contextlib.contextmanager
+    def checkout(self, url: str) -> Iterator[str]:
+        """Path of the script downloaded from `url`, never evicted before the block exits, e.g. while nmap runs it.
+
+        Args:
+            url: http(s) URL of the script.
+
+        Raises:
+            ScriptDownloadError: when the script can not be downloaded and no cached copy is available.
+        """
+        digest = self._get(url, checkout=True)
+        try:
+            yield self._path(digest)
+        finally:
+            with self._lock:
+                self._checkouts[digest] -= 1
+                if self._checkouts[digest] == 0:
+                    del self._checkouts[digest]
+                    # A revalidation may have replaced the script while it was checked out.
+                    if self._is_referenced(digest) is False:
+                        self._remove(digest)
+
+    def prefetch(self, scripts: Iterable[str]) -> None:
+        """Download the remote scripts ahead of the first scan, failures are logged and retried on use.
+
+        Args:
+            scripts: scripts passed to nmap, only the http(s) ones are downloaded.
+        """
+        for script in scripts:
+            if is_remote_script(script) is False:
+                continue
+            try:
+                self.get(script)
+            except ScriptDownloadError as e:
+                logger.error("%s", e)
+
+    def _get(self, url: str, checkout: bool) -> str:
+        """Digest of the script downloaded from `url`, checked out if `checkout` is True."""
+        # requests is slow to import and only needed by scans using remote scripts, e.g. not by the MCP tools.
+        import requests
+
+        # Downloads run outside of the cache lock, so a slow server only delays the scans using its scripts.
+        with self._url_lock(url):
+            with self._lock:
+                entry = self._entries.get(url)
+                if (
+                    entry is not None
+                    and os.path.exists(self._path(entry.digest)) is False
+                ):
+                    del self._entries[url]
+                    entry = None
+                if (
+                    entry is not None
+                    and time.monotonic() - entry.fetched_at < self._ttl
+                ):
+                    return self._use(entry, checkout)
+
+            try:
+                fetched_entry = self._fetch(url, entry)
+            except requests.RequestException as e:
+                if entry is None:
+                    raise ScriptDownloadError(
+                        f"Could not download script {url}: {e}"
+                    ) from e
+                logger.warning("Using stale copy of script %s: %s", url, e)
+                fetched_entry = entry
+
+            with self._lock:
+                self._entries[url] = fetched_entry
+                digest = self._use(fetched_entry, checkout)
+                self._evict(keep=digest)
+                return digest
+
+    def _use(self, entry: _Entry, checkout: bool) -> str:
+        entry.last_used_at = time.monotonic()
+        if checkout is True:
+            self._checkouts[entry.digest] += 1
+        return entry.digest
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _fetch(self, url: str, entry: Optional[_Entry]) -> _Entry:
+        import requests
+
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = requests.get(
+            url, headers=headers, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT
+        )
+        now = time.monotonic()
+        if response.status_code == 304 and entry is not None:
+            logger.debug("script %s not modified", url)
+            entry.fetched_at = now
+            return entry
+        response.raise_for_status()
+
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path) is False:
+            # Written aside then renamed, so nmap never reads a partially written script.
+            with tempfile.NamedTemporaryFile(
+                dir=self._directory(), delete=False
+            ) as script_file:
+                script_file.write(content)
+            os.replace(script_file.name, path)
+        return _Entry(
+            digest=digest,
+            size=len(content),
+            fetched_at=now,
+            last_used_at=now,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+    def _evict(self, keep: str) -> None:
+        """Remove the least recently used scripts until the stored scripts fit in `max_size`.
+
+        Scripts checked out by running scans are kept, even if the stored scripts exceed `max_size`.
+        """
+        sizes = {entry.digest: entry.size for entry in self._entries.values()}
+        total_size = sum(sizes.values())
+        for url, entry in sorted(
+            self._entries.items(), key=lambda item: item[1].last_used_at
+        ):
+            if total_size <= self._max_size:
+                break
+            if entry.digest == keep or entry.digest in self._checkouts:
+                continue
+            del self._entries[url]
+            if self._is_referenced(entry.digest) is False:
+                total_size -= sizes[entry.digest]
+                self._remove(entry.digest)
+
+    def _is_referenced(self, digest: str) -> bool:
+        return any(entry.digest == digest for entry in self._entries.values())
+
+    def _remove(self, digest: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(digest))
+
+    def _directory(self) -> str:
+        with self._directory_lock:
+            if self._cache_dir is None:
+                self._cache_dir = tempfile.mkdtemp(prefix=CACHE_DIR_PREFIX)
+            else:
+                os.makedirs(self._cache_dir, exist_ok=True)
+            return self._cache_dir
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self._directory(), f"{digest}{SCRIPT_EXTENSION}")
+
+
+def default_cache() -> ScriptCache:
+    """Cache shared by the scans that are not given one explicitly."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ScriptCache()
+        return _default_cache
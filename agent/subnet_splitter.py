@@ -0,0 +1,156 @@
+"""Adaptive splitting of IP ranges into chunks scanned by a single nmap run.
+
+A fixed split scans sparse ranges in many short runs, each paying the nmap startup and host discovery cost, and dense
+ranges in few runs that take too long. The adaptive splitter sizes each chunk when it is handed to a worker, from the
+scan durations and the live hosts observed on the chunks completed so far, so each run lasts about
+`target_duration` seconds.
+
+The duration of a chunk is modeled as:
+
+    duration = addresses * idle_cost + live_hosts * live_host_cost
+
+where `idle_cost` is learnt from chunks without live hosts (probe timeouts) and `live_host_cost` from the chunks
+with live hosts. The expected number of live hosts of a chunk comes from the observed live hosts density.
+"""
+
+import ipaddress
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_DURATION = 300.0
+# Weight of the last observation in the moving averages of the costs and density.
+SMOOTHING = 0.5
+# Chunks grow at most 4 times larger than the previous one, a single fast chunk is not enough evidence.
+MAX_PREFIX_STEP = 2
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+def _moving_average(average: Optional[float], value: float) -> float:
+    if average is None:
+        return value
+    return SMOOTHING * value + (1 - SMOOTHING) * average
+
+
+class AdaptiveSplitter:
+    """Splits networks in chunks whose size adapts to the observed scan durations.
+
+    Chunks are generated lazily, so the size of each chunk takes into account every chunk recorded before it is
+    pulled. Observations may be recorded from any thread.
+
+    Usage:
+        splitter = subnet_splitter.AdaptiveSplitter([network], max_prefix=26)
+        for host, mask in splitter:
+            ...
+            splitter.record([(host, mask)], live_hosts=3)
+    """
+
+    def __init__(
+        self,
+        networks: Sequence[Network],
+        max_prefix: int,
+        target_duration: float = DEFAULT_TARGET_DURATION,
+    ) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            networks: networks to split, one after the other.
+            max_prefix: prefix of the smallest chunks, also used until the first chunk is recorded. Networks
+                smaller than these chunks are scanned whole.
+            target_duration: seconds a single nmap run should last.
+        """
+        self._networks = networks
+        self._max_prefixlen = max(
+            (network.max_prefixlen for network in networks), default=32
+        )
+        self._max_prefix = max_prefix
+        self._target_duration = target_duration
+        self._lock = threading.Lock()
+        self._started_at: Dict[Tuple[str, int], float] = {}
+        self._idle_cost: Optional[float] = None
+        self._live_host_cost: Optional[float] = None
+        self._density: Optional[float] = None
+        self._last_prefix = max_prefix
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        for network in self._networks:
+            yield from self._split(network)
+
+    def _split(self, network: Network) -> Iterator[Tuple[str, int]]:
+        address = int(network.network_address)
+        end = int(network.broadcast_address) + 1
+        while address < end:
+            prefix = self.chunk_prefix(network)
+            # Chunks must be aligned on their size and must not overflow the network.
+            while (
+                address % self._size(prefix) != 0 or address + self._size(prefix) > end
+            ):
+                prefix += 1
+            chunk = (str(ipaddress.ip_address(address)), prefix)
+            with self._lock:
+                self._started_at[chunk] = time.monotonic()
+                self._last_prefix = prefix
+            yield chunk
+            address += self._size(prefix)
+
+    def chunk_prefix(self, network: Network) -> int:
+        """Prefix of the next chunk of `network`, the largest one expected to be scanned within the target duration."""
+        with self._lock:
+            if self._idle_cost is None and self._live_host_cost is None:
+                return max(self._max_prefix, network.prefixlen)
+            cost_per_address = (self._idle_cost or 0.0) + (self._density or 0.0) * (
+                self._live_host_cost or 0.0
+            )
+            min_prefix = max(network.prefixlen, self._last_prefix - MAX_PREFIX_STEP)
+
+        prefix = min_prefix
+        while (
+            prefix < self._max_prefix
+            and self._size(prefix) * cost_per_address > self._target_duration
+        ):
+            prefix += 1
+        return prefix
+
+    def record(self, chunks: List[Tuple[str, int]], live_hosts: int) -> None:
+        """Record the completed scan of chunks, scanned together by a single nmap run.
+
+        Args:
+            chunks: chunks yielded by the splitter.
+            live_hosts: number of hosts found up by the scan.
+        """
+        now = time.monotonic()
+        with self._lock:
+            started_at = [
+                self._started_at.pop(chunk)
+                for chunk in chunks
+                if chunk in self._started_at
+            ]
+            if len(started_at) == 0:
+                return
+            addresses = sum(self._size(mask) for _, mask in chunks)
+            # A batch is submitted once its last chunk is pulled.
+            duration = now - max(started_at)
+
+            self._density = _moving_average(self._density, live_hosts / addresses)
+            if live_hosts == 0:
+                self._idle_cost = _moving_average(self._idle_cost, duration / addresses)
+            else:
+                live_duration = max(
+                    duration - addresses * (self._idle_cost or 0.0), 0.0
+                )
+                self._live_host_cost = _moving_average(
+                    self._live_host_cost, live_duration / live_hosts
+                )
+        logger.debug(
+            "scanned %s addresses with %s live hosts in %.1fs",
+            addresses,
+            live_hosts,
+            duration,
+        )
+
+    def _size(self, prefix: int) -> int:
+        return 1 << (self._max_prefixlen - prefix)
@@ -0,0 +1,90 @@
+"""Isolated output locations for a single nmap scan."""
+
+import os
+import shutil
+import tempfile
+from types import TracebackType
+from typing import Optional, Type
+
+WORKSPACE_PREFIX = "nmap_scan_"
+XML_OUTPUT_FILENAME = "xmloutput"
+NORMAL_OUTPUT_FILENAME = "normal"
+TARGETS_FILENAME = "targets"
+
+
+class Error(Exception):
+    """Base Custom Error Class."""
+
+
+class WorkspaceNotOpenedError(Error):
+    """Error when accessing the paths of a workspace that was not opened."""
+
+
+class ScanWorkspace:
+    """Private temporary directory holding the output files of one nmap scan.
+
+    Every workspace gets its own directory created with `mkdtemp`, so scans driven concurrently from threads,
+    processes or asyncio tasks never share output files. The directory is removed when the workspace is closed.
+
+    Usage:
+        with workspace.ScanWorkspace() as scan_workspace:
+            command = [..., "-oX", scan_workspace.xml_output_path]
+    """
+
+    def __init__(self, base_dir: Optional[str] = None) -> None:
+        """Constructs all the necessary attributes for the object.
+
+        Args:
+            base_dir: directory in which the workspace is created, defaults to the system temporary directory.
+        """
+        self._base_dir = base_dir
+        self._path: Optional[str] = None
+
+    def __enter__(self) -> "ScanWorkspace":
+        self.open()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """Create the workspace directory."""
+        if self._path is None:
+            self._path = tempfile.mkdtemp(prefix=WORKSPACE_PREFIX, dir=self._base_dir)
+
+    def close(self) -> None:
+        """Remove the workspace directory and all the files it holds."""
+        if self._path is not None:
+            shutil.rmtree(self._path, ignore_errors=True)
+            self._path = None
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            raise WorkspaceNotOpenedError("Scan workspace is not opened.")
+        return self._path
+
+    @property
+    def xml_output_path(self) -> str:
+        """Path of the XML output file (-oX)."""
+        return os.path.join(self.path, XML_OUTPUT_FILENAME)
+
+    @property
+    def normal_output_path(self) -> str:
+        """Path of the normal output file (-oN)."""
+        return os.path.join(self.path, NORMAL_OUTPUT_FILENAME)
+
+    @property
+    def targets_path(self) -> str:
+        """Path of the input list of targets (-iL)."""
+        return os.path.join(self.path, TARGETS_FILENAME)
+
+    def read_normal_output(self) -> str:
+        """Read the normal output of the scan."""
+        with open(self.normal_output_path, "r", encoding="utf-8") as o:
+            return o.read()
@@ -0,0 +1,119 @@
+"""Unittests for the two-phase scan helpers."""
+
+from typing import Any, Dict
+
+from agent import discovery
+from agent import models
+
+
+def _host(address: str, ports: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "address": {"@addr": address, "@addrtype": "ipv4"},
+        "ports": {
+            "port": [
+                {"@protocol": "tcp", "@portid": port_id, "state": {"@state": state}}
+                for port_id, state in ports.items()
+            ]
+        },
+    }
+
+
+def testLiveHosts_whenSweepReportsDownHosts_keepsOnlyHostsUp() -> None:
+    scan_result = models.ScanResult.from_dict(
+        {
+            "nmaprun": {
+                "host": [
+                    {
+                        "status": {"@state": state},
+                        "address": {"@addr": address, "@addrtype": "ipv4"},
+                    }
+                    for address, state in (
+                        ("10.0.0.1", "up"),
+                        ("10.0.0.2", "down"),
+                        ("10.0.0.3", "up"),
+                    )
+                ]
+            }
+        }
+    )
+
+    assert discovery.live_hosts(scan_result) == ["10.0.0.1", "10.0.0.3"]
+
+
+def testEnumerationGroups_whenHostsShareOpenPorts_groupsThemTogether() -> None:
+    scan_result = models.ScanResult.from_dict(
+        {
+            "nmaprun": {
+                "host": [
+                    _host("10.0.0.1", {"443": "open", "80": "open"}),
+                    _host("10.0.0.2", {"22": "open"}),
+                    _host("10.0.0.3", {"80": "open", "443": "open", "8080": "closed"}),
+                    _host("10.0.0.4", {"25": "filtered"}),
+                ]
+            }
+        }
+    )
+
+    groups = discovery.enumeration_groups(scan_result)
+
+    assert groups == [
+        discovery.EnumerationGroup(
+            addresses=["10.0.0.1", "10.0.0.3"], ports=["T:80", "T:443"]
+        ),
+        discovery.EnumerationGroup(addresses=["10.0.0.2"], ports=["T:22"]),
+    ]
+
+
+def testEnumerationGroups_whenHostsHaveDifferentOpenPorts_capsTheNumberOfGroups() -> (
+    None
+):
+    scan_result = models.ScanResult.from_dict(
+        {
+            "nmaprun": {
+                "host": [
+                    _host("10.0.0.1", {"80": "open"}),
+                    _host("10.0.0.2", {"22": "open"}),
+                    _host("10.0.0.3", {"80": "open"}),
+                    _host("10.0.0.4", {"25": "open"}),
+                    _host("10.0.0.5", {"8080": "open"}),
+                ]
+            }
+        }
+    )
+
+    groups = discovery.enumeration_groups(scan_result, max_groups=3)
+
+    assert groups == [
+        discovery.EnumerationGroup(addresses=["10.0.0.1", "10.0.0.3"], ports=["T:80"]),
+        discovery.EnumerationGroup(addresses=["10.0.0.2"], ports=["T:22"]),
+        discovery.EnumerationGroup(
+            addresses=["10.0.0.4", "10.0.0.5"], ports=["T:25", "T:8080"]
+        ),
+    ]
+
+
+def testEnumerationGroupPortSpec_withTcpAndUdpPorts_keepsTheProtocolPrefixes() -> None:
+    group = discovery.EnumerationGroup(
+        addresses=["10.0.0.1"], ports=["T:22", "T:80", "U:53", "U:161"]
+    )
+
+    assert group.port_spec == "T:22,80,U:53,161"
+
+
+def testMergeScanResults_whenSeveralRuns_keepsTheHostsOfAllRuns() -> None:
+    merged = discovery.merge_scan_results(
+        [
+            models.ScanResult.from_dict(
+                {"nmaprun": {"host": _host("10.0.0.1", {"80": "open"})}}
+            ),
+            models.ScanResult(),
+            models.ScanResult.from_dict(
+                {"nmaprun": {"host": [_host("10.0.0.2", {"22": "open"})]}}
+            ),
+        ]
+    )
+
+    assert [host.address for host in merged.hosts] == [
+        "10.0.0.1",
+        "10.0.0.2",
+    ]
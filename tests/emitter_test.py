@@ -0,0 +1,102 @@
+"""Unittests for the batching of the emitted messages."""
+
+import threading
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from agent import emitter
+
+
+def testBatchingEmitterEmit_whenBatchSizeReached_sendsQueuedMessagesInOrder() -> None:
+    sent: List[Tuple[str, Dict[str, Any]]] = []
+    batch_sent = threading.Event()
+
+    def _send(selector: str, data: Dict[str, Any]) -> None:
+        sent.append((selector, data))
+        if len(sent) == 3:
+            batch_sent.set()
+
+    batching_emitter = emitter.BatchingEmitter(_send, batch_size=3, flush_interval=3600)
+
+    batching_emitter.emit("v3.asset.ip.v4.port.service", {"port": 22})
+    batching_emitter.emit("v3.asset.ip.v4.port.service", {"port": 80})
+    batching_emitter.emit("v3.fingerprint.ip.v4.service.library", {"port": 80})
+
+    assert batch_sent.wait(timeout=5) is True
+    batching_emitter.close()
+    assert sent == [
+        ("v3.asset.ip.v4.port.service", {"port": 22}),
+        ("v3.asset.ip.v4.port.service", {"port": 80}),
+        ("v3.fingerprint.ip.v4.service.library", {"port": 80}),
+    ]
+    assert batching_emitter.stats.queued == 3
+    assert batching_emitter.stats.sent == 3
+    assert batching_emitter.stats.batches == 1
+
+
+def testBatchingEmitterEmit_whenFlushIntervalElapses_sendsQueuedMessagesWithoutFlush() -> (
+    None
+):
+    message_sent = threading.Event()
+    batching_emitter = emitter.BatchingEmitter(
+        lambda selector, data: message_sent.set(), flush_interval=0.05
+    )
+
+    batching_emitter.emit("v3.asset.ip.v4.port.service", {"port": 22})
+
+    assert message_sent.wait(timeout=5) is True
+    batching_emitter.close()
+    assert batching_emitter.stats.batches == 1
+
+
+def testBatchingEmitterEmit_whenBusIsSlow_blocksOnceMaxPendingMessagesAreQueued() -> (
+    None
+):
+    bus_available = threading.Event()
+    sent: List[int] = []
+
+    def _send(selector: str, data: Dict[str, Any]) -> None:
+        bus_available.wait(timeout=5)
+        sent.append(data["port"])
+
+    batching_emitter = emitter.BatchingEmitter(_send, batch_size=1, max_pending=2)
+
+    def _produce() -> None:
+        for port in range(6):
+            batching_emitter.emit("v3.asset.ip.v4.port.service", {"port": port})
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    producer.join(timeout=0.2)
+
+    # One message is being sent and two are queued, the producer waits for room in the queue.
+    assert producer.is_alive() is True
+    assert batching_emitter.stats.queued == 3
+    bus_available.set()
+    producer.join(timeout=5)
+    batching_emitter.flush()
+    assert sent == list(range(6))
+    assert batching_emitter.stats.pending == 0
+    assert batching_emitter.stats.blocked_seconds > 0
+
+
+def testBatchingEmitterFlush_whenSendFails_sendsTheOtherMessagesAndRaises() -> None:
+    sent: List[Dict[str, Any]] = []
+
+    def _send(selector: str, data: Dict[str, Any]) -> None:
+        if data["port"] == 80:
+            raise ConnectionError("bus is down")
+        sent.append(data)
+
+    batching_emitter = emitter.BatchingEmitter(_send)
+    for port in (22, 80, 443):
+        batching_emitter.emit("v3.asset.ip.v4.port.service", {"port": port})
+
+    with pytest.raises(ConnectionError):
+        batching_emitter.flush()
+    batching_emitter.flush()
+
+    assert [data["port"] for data in sent] == [22, 443]
+    assert batching_emitter.stats.failed == 1
+    assert batching_emitter.stats.pending == 0
@@ -0,0 +1,15 @@
+"""Unittests for the generators of the messages' data."""
+
+from typing import Any, Dict
+
+from agent import generators
+
+HOST: Dict[str, Any] = {"address": {"@addr": "10.0.0.1", "@addrtype": "ipv4"}}
+
+
+def testGetHosts_whenScanReportsASingleHost_returnsAListOfIt() -> None:
+    assert generators.get_hosts({"nmaprun": {"host": HOST}}) == [HOST]
+
+
+def testGetHosts_whenNoHostIsUp_returnsAnEmptyList() -> None:
+    assert generators.get_hosts({"nmaprun": {}}) == []
@@ -0,0 +1,84 @@
+"""Import-time checks of the agent and MCP entry points: heavy modules are loaded only when used.
+
+Import times are measured with `python -X importtime` and compared with the import of a standard library package in the
+same interpreter, so the budgets hold on slower or loaded machines.
+"""
+
+import dataclasses
+import json
+import pathlib
+import subprocess
+import sys
+from typing import Dict, Set
+
+import pytest
+
+REPOSITORY_PATH = pathlib.Path(__file__).parent.parent
+# Standard library package imported before the entry point, its cumulative import time is the unit of the budgets.
+BASELINE_MODULE = "asyncio"
+
+
+@dataclasses.dataclass
+class _Import:
+    """Modules loaded by an import and the cumulative import time of every module, in microseconds."""
+
+    loaded_modules: Set[str]
+    cumulative_times: Dict[str, int]
+
+
+def _import(module: str) -> _Import:
+    """Import the baseline then `module` in a fresh interpreter."""
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import json, sys, {BASELINE_MODULE}, {module}; print(json.dumps(sorted(sys.modules)))",
+        ],
+        cwd=REPOSITORY_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_times: Dict[str, int] = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") is False:
+            continue
+        _, cumulative_time, name = line.removeprefix("import time:").split("|")
+        if cumulative_time.strip().isdigit() is True:
+            cumulative_times[name.strip()] = int(cumulative_time)
+    return _Import(set(json.loads(process.stdout)), cumulative_times)
+
+
+@pytest.mark.parametrize(
+    "module, deferred_modules",
+    [
+        ("agent.nmap_agent", ["fastmcp", "pytablewriter"]),
+        ("agent.mcp.tools", ["fastmcp", "requests", "ostorlab", "agent.nmap_agent"]),
+    ],
+)
+def testImport_whenEntryPointIsImported_defersHeavyModules(
+    module: str, deferred_modules: list[str]
+) -> None:
+    loaded_modules = _import(module).loaded_modules
+
+    assert module in loaded_modules
+    assert [name for name in deferred_modules if name in loaded_modules] == []
+
+
+@pytest.mark.parametrize(
+    "module, budget",
+    [
+        # Mostly the ostorlab agent framework, about 35 times the baseline.
+        ("agent.nmap_agent", 100),
+        # About twice the baseline, importing fastmcp alone takes about 9 times the baseline.
+        ("agent.mcp.tools", 5),
+    ],
+)
+def testImportTime_whenEntryPointIsImported_staysWithinBudget(
+    module: str, budget: int
+) -> None:
+    cumulative_times = _import(module).cumulative_times
+
+    assert cumulative_times[module] < budget * cumulative_times[BASELINE_MODULE]
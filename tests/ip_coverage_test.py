@@ -0,0 +1,111 @@
+"""Unittests for the index of the scanned IP space."""
+
+import ipaddress
+from typing import List, Set, Tuple, Union
+
+from pytest_mock import plugin
+
+from agent import ip_coverage
+
+
+def testCoverageIndexUncovered_whenPartsAreCovered_returnsTheRemainder() -> None:
+    coverage = ip_coverage.CoverageIndex.from_members(
+        [b"10.0.0.0/26", "10.0.0.130/32", "example.com", "2001:db8::1/64"]
+    )
+
+    uncovered = coverage.uncovered(ipaddress.ip_network("10.0.0.0/24"))
+
+    assert uncovered == [
+        ipaddress.ip_network("10.0.0.64/26"),
+        ipaddress.ip_network("10.0.0.128/31"),
+        ipaddress.ip_network("10.0.0.131/32"),
+        ipaddress.ip_network("10.0.0.132/30"),
+        ipaddress.ip_network("10.0.0.136/29"),
+        ipaddress.ip_network("10.0.0.144/28"),
+        ipaddress.ip_network("10.0.0.160/27"),
+        ipaddress.ip_network("10.0.0.192/26"),
+    ]
+
+
+def testCoverageIndexAdd_whenNetworksTouch_mergesThem() -> None:
+    coverage = ip_coverage.CoverageIndex()
+
+    coverage.add(ipaddress.ip_network("10.0.0.128/25"))
+    coverage.add(ipaddress.ip_network("10.0.0.0/25"))
+    coverage.add(ipaddress.ip_network("10.0.1.0/24"))
+
+    assert coverage.covers(ipaddress.ip_network("10.0.0.0/23")) is True
+    assert coverage.uncovered(ipaddress.ip_network("10.0.0.0/22")) == [
+        ipaddress.ip_network("10.0.2.0/23")
+    ]
+
+
+def testCoverageIndex_whenVersionsDiffer_keepsThemApart() -> None:
+    coverage = ip_coverage.CoverageIndex.from_members(["0.0.0.0/0"])
+
+    assert coverage.covers(ipaddress.ip_network("::/120")) is False
+
+
+class _Persist:
+    def __init__(self, members: Set[bytes]) -> None:
+        self.members = members
+        self.set_add_calls: List[Tuple[bytes, ...]] = []
+        self.set_members_calls = 0
+
+    def set_add(self, key: Union[bytes, str], *value: Union[bytes, str]) -> bool:
+        self.set_add_calls.append(tuple(str(member).encode() for member in value))
+        self.members.update(str(member).encode() for member in value)
+        return True
+
+    def set_members(self, key: Union[bytes, str]) -> Set[bytes]:
+        self.set_members_calls += 1
+        return set(self.members)
+
+
+def testCoverageStoreRecord_whenFlushed_writesPendingNetworksInOneCall() -> None:
+    persist = _Persist({b"10.0.0.0/25"})
+    store = ip_coverage.CoverageStore(persist, b"assets", flush_size=3)
+
+    store.record(ipaddress.ip_network("10.0.0.128/26"))
+    store.record(ipaddress.ip_network("10.0.0.192/26"))
+
+    assert persist.set_add_calls == []
+    assert store.index.covers(ipaddress.ip_network("10.0.0.0/24")) is True
+
+    store.record(ipaddress.ip_network("10.0.1.0/24"))
+    store.flush()
+
+    assert persist.set_add_calls == [
+        (b"10.0.0.128/26", b"10.0.0.192/26", b"10.0.1.0/24")
+    ]
+    assert persist.set_members_calls == 1
+
+
+def testCoverageStoreIndex_whenRefreshIntervalElapsed_reloadsNetworksOfOtherReplicas(
+    mocker: plugin.MockerFixture,
+) -> None:
+    monotonic = mocker.patch("agent.ip_coverage.time.monotonic", return_value=0.0)
+    persist = _Persist(set())
+    store = ip_coverage.CoverageStore(persist, b"assets", refresh_interval=60.0)
+    store.record(ipaddress.ip_network("10.0.0.0/24"))
+    persist.members.add(b"10.0.1.0/24")
+
+    assert store.index.covers(ipaddress.ip_network("10.0.1.0/24")) is False
+
+    monotonic.return_value = 61.0
+
+    assert store.index.covers(ipaddress.ip_network("10.0.0.0/23")) is True
+    assert persist.set_add_calls == [(b"10.0.0.0/24",)]
+    assert persist.set_members_calls == 2
+
+
+def testCoverageStoreRecord_whenNetworkIsAlreadyCovered_doesNotWriteItAgain() -> None:
+    persist = _Persist({b"10.0.0.0/24"})
+    store = ip_coverage.CoverageStore(persist, b"assets")
+
+    store.record(ipaddress.ip_network("10.0.0.1/32"))
+    store.record(ipaddress.ip_network("10.0.1.1/32"))
+    store.record(ipaddress.ip_network("10.0.1.1/32"))
+    store.flush()
+
+    assert persist.set_add_calls == [(b"10.0.1.1/32",)]
@@ -0,0 +1,152 @@
+"""Unittests for the rendering of the scan results tables."""
+
+import io
+import json
+import sys
+import tracemalloc
+import types
+from typing import Any, Callable, IO, Iterable, Iterator, List, Optional
+
+import pytest
+
+from agent import markdown
+
+Writer = Callable[[Iterable[markdown.Row], IO[str]], None]
+
+ROWS: List[List[Optional[str | int]]] = [
+    ["10.0.0.1", 4, 22, "tcp", "open", "ssh", "OpenSSH", "8.9", "SSH-2.0|x"],
+    ["10.0.0.2", 4, 80, "tcp", "open", "http|s", "", "", None],
+]
+
+
+class _NullStream(io.StringIO):
+    """Text stream counting the written characters without keeping them."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.written = 0
+
+    def write(self, text: str) -> int:
+        self.written += len(text)
+        return len(text)
+
+
+def _synthetic_rows(count: int) -> Iterator[List[Optional[str | int]]]:
+    for index in range(count):
+        yield [
+            f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+            4,
+            index % 65536,
+            "tcp",
+            "open",
+            "http",
+            "nginx",
+            "1.25",
+            None,
+        ]
+
+
+def _executed_lines(writer: Writer, row_count: int) -> int:
+    """Number of lines of the markdown module executed to write a table, a measure of the work that does not depend
+    on timing."""
+    executed = 0
+
+    def _trace(
+        frame: types.FrameType, event: str, arg: Any
+    ) -> Optional[Callable[..., Any]]:
+        nonlocal executed
+        if frame.f_code.co_filename != markdown.__file__:
+            return None
+        if event == "line":
+            executed += 1
+        return _trace
+
+    previous_trace = sys.gettrace()
+    sys.settrace(_trace)
+    try:
+        writer(_synthetic_rows(row_count), _NullStream())
+    finally:
+        sys.settrace(previous_trace)
+    return executed
+
+
+def testTableMarkdown_always_rendersHeadersAndEscapedRows() -> None:
+    table = markdown.table_markdown(ROWS)
+
+    assert table == (
+        "|Host|Version|Port|Protocol|State|Service|  \n"
+        "|---|---:|---:|---|---|---|  \n"
+        "|10.0.0.1|4|22|tcp|open|ssh|  \n"
+        "|10.0.0.2|4|80|tcp|open|http\\|s|  \n"
+    )
+
+
+def testWriteCsvTable_always_writesHeaderAndRowsLimitedToTheHeaders() -> None:
+    stream = io.StringIO()
+
+    markdown.write_csv_table(ROWS, stream)
+
+    assert stream.getvalue().splitlines() == [
+        "Host,Version,Port,Protocol,State,Service",
+        "10.0.0.1,4,22,tcp,open,ssh",
+        "10.0.0.2,4,80,tcp,open,http|s",
+    ]
+
+
+def testWriteJsonTable_always_writesAnObjectPerRow() -> None:
+    stream = io.StringIO()
+
+    markdown.write_json_table(ROWS[:1], stream)
+
+    assert json.loads(stream.getvalue()) == [
+        {
+            "Host": "10.0.0.1",
+            "Version": 4,
+            "Port": 22,
+            "Protocol": "tcp",
+            "State": "open",
+            "Service": "ssh",
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    "writer",
+    [
+        markdown.write_markdown_table,
+        markdown.write_csv_table,
+        markdown.write_json_table,
+    ],
+)
+def testTableWriters_with100kRows_keepPeakMemoryConstant(writer: Writer) -> None:
+    """Benchmark on 100k-row tables: only a few rows are alive at once, whatever the size of the table."""
+    stream = _NullStream()
+
+    tracemalloc.start()
+    try:
+        writer(_synthetic_rows(100_000), stream)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # The rendered table is several megabytes.
+    assert stream.written > 100_000 * 30
+    # A few hundred kilobytes at most, the csv module keeps a fixed size buffer of its own.
+    assert peak_memory < 256 * 1024
+
+
+@pytest.mark.parametrize(
+    "writer",
+    [
+        markdown.write_markdown_table,
+        markdown.write_csv_table,
+        markdown.write_json_table,
+    ],
+)
+def testTableWriters_withFourTimesTheRows_doFourTimesTheWork(writer: Writer) -> None:
+    """Benchmark on 25k and 100k-row tables, the work grows linearly with the number of rows."""
+    small_work = _executed_lines(writer, 25_000)
+    large_work = _executed_lines(writer, 100_000)
+
+    assert small_work > 25_000
+    assert large_work <= 4 * small_work
@@ -0,0 +1,222 @@
+"""Unittests for the MCP scan jobs queue and tools."""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+from pytest_mock import plugin
+
+from agent import models
+from agent.mcp import jobs
+from agent.mcp import mcp_types
+from agent.mcp import result_cache
+from agent.mcp import tools
+
+
+def _service(host: str) -> mcp_types.ServiceResult:
+    return mcp_types.ServiceResult(
+        host=host,
+        port=80,
+        protocol="tcp",
+        state="open",
+        service="http",
+        banner="",
+        version="4",
+    )
+
+
+def testScanJobQueue_whenManyJobsSubmitted_neverExceedsMaxConcurrentScans() -> None:
+    running = 0
+    peak = 0
+
+    async def _scan(
+        target: str, report_progress: jobs.ProgressCallback
+    ) -> List[mcp_types.ServiceResult]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        report_progress(50.0)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return [_service(target)]
+
+    async def _submit_all() -> List[jobs.ScanJob]:
+        queue = jobs.ScanJobQueue(scan=_scan, max_concurrent_scans=2)
+        submitted = [queue.submit(f"10.0.0.{index}") for index in range(6)]
+        assert all(job.status is jobs.JobStatus.PENDING for job in submitted)
+        for job in submitted:
+            await queue.wait(job.job_id)
+        return submitted
+
+    submitted = asyncio.run(_submit_all())
+
+    assert peak == 2
+    assert all(job.status is jobs.JobStatus.COMPLETED for job in submitted) is True
+    assert [job.results[0].host for job in submitted if job.results] == [
+        f"10.0.0.{index}" for index in range(6)
+    ]
+    assert submitted[0].progress == 50.0
+
+
+def testScanJobQueue_whenJobCancelled_stopsScanAndKeepsOthersRunning() -> None:
+    async def _scan(
+        target: str, report_progress: jobs.ProgressCallback
+    ) -> List[mcp_types.ServiceResult]:
+        await asyncio.sleep(0.2 if target == "fast" else 30)
+        return [_service(target)]
+
+    async def _cancel_slow_job() -> Dict[str, jobs.ScanJob]:
+        queue = jobs.ScanJobQueue(scan=_scan)
+        slow_job = queue.submit("slow")
+        fast_job = queue.submit("fast")
+        await asyncio.sleep(0.05)
+        queue.cancel(slow_job.job_id)
+        await queue.wait(fast_job.job_id)
+        with pytest.raises(jobs.JobNotCompletedError):
+            await queue.wait(slow_job.job_id)
+        return {"slow": slow_job, "fast": fast_job}
+
+    submitted = asyncio.run(_cancel_slow_job())
+
+    assert submitted["slow"].status is jobs.JobStatus.CANCELLED
+    assert submitted["slow"].task is not None
+    assert submitted["slow"].task.cancelled() is True
+    assert submitted["fast"].status is jobs.JobStatus.COMPLETED
+
+
+def testScanJobQueue_whenScanFails_recordsErrorOnJob() -> None:
+    async def _scan(
+        target: str, report_progress: jobs.ProgressCallback
+    ) -> List[mcp_types.ServiceResult]:
+        raise tools.CalledToolError("nmap failed")
+
+    async def _submit() -> jobs.ScanJob:
+        queue = jobs.ScanJobQueue(scan=_scan)
+        job = queue.submit("10.0.0.1")
+        with pytest.raises(tools.CalledToolError):
+            await queue.wait(job.job_id)
+        return job
+
+    job = asyncio.run(_submit())
+
+    assert job.info().status == "failed"
+    assert job.info().error == "nmap failed"
+
+
+def testScanJobQueue_whenMaxPendingScansReached_rejectsSubmissionsUntilAJobFinishes() -> (
+    None
+):
+    release = asyncio.Event()
+
+    async def _scan(
+        target: str, report_progress: jobs.ProgressCallback
+    ) -> List[mcp_types.ServiceResult]:
+        await release.wait()
+        return [_service(target)]
+
+    async def _submit_beyond_limit() -> List[jobs.ScanJob]:
+        queue = jobs.ScanJobQueue(
+            scan=_scan, max_concurrent_scans=1, max_pending_scans=2
+        )
+        submitted = [queue.submit(f"10.0.0.{index}") for index in range(3)]
+        with pytest.raises(jobs.QueueFullError, match="10.0.0.3"):
+            queue.submit("10.0.0.3")
+        queue.cancel(submitted[2].job_id)
+        submitted.append(queue.submit("10.0.0.3"))
+        release.set()
+        for job in submitted[:2] + submitted[3:]:
+            await queue.wait(job.job_id)
+        return submitted
+
+    submitted = asyncio.run(_submit_beyond_limit())
+
+    assert [job.status for job in submitted] == [
+        jobs.JobStatus.COMPLETED,
+        jobs.JobStatus.COMPLETED,
+        jobs.JobStatus.CANCELLED,
+        jobs.JobStatus.COMPLETED,
+    ]
+
+
+def testMcpSubmitScan_whenQueueIsFull_raisesCalledToolError(
+    mocker: plugin.MockerFixture,
+) -> None:
+    async def _scan(
+        target: str, report_progress: jobs.ProgressCallback
+    ) -> List[mcp_types.ServiceResult]:
+        await asyncio.sleep(30)
+        return []
+
+    mocker.patch.object(
+        tools,
+        "scan_jobs",
+        jobs.from_environment(
+            _scan,
+            {"NMAP_MCP_MAX_CONCURRENT_SCANS": "2", "NMAP_MCP_MAX_PENDING_SCANS": "0"},
+        ),
+    )
+    mocker.patch.object(tools, "scan_results_cache", result_cache.ResultCache())
+
+    async def _submit_beyond_limit() -> None:
+        running_jobs = [
+            await tools.submit_scan(f"10.0.0.{index}") for index in range(2)
+        ]
+        with pytest.raises(tools.CalledToolError, match="already waiting to run"):
+            await tools.submit_scan("10.0.0.254")
+        for job in running_jobs:
+            await tools.cancel_scan(job.job_id)
+
+    asyncio.run(_submit_beyond_limit())
+
+
+def testScanJobQueue_whenJobIsUnknown_raisesJobNotFoundError() -> None:
+    async def _scan(
+        target: str, report_progress: jobs.ProgressCallback
+    ) -> List[mcp_types.ServiceResult]:
+        return []
+
+    queue = jobs.ScanJobQueue(scan=_scan)
+
+    with pytest.raises(jobs.JobNotFoundError):
+        queue.get("unknown")
+
+
+def testMcpTools_whenScanSubmitted_statusAndResultsArePolled(
+    mocker: plugin.MockerFixture, fake_output: Optional[Dict[str, Any]]
+) -> None:
+    release = asyncio.Event()
+
+    async def _scan_hosts(*args: Any, **kwargs: Any) -> tuple[models.ScanResult, str]:
+        await release.wait()
+        return models.ScanResult.from_dict(fake_output), ""
+
+    mocker.patch(
+        "agent.nmap_async_wrapper.AsyncNmapWrapper.scan_hosts", side_effect=_scan_hosts
+    )
+    mocker.patch.object(
+        tools, "scan_jobs", jobs.ScanJobQueue(scan=tools._scan_services)
+    )
+    mocker.patch.object(tools, "scan_results_cache", result_cache.ResultCache())
+
+    async def _poll() -> Dict[str, Any]:
+        job = await tools.submit_scan("8.8.8.8")
+        await asyncio.sleep(0)
+        running_status = await tools.get_scan_status(job.job_id)
+        with pytest.raises(tools.CalledToolError):
+            await tools.get_scan_results(job.job_id)
+        release.set()
+        await tools.scan_jobs.wait(job.job_id)
+        return {
+            "running_status": running_status,
+            "status": await tools.get_scan_status(job.job_id),
+            "results": await tools.get_scan_results(job.job_id),
+        }
+
+    polled = asyncio.run(_poll())
+
+    assert polled["running_status"].status == "running"
+    assert polled["status"].status == "completed"
+    assert len(polled["results"]) > 0
+    assert polled["results"] == tools._to_service_results(
+        models.ScanResult.from_dict(fake_output)
+    )
@@ -0,0 +1,195 @@
+"""Unittests for the MCP scan results cache."""
+
+import asyncio
+import json
+import pathlib
+import threading
+from typing import Any, Dict, Optional
+
+import pytest
+from pytest_mock import plugin
+
+from agent import models
+from agent import nmap_options
+from agent.mcp import jobs
+from agent.mcp import mcp_types
+from agent.mcp import result_cache
+from agent.mcp import tools
+
+
+def _service(host: str) -> mcp_types.ServiceResult:
+    return mcp_types.ServiceResult(
+        host=host,
+        port=443,
+        protocol="tcp",
+        state="open",
+        service="https",
+        banner="",
+        version="4",
+        fingerprints=[
+            mcp_types.FingerprintResult(
+                host=host,
+                version="4",
+                library_type="BACKEND_COMPONENT",
+                port=443,
+                protocol="tcp",
+                library_name="nginx",
+                library_version="1.25",
+                detail="nginx 1.25",
+            )
+        ],
+    )
+
+
+def testCacheKey_whenOptionsDiffer_keysDiffer() -> None:
+    options = nmap_options.NmapOptions(ports="0-65535")
+
+    assert result_cache.cache_key("8.8.8.8", options) == result_cache.cache_key(
+        "8.8.8.8", nmap_options.NmapOptions(ports="0-65535")
+    )
+    assert result_cache.cache_key("8.8.8.8", options) != result_cache.cache_key(
+        "8.8.8.8", nmap_options.NmapOptions(ports="80")
+    )
+
+
+@pytest.mark.parametrize(
+    "target, equivalent_target",
+    [
+        ("10.0.0.1", "10.0.0.1/32"),
+        ("2001:db8::1", "2001:DB8:0::1/128"),
+        ("Example.com", "example.com"),
+    ],
+)
+def testCacheKey_whenTargetsAreEquivalent_keysAreEqual(
+    target: str, equivalent_target: str
+) -> None:
+    options = nmap_options.NmapOptions(ports="0-65535")
+
+    assert result_cache.cache_key(target, options) == result_cache.cache_key(
+        equivalent_target, options
+    )
+
+
+def testResultCacheGet_whenResultsAreMutated_cachedResultsAreUnchanged() -> None:
+    cache = result_cache.ResultCache()
+    results = [_service("8.8.8.8")]
+    cache.put("key", results)
+    results[0].fingerprints.clear()
+
+    cached_results = cache.get("key")
+    assert cached_results is not None
+    cached_results[0].port = 8443
+    cached_results.append(_service("8.8.4.4"))
+
+    assert cache.get("key") == [_service("8.8.8.8")]
+
+
+def testFromEnvironment_whenSettingsAreSet_configuresTheCache(
+    tmp_path: pathlib.Path,
+) -> None:
+    path = str(tmp_path / "scan_results.json")
+    cache = result_cache.from_environment(
+        {
+            "NMAP_MCP_CACHE_TTL": "0",
+            "NMAP_MCP_CACHE_MAX_ENTRIES": "1",
+            "NMAP_MCP_CACHE_PATH": path,
+        }
+    )
+
+    cache.put("first", [_service("10.0.0.1")])
+    cache.put("second", [_service("10.0.0.2")])
+
+    assert cache.get("second") is None
+    assert list(json.loads(pathlib.Path(path).read_text())) == ["second"]
+
+
+def testResultCacheGet_whenTtlExpired_returnsNone() -> None:
+    cache = result_cache.ResultCache(ttl=0)
+    cache.put("key", [_service("8.8.8.8")])
+
+    assert cache.get("key") is None
+
+
+def testResultCacheGet_whenScanFoundNoService_expiresAfterTheEmptyTtl() -> None:
+    cache = result_cache.ResultCache(ttl=3600, empty_ttl=0)
+    cache.put("empty", [])
+    cache.put("found", [_service("8.8.8.8")])
+
+    assert cache.get("empty") is None
+    assert cache.get("found") == [_service("8.8.8.8")]
+
+
+def testResultCachePut_whenMaxEntriesExceeded_evictsLeastRecentlyUsed() -> None:
+    cache = result_cache.ResultCache(max_entries=2)
+    cache.put("first", [_service("10.0.0.1")])
+    cache.put("second", [_service("10.0.0.2")])
+    cache.get("first")
+
+    cache.put("third", [_service("10.0.0.3")])
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+
+
+def testResultCache_withPath_persistsResultsAcrossInstances(
+    tmp_path: pathlib.Path,
+) -> None:
+    path = str(tmp_path / "scan_results.json")
+    result_cache.ResultCache(path=path).put("key", [_service("8.8.8.8")])
+
+    assert result_cache.ResultCache(path=path).get("key") == [_service("8.8.8.8")]
+
+
+def testMcpScan_whenTargetScannedRecently_returnsCachedResultsUnlessForced(
+    mocker: plugin.MockerFixture, fake_output: Optional[Dict[str, Any]]
+) -> None:
+    scan_hosts_mock = mocker.patch(
+        "agent.nmap_async_wrapper.AsyncNmapWrapper.scan_hosts",
+        return_value=(models.ScanResult.from_dict(fake_output), ""),
+    )
+    mocker.patch.object(
+        tools, "scan_jobs", jobs.ScanJobQueue(scan=tools._scan_services)
+    )
+    mocker.patch.object(tools, "scan_results_cache", result_cache.ResultCache())
+
+    async def _scan_three_times() -> None:
+        first_results = await tools.scan("8.8.8.8")
+        assert await tools.scan("8.8.8.8") == first_results
+        job = await tools.submit_scan("8.8.8.8")
+        assert job.status == "completed"
+        await tools.scan("8.8.8.8", force_refresh=True)
+
+    asyncio.run(_scan_three_times())
+
+    assert scan_hosts_mock.call_count == 2
+
+
+def testMcpScan_whenScanCompletes_persistsTheResultsOffTheEventLoop(
+    mocker: plugin.MockerFixture,
+    fake_output: Optional[Dict[str, Any]],
+    tmp_path: pathlib.Path,
+) -> None:
+    mocker.patch(
+        "agent.nmap_async_wrapper.AsyncNmapWrapper.scan_hosts",
+        return_value=(models.ScanResult.from_dict(fake_output), ""),
+    )
+    mocker.patch.object(
+        tools, "scan_jobs", jobs.ScanJobQueue(scan=tools._scan_services)
+    )
+    cache = result_cache.ResultCache(path=str(tmp_path / "scan_results.json"))
+    mocker.patch.object(tools, "scan_results_cache", cache)
+    save_threads = []
+    original_save = cache._save
+
+    def _save(path: str) -> None:
+        save_threads.append(threading.current_thread())
+        original_save(path)
+
+    mocker.patch.object(cache, "_save", side_effect=_save)
+
+    asyncio.run(tools.scan("8.8.8.8"))
+
+    assert len(save_threads) == 1
+    assert save_threads[0] is not threading.main_thread()
+    assert len(json.loads((tmp_path / "scan_results.json").read_text())) == 1
@@ -0,0 +1,124 @@
+"""Unittests for the scan result model."""
+
+import dataclasses
+import pathlib
+import pickle
+import sys
+from typing import Any
+
+import pytest
+import xmltodict
+
+from agent import models
+from agent import nmap_xml
+
+FIXTURES_PATH = pathlib.Path(__file__).parent
+PORTS_PER_HOST = 100
+
+
+def _write_large_xml_output(path: pathlib.Path, hosts_count: int) -> None:
+    """Write an nmap XML output of `hosts_count` hosts exposing `PORTS_PER_HOST` ports each."""
+    with path.open("w") as o:
+        o.write('<?xml version="1.0"?><nmaprun>')
+        for index in range(hosts_count):
+            o.write(
+                f'<host><status state="up"/><address addr="10.0.{index // 256}.{index % 256}" addrtype="ipv4"/>'
+                "<hostnames/><ports>"
+            )
+            for port in range(PORTS_PER_HOST):
+                o.write(
+                    f'<port protocol="tcp" portid="{1000 + port}"><state state="open"/>'
+                    '<service name="http" product="nginx" version="1.25"/>'
+                    '<script id="banner" output="nginx"/></port>'
+                )
+            o.write("</ports></host>")
+        o.write("</nmaprun>")
+
+
+def _deep_size(root: Any) -> int:
+    """Bytes held by `root` and every object it references, shared objects are counted once."""
+    seen = set()
+    stack = [root]
+    size = 0
+    while len(stack) > 0:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(type(obj), "__slots__"):
+            stack.extend(getattr(obj, slot) for slot in type(obj).__slots__)
+    return size
+
+
+@pytest.mark.parametrize(
+    "fixture_name",
+    [
+        "fake_output.xml",
+        "fake_output_range.xml",
+        "fake_output_crash_1.xml",
+        "fake_output_crash_2.xml",
+        "fake_output_with_down_host.xml",
+        "nmap_product_output.xml",
+    ],
+)
+def testHostFromElement_always_matchesHostFromDict(fixture_name: str) -> None:
+    xml_output_path = FIXTURES_PATH / fixture_name
+    expected = models.ScanResult.from_dict(xmltodict.parse(xml_output_path.read_text()))
+
+    hosts = tuple(
+        models.Host.from_element(host)
+        for host in nmap_xml.iter_host_elements(str(xml_output_path))
+    )
+
+    assert hosts == expected.hosts
+
+
+def testPort_always_hasNoInstanceDict() -> None:
+    port = models.Port(
+        port_id="80", protocol="tcp", state="open", service=models.Service()
+    )
+
+    assert hasattr(port, "__dict__") is False
+
+
+def testScanResult_always_isImmutableAndPicklable() -> None:
+    scan_result = models.ScanResult.from_dict(
+        xmltodict.parse((FIXTURES_PATH / "fake_output.xml").read_text())
+    )
+    host = scan_result.hosts[0]
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        host.address = "10.0.0.1"  # type: ignore[misc]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        host.ports[0].service.name = "ftp"  # type: ignore[misc]
+    with pytest.raises(AttributeError):
+        host.ports.append(host.ports[0])  # type: ignore[attr-defined]
+    assert pickle.loads(pickle.dumps(scan_result)) == scan_result
+
+
+def testScanResult_with100kPorts_usesLessMemoryThanXmltodictTree(
+    tmp_path: pathlib.Path,
+) -> None:
+    """Benchmark on a 100k-port output: the model retains a fraction of the memory of the parsed dict tree."""
+    xml_output_path = tmp_path / "xmloutput"
+    _write_large_xml_output(xml_output_path, hosts_count=1000)
+
+    dict_tree = xmltodict.parse(xml_output_path.read_bytes())
+    dict_tree_memory = _deep_size(dict_tree)
+    del dict_tree
+    scan_result = models.ScanResult(
+        hosts=tuple(
+            models.Host.from_element(host)
+            for host in nmap_xml.iter_host_elements(str(xml_output_path))
+        )
+    )
+    model_memory = _deep_size(scan_result)
+
+    assert sum(len(host.ports) for host in scan_result.hosts) == 100_000
+    assert model_memory < dict_tree_memory / 3
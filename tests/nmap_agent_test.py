@@ -1,16 +1,25 @@
 """Unittests for Nmap agent."""
 
+import ipaddress
 import json
-from typing import List, Dict, Union
+import pathlib
+from typing import Any, Iterator, List, Dict, Union
 import subprocess
+import threading
+import time
 
 import requests_mock as rq_mock
 from ostorlab.agent.message import message
 from ostorlab.utils import definitions as utils_definitions
 from pytest_mock import plugin
 
+from agent import discovery
+from agent import models
 from agent import nmap_agent
 from agent import nmap_options
+from agent import nmap_xml
+from agent import scheduler
+from agent import workspace
 import pytest
 
 SCAN_RESULT_HOST_AS_LIST = {
@@ -224,6 +233,19 @@ PORT     STATE  SERVICE  VERSION
 80/tcp   open   http     awselb/2.0
 """
 
+THREE_HOSTS_XML_OUTPUT = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE nmaprun>
+<nmaprun scanner="nmap" args="nmap 192.168.1.0/26" version="7.94" xmloutputversion="1.05">
+<host><status state="up"/><address addr="192.168.1.1" addrtype="ipv4"/><hostnames/>
+<ports><port protocol="tcp" portid="22"><state state="open"/><service name="ssh"/></port></ports></host>
+<host><status state="up"/><address addr="192.168.1.2" addrtype="ipv4"/><hostnames/>
+<ports><port protocol="tcp" portid="80"><state state="open"/><service name="http"/></port></ports></host>
+<host><status state="up"/><address addr="192.168.1.3" addrtype="ipv4"/><hostnames/>
+<ports><port protocol="tcp" portid="443"><state state="open"/><service name="https"/></port></ports></host>
+<runstats><finished time="1" exit="success"/></runstats>
+</nmaprun>
+"""
+
 
 def testAgentLifecycle_whenScanRunsWithoutErrors_emitsBackMessagesAndVulnerability(
     nmap_test_agent: nmap_agent.NmapAgent,
@@ -237,7 +259,7 @@ def testAgentLifecycle_whenScanRunsWithoutErrors_emitsBackMessagesAndVulnerabili
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(JSON_OUTPUT, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(JSON_OUTPUT), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -267,7 +289,7 @@ def testAgentLifecycle_whenScanRunsWithoutErrors_emitsBackVulnerabilityMsg(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(JSON_OUTPUT, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(JSON_OUTPUT), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -291,7 +313,7 @@ def testAgentLifecycle_whenLinkAssetAndScanRunsWithoutErrors_emitsBackMessagesAn
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(JSON_OUTPUT, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(JSON_OUTPUT), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(link_msg)
@@ -329,7 +351,7 @@ def testAgentEmitBanner_whenScanRunsWithoutErrors_emitsMsgWithBanner(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -363,7 +385,7 @@ def testAgentEmitBannerScanDomain_whenScanRunsWithoutErrors_emitsMsgWithBanner(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -387,7 +409,7 @@ def testAgentScanDomain_whenScanRunsWithoutErrors_emitsDomainService(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -416,7 +438,7 @@ def testAgentNmap_whenUrlsScriptsGivent_RunScan(
 ) -> None:
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
     requests_mock.get(
         "https://raw.githubusercontent.com/nmap-scripts/main/test1",
@@ -451,7 +473,7 @@ def testAgentNmapOptions_whenUrlsScriptsGivent_RunScan(
 ) -> None:
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     requests_mock.get(
@@ -488,7 +510,7 @@ def testAgentNmapOptions_whenUrlsScriptsGivent_RunScan2(
 ) -> None:
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output_range, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output_range), HUMAN_OUTPUT),
     )
 
     requests_mock.get(
@@ -526,7 +548,7 @@ def testEmitFingerprints_whenScanFindsBanner_emitsFingerprint(
     """Test when nmap banner agent reports service, fingerprint is sent."""
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -558,7 +580,7 @@ def testAgentNmapOptions_withMaxNetworkMask_scansEachSubnet(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.settings.args = [
@@ -591,7 +613,7 @@ def testAgentProcessMessage_whenASubnetIsTargetdAfterABiggerRangeIsPreviouslySca
     """The agent must not scan subnets if a larger network has been scanned before."""
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(JSON_OUTPUT, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(JSON_OUTPUT), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(ipv4_msg_with_mask)
@@ -621,7 +643,7 @@ def testAgentEmitBannerScanDomain_withMultiplehostnames_reportVulnerabilities(
     """Unittest for testing the reporting of vulnerabilities in case multiple hostnames from scan result."""
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -643,7 +665,7 @@ def testNmapAgent_withDomainScopeArgAndLinkMessageNotInScope_targetShouldNotBeSc
     del agent_persist_mock
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
     msg = message.Message.from_data(
         selector="v3.asset.link",
@@ -668,7 +690,7 @@ def testAgentNmapOptions_whenServiceHasProduct_reportsFingerprint(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output_product, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output_product), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -721,7 +743,10 @@ def testNmapAgent_whenHostIsNotUp_shouldNotRaisAnError(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(fake_output_with_down_host, HUMAN_OUTPUT),
+        return_value=(
+            models.ScanResult.from_dict(fake_output_with_down_host),
+            HUMAN_OUTPUT,
+        ),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -742,7 +767,10 @@ def testNmapAgent_whenDomainIsNotUp_shouldNotRaisAnError(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output_with_down_host, HUMAN_OUTPUT),
+        return_value=(
+            models.ScanResult.from_dict(fake_output_with_down_host),
+            HUMAN_OUTPUT,
+        ),
     )
 
     nmap_test_agent.process(domain_is_down_msg)
@@ -764,7 +792,7 @@ def testAgentLifecycle_whenScanRunsWithVpn_shouldConnectToVPN(
     mocker.patch("builtins.open")
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(JSON_OUTPUT, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(JSON_OUTPUT), HUMAN_OUTPUT),
     )
 
     nmap_agent_with_vpn_config_arg.start()
@@ -798,7 +826,7 @@ def testNmapAgentLifecycle_whenIpv6WithHostBits_agentShouldNotCrash(
     """Unit test of nmap agent when ipv6 with host bits is provided, the agent should not crash."""
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(IPV6_JSON_OUTPUT, IPV6_HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(IPV6_JSON_OUTPUT), IPV6_HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(ipv6_msg)
@@ -814,6 +842,38 @@ def testNmapAgentLifecycle_whenIpv6WithHostBits_agentShouldNotCrash(
     )
 
 
+def testAgentProcess_whenIpv6HostHasServices_stillScansSiblingRangesOfItsSlash64(
+    nmap_test_agent: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    mocker: plugin.MockerFixture,
+) -> None:
+    scan_hosts_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_hosts",
+        return_value=(models.ScanResult.from_dict(IPV6_JSON_OUTPUT), IPV6_HUMAN_OUTPUT),
+    )
+    host_msg = message.Message.from_data(
+        selector="v3.asset.ip.v6",
+        data={
+            "version": 6,
+            "host": "2600:3c01:224a:6e00:f03c:91ff:fe18:bb2f",
+            "mask": "128",
+        },
+    )
+    sibling_msg = message.Message.from_data(
+        selector="v3.asset.ip.v6",
+        data={"version": 6, "host": "2600:3c01:224a:6e00::1:0", "mask": "112"},
+    )
+
+    nmap_test_agent.process(host_msg)
+    nmap_test_agent.process(sibling_msg)
+
+    assert [call.kwargs for call in scan_hosts_mock.call_args_list] == [
+        {"hosts": "2600:3c01:224a:6e00:f03c:91ff:fe18:bb2f", "mask": 128},
+        {"hosts": "2600:3c01:224a:6e00::1:0", "mask": 112},
+    ]
+
+
 def testNmapAgent_whenIpv6WithoutMask_agentShouldNotGetStuck(
     nmap_test_agent: nmap_agent.NmapAgent,
     agent_mock: List[message.Message],
@@ -893,7 +953,7 @@ def testAgent_whenServiceWithProductAndVersion_fingerprintMessageShouldHaveLibra
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(product_fake_output, ""),
+        return_value=(models.ScanResult.from_dict(product_fake_output), ""),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -964,7 +1024,7 @@ def testAgent_whenHostHaveOs_fingerprintMessageShouldHaveOs(
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(product_fake_output, ""),
+        return_value=(models.ScanResult.from_dict(product_fake_output), ""),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -1036,7 +1096,7 @@ def testAgent_whenOsClassIsList_fingerprintMessageShouldHaveOs(
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(product_fake_output, ""),
+        return_value=(models.ScanResult.from_dict(product_fake_output), ""),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -1088,7 +1148,7 @@ def testAgent_whenOsMatchIsEmptyList_fingerprintMessageShouldHaveOs(
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(product_fake_output, ""),
+        return_value=(models.ScanResult.from_dict(product_fake_output), ""),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -1144,7 +1204,7 @@ def testAgent_whenOsMatchIsList_fingerprintMessageShouldHaveOs(
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(product_fake_output, ""),
+        return_value=(models.ScanResult.from_dict(product_fake_output), ""),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -1165,7 +1225,7 @@ def testAgentNmap_withOSFingerprintCrash1_noException(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(fake_crash_1_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_crash_1_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.settings.args = [
@@ -1194,7 +1254,7 @@ def testAgentNmap_withOSFingerprintCrash2_noException(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(fake_crash_2_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_crash_2_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.settings.args = [
@@ -1236,7 +1296,7 @@ def testAgentLifecycle_whenTCPWrappedService_emitsNoService(
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(json_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(json_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(ipv4_msg)
@@ -1290,7 +1350,7 @@ def testAgentLifecycle_whenDomainTCPWrappedService_emitsNoService(
 
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_hosts",
-        return_value=(product_fake_output, ""),
+        return_value=(models.ScanResult.from_dict(product_fake_output), ""),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -1311,7 +1371,10 @@ def testAgentNmapOptions_whenServiceHasNoProduct_reportsFingerprint(
     """
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(SCAN_RESULT_NO_PRODUCT, HUMAN_OUTPUT),
+        return_value=(
+            models.ScanResult.from_dict(SCAN_RESULT_NO_PRODUCT),
+            HUMAN_OUTPUT,
+        ),
     )
 
     nmap_test_agent.process(domain_msg)
@@ -1330,12 +1393,15 @@ def testAgentNmapOptions_whenNmaprunHostIsList_noCrash(
     crash, instead it completes its emitting process for each of the hosts in the host list."""
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(SCAN_RESULT_HOST_AS_LIST, HUMAN_OUTPUT),
+        return_value=(
+            models.ScanResult.from_dict(SCAN_RESULT_HOST_AS_LIST),
+            HUMAN_OUTPUT,
+        ),
     )
 
     nmap_test_agent.process(domain_msg)
 
-    network_scan_finding = agent_mock[6].data
+    network_scan_finding = agent_mock[4].data
     assert "title" in network_scan_finding
     assert "technical_detail" in network_scan_finding
     assert "14.242.111.45" in network_scan_finding["technical_detail"]
@@ -1347,7 +1413,8 @@ def testAgentNmapOptions_whenNmaprunHostIsList_noCrash(
         "state": "open",
         "service": "http",
     } in [msg.data for msg in agent_mock]
-    assert len(agent_mock) == 14
+    # Services of the first host are reported once, and not attached to the second host.
+    assert len(agent_mock) == 10
 
 
 def testAgentNmap_whenApiSchemaMessage_shouldScanDomain(
@@ -1361,7 +1428,7 @@ def testAgentNmap_whenApiSchemaMessage_shouldScanDomain(
     """Test that the agent processes api_schema messages and scans the domain."""
     mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(api_schema_msg)
@@ -1384,7 +1451,7 @@ def testAgentNmap_whenSameApiSchemaReceivedTwice_shouldScanOnce(
     """Test that duplicate api_schema messages are only processed once."""
     mock_scan = mocker.patch(
         "agent.nmap_wrapper.NmapWrapper.scan_domain",
-        return_value=(fake_output, HUMAN_OUTPUT),
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
     )
 
     nmap_test_agent.process(api_schema_msg)
@@ -1392,3 +1459,516 @@ def testAgentNmap_whenSameApiSchemaReceivedTwice_shouldScanOnce(
 
     # Should only scan once
     assert mock_scan.call_count == 1
+
+
+def testAgentProcess_withScanWorkers_scansSubnetsInParallel(
+    nmap_agent_parallel: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    """Subnets of a range are dispatched to the worker pool and every subnet result is emitted."""
+    scanned_threads = set()
+
+    def _scan_hosts(hosts: str, mask: int) -> tuple[models.ScanResult, str]:
+        scanned_threads.add(threading.current_thread().name)
+        return models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT
+
+    scan_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_hosts", side_effect=_scan_hosts
+    )
+
+    nmap_agent_parallel.process(ipv4_msg2)
+
+    assert scan_mock.call_count == 4
+    assert sorted(call.kwargs["hosts"] for call in scan_mock.call_args_list) == [
+        "192.168.0.0",
+        "192.168.0.1",
+        "192.168.0.2",
+        "192.168.0.3",
+    ]
+    assert all(name.startswith("nmap-scan") for name in scanned_threads) is True
+    assert len(agent_mock) == 7 * 4
+
+
+def testAgentProcess_whenStreamResults_emitsResultsOfEveryHost(
+    nmap_agent_stream_results: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Services of a host are emitted as soon as nmap reports it, reports follow once the scan is done."""
+    emitted_before_scan_end = []
+
+    def _iter_scan_hosts(
+        hosts: str, mask: int, scan_workspace: workspace.ScanWorkspace
+    ) -> Iterator[models.Host]:
+        xml_output_path = pathlib.Path(scan_workspace.xml_output_path)
+        xml_output_path.write_text(THREE_HOSTS_XML_OUTPUT)
+        pathlib.Path(scan_workspace.normal_output_path).write_text(HUMAN_OUTPUT)
+        for host in nmap_xml.iter_host_elements(str(xml_output_path)):
+            yield models.Host.from_element(host)
+            time.sleep(0.05)
+            emitted_before_scan_end.append(len(agent_mock))
+
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.iter_scan_hosts", side_effect=_iter_scan_hosts
+    )
+    scan_hosts_mock = mocker.patch("agent.nmap_wrapper.NmapWrapper.scan_hosts")
+    msg = message.Message.from_data(
+        selector="v3.asset.ip.v4",
+        data={"version": 4, "host": "192.168.1.0", "mask": "26"},
+    )
+
+    nmap_agent_stream_results.process(msg)
+
+    assert scan_hosts_mock.call_count == 0
+    assert emitted_before_scan_end[0] > 0
+    reports = [m for m in agent_mock if m.selector == "v3.report.vulnerability"]
+    assert [r.data["vulnerability_location"]["ipv4"]["host"] for r in reports] == [
+        "192.168.1.1",
+        "192.168.1.2",
+        "192.168.1.3",
+    ]
+    services = [m for m in agent_mock if m.selector == "v3.asset.ip.v4.port.service"]
+    assert [(m.data["host"], m.data["port"]) for m in services] == [
+        ("192.168.1.1", 22),
+        ("192.168.1.2", 80),
+        ("192.168.1.3", 443),
+    ]
+
+
+def testAgentStart_whenUrlsScriptsGiven_prefetchesScriptsOnceForAllScans(
+    nmap_test_agent_with_scripts_arg: nmap_agent.NmapAgent,
+    requests_mock: rq_mock.mocker.Mocker,
+) -> None:
+    requests_mock.get(
+        "https://raw.githubusercontent.com/nmap-scripts/main/test1",
+        content=b"test1",
+    )
+    requests_mock.get(
+        "https://raw.githubusercontent.com/nmap-scripts/main/test2",
+        content=b"test2",
+    )
+
+    nmap_test_agent_with_scripts_arg.start()
+    commands = [
+        nmap_test_agent_with_scripts_arg._host_options().command_options
+        for _ in range(16)
+    ]
+
+    assert requests_mock.call_count == 2
+    assert all(command == commands[0] for command in commands) is True
+    script_paths = [
+        commands[0][index + 1]
+        for index, option in enumerate(commands[0])
+        if option == "--script"
+    ]
+    assert [pathlib.Path(path).read_bytes() for path in script_paths] == [
+        b"test1",
+        b"test2",
+    ]
+
+
+def testAgentProcess_withScanBatchSize_scansSubnetsInBatches(
+    nmap_agent_batched: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    """The 4 subnets of the range are scanned by 2 nmap runs, one of 3 subnets and one of the remaining subnet."""
+    scan_targets_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_targets",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+    scan_hosts_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_hosts",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+
+    nmap_agent_batched.process(ipv4_msg2)
+
+    assert scan_targets_mock.call_count == 1
+    assert scan_targets_mock.call_args.args[0] == [
+        "192.168.0.0/32",
+        "192.168.0.1/32",
+        "192.168.0.2/32",
+    ]
+    assert scan_hosts_mock.call_count == 1
+    assert scan_hosts_mock.call_args.kwargs == {"hosts": "192.168.0.3", "mask": 32}
+    assert len(agent_mock) == 7 * 2
+
+
+def testAgentProcess_withTwoPhaseScan_enumeratesOnlyTheDiscoveredOpenPorts(
+    nmap_agent_two_phase: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    """The discovery sweep finds 2 live hosts with different open ports, each is enumerated on its open ports only."""
+    discovery_output = {
+        "nmaprun": {
+            "host": [
+                {
+                    "address": {"@addr": address, "@addrtype": "ipv4"},
+                    "ports": {
+                        "port": {
+                            "@protocol": "tcp",
+                            "@portid": port_id,
+                            "state": {"@state": "open"},
+                        }
+                    },
+                }
+                for address, port_id in (("192.168.0.1", "80"), ("192.168.0.3", "22"))
+            ]
+        }
+    }
+    enumerated: List[Dict[str, Any]] = []
+
+    def _scan_targets(
+        wrapper: Any, targets: List[str]
+    ) -> tuple[models.ScanResult, str]:
+        if wrapper._options.version_detection is False:
+            return models.ScanResult.from_dict(discovery_output), ""
+        enumerated.append({"targets": targets, "options": wrapper._options})
+        return models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT
+
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_targets",
+        autospec=True,
+        side_effect=_scan_targets,
+    )
+
+    nmap_agent_two_phase.process(ipv4_msg2)
+
+    assert [scan["targets"] for scan in enumerated] == [
+        ["192.168.0.1"],
+        ["192.168.0.3"],
+    ]
+    assert [scan["options"].ports for scan in enumerated] == ["T:80", "T:22"]
+    assert all(scan["options"].no_ping is True for scan in enumerated) is True
+    assert all(scan["options"].os_detection is True for scan in enumerated) is True
+    assert len(agent_mock) > 0
+
+
+def testProcessHostsStreamed_withTwoPhaseScan_reportsEachBatchScannedOnceAllGroupsAreDone(
+    nmap_agent_two_phase: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    mocker: plugin.MockerFixture,
+) -> None:
+    """A batch with 2 enumeration groups is done after both, a batch without open ports is done too."""
+    events: List[Any] = []
+    groups = {
+        "10.0.0.0/30": [
+            discovery.EnumerationGroup(addresses=["10.0.0.1"], ports=["T:80"]),
+            discovery.EnumerationGroup(addresses=["10.0.0.2"], ports=["T:22"]),
+        ],
+        "10.0.0.4/30": [],
+    }
+
+    def _iter_scan_targets(
+        wrapper: Any, targets: List[str], scan_workspace: workspace.ScanWorkspace
+    ) -> Iterator[models.Host]:
+        pathlib.Path(scan_workspace.xml_output_path).write_text("<nmaprun></nmaprun>")
+        pathlib.Path(scan_workspace.normal_output_path).write_text("")
+        events.append(("enumerated", targets))
+        yield from []
+
+    mocker.patch.object(
+        nmap_agent_two_phase,
+        "_discover_open_ports",
+        side_effect=lambda batch, options: groups[f"{batch[0][0]}/{batch[0][1]}"],
+    )
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.iter_scan_targets",
+        autospec=True,
+        side_effect=_iter_scan_targets,
+    )
+
+    nmap_agent_two_phase._process_hosts_streamed(
+        iter([[("10.0.0.0", 30)], [("10.0.0.4", 30)]]),
+        nmap_agent_two_phase._host_options(),
+        None,
+        lambda batch, live_hosts: events.append(("scanned", batch)),
+    )
+
+    scanned = [event for event in events if event[0] == "scanned"]
+    assert sorted(scanned) == [
+        ("scanned", [("10.0.0.0", 30)]),
+        ("scanned", [("10.0.0.4", 30)]),
+    ]
+    assert events.index(("scanned", [("10.0.0.0", 30)])) > events.index(
+        ("enumerated", ["10.0.0.2"])
+    )
+
+
+def testAgentProcess_withHostDiscovery_portScansOnlyLiveHosts(
+    nmap_agent_host_discovery: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    """The range is swept once, then its 3 live hosts are port scanned in batches of 2 without pinging them again."""
+    sweep_output = {
+        "nmaprun": {
+            "host": [
+                {
+                    "status": {"@state": "up"},
+                    "address": {"@addr": address, "@addrtype": "ipv4"},
+                }
+                for address in ("192.168.0.0", "192.168.0.1", "192.168.0.3")
+            ]
+        }
+    }
+    sweeps: List[Dict[str, Any]] = []
+    port_scans: List[Any] = []
+
+    def _scan_hosts(
+        wrapper: Any, hosts: str, mask: int
+    ) -> tuple[models.ScanResult, str]:
+        if wrapper._options.ping_scan is True:
+            sweeps.append({"hosts": hosts, "mask": mask})
+            return models.ScanResult.from_dict(sweep_output), ""
+        port_scans.append(([f"{hosts}/{mask}"], wrapper._options))
+        return models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT
+
+    def _scan_targets(
+        wrapper: Any, targets: List[str]
+    ) -> tuple[models.ScanResult, str]:
+        port_scans.append((targets, wrapper._options))
+        return models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT
+
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_hosts",
+        autospec=True,
+        side_effect=_scan_hosts,
+    )
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_targets",
+        autospec=True,
+        side_effect=_scan_targets,
+    )
+
+    nmap_agent_host_discovery.process(ipv4_msg2)
+
+    assert sweeps == [{"hosts": "192.168.0.0", "mask": 30}]
+    assert sorted(targets for targets, _ in port_scans) == [
+        ["192.168.0.0/32", "192.168.0.1/32"],
+        ["192.168.0.3/32"],
+    ]
+    assert all(options.no_ping is True for _, options in port_scans) is True
+    assert len(agent_mock) > 0
+
+
+def testAgentProcess_withHostDiscoveryWhenRangeIsRedelivered_sweepsItOnce(
+    nmap_agent_host_discovery: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    sweep_output = {
+        "nmaprun": {
+            "host": {
+                "status": {"@state": "up"},
+                "address": {"@addr": "192.168.0.1", "@addrtype": "ipv4"},
+            }
+        }
+    }
+    sweeps: List[str] = []
+
+    def _scan_hosts(
+        wrapper: Any, hosts: str, mask: int
+    ) -> tuple[models.ScanResult, str]:
+        if wrapper._options.ping_scan is True:
+            sweeps.append(f"{hosts}/{mask}")
+            return models.ScanResult.from_dict(sweep_output), ""
+        return models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT
+
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_hosts",
+        autospec=True,
+        side_effect=_scan_hosts,
+    )
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_targets",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+
+    nmap_agent_host_discovery.process(ipv4_msg2)
+    nmap_agent_host_discovery.process(ipv4_msg2)
+
+    assert sweeps == ["192.168.0.0/30"]
+
+
+def testNmapOptions_whenPingScan_onlyRunsHostDiscovery() -> None:
+    options = nmap_options.NmapOptions(
+        ports="0-65535", tcp_syn_ping_ports="22,443", ping_scan=True
+    )
+
+    assert options.command_options == ["-R", "-T3", "-sn", "-PS22,443"]
+
+
+def testAgentProcess_withAdaptiveSplit_growsSubnetsOfAFastRange(
+    nmap_agent_adaptive_split: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Union[str, bytes]],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    """Scans finish instantly, so the subnets following the first one grow while still covering the whole range."""
+    scan_hosts_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_hosts",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+
+    nmap_agent_adaptive_split.process(ipv4_msg2)
+
+    scanned = [
+        (call.kwargs["hosts"], call.kwargs["mask"])
+        for call in scan_hosts_mock.call_args_list
+    ]
+    assert scanned[0] == ("192.168.0.0", 32)
+    assert len(scanned) < 4
+    assert sorted(
+        str(address)
+        for host, mask in scanned
+        for address in ipaddress.ip_network(f"{host}/{mask}")
+    ) == ["192.168.0.0", "192.168.0.1", "192.168.0.2", "192.168.0.3"]
+
+
+def testAgentProcess_whenRangeScanWasInterrupted_resumesUnfinishedSubnets(
+    nmap_agent_batched: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Any],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    """The first subnet was scanned and the second one was running when the agent stopped."""
+    agent_persist_mock[b"agent_nmap_asset"] = {
+        "192.168.0.0/32",
+        "192.168.0.1/32",
+    }
+    agent_persist_mock["agent_nmap_scan_plan:192.168.0.0/30"] = {
+        b"kind": b"split",
+        b"192.168.0.0/32": b"done",
+        b"192.168.0.1/32": b"running",
+        b"192.168.0.2/32": b"pending",
+        b"192.168.0.3/32": b"pending",
+    }
+    scan_targets_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_targets",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+
+    nmap_agent_batched.process(ipv4_msg2)
+
+    assert scan_targets_mock.call_count == 1
+    assert scan_targets_mock.call_args.args[0] == [
+        "192.168.0.1/32",
+        "192.168.0.2/32",
+        "192.168.0.3/32",
+    ]
+    assert "agent_nmap_scan_plan:192.168.0.0/30" not in agent_persist_mock
+
+
+def testAgentProcess_whenOneSubnetWasProcessedBefore_scansTheRemainingSubnets(
+    nmap_agent_batched: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Any],
+    ipv4_msg2: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    agent_persist_mock[b"agent_nmap_asset"] = {"192.168.0.1/32"}
+    scan_targets_mock = mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_targets",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+
+    nmap_agent_batched.process(ipv4_msg2)
+
+    assert scan_targets_mock.call_count == 1
+    assert scan_targets_mock.call_args.args[0] == [
+        "192.168.0.0/32",
+        "192.168.0.2/32",
+        "192.168.0.3/32",
+    ]
+
+
+def testAgentProcess_whenScanFindsManyServices_writesHostMarkersOnce(
+    nmap_test_agent: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Any],
+    domain_msg: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_domain",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+    set_add_spy = mocker.spy(nmap_test_agent, "set_add")
+
+    nmap_test_agent.process(domain_msg)
+
+    assert len(agent_mock) == 12
+    assert [call.args[1:] for call in set_add_spy.call_args_list] == [
+        ("ostorlab.co",),
+        ("45.33.32.156/32",),
+    ]
+
+
+def testAgentProcess_whenScanFindsServices_sendsThemInBatchesBeforeTheReport(
+    nmap_test_agent: nmap_agent.NmapAgent,
+    agent_mock: List[message.Message],
+    agent_persist_mock: Dict[Union[str, bytes], Any],
+    domain_msg: message.Message,
+    mocker: plugin.MockerFixture,
+    fake_output: None | Dict[str, str],
+) -> None:
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.scan_domain",
+        return_value=(models.ScanResult.from_dict(fake_output), HUMAN_OUTPUT),
+    )
+
+    nmap_test_agent.process(domain_msg)
+
+    stats = nmap_test_agent._emitter.stats
+    reports = [m for m in agent_mock if m.selector == "v3.report.vulnerability"]
+    assert stats.pending == 0
+    assert stats.sent == len(agent_mock) - len(reports)
+    assert stats.batches == 2
+    assert agent_mock[0].selector != "v3.report.vulnerability"
+
+
+def testAgentStart_whenMcpCacheArgsGiven_passesThemToTheMcpServerProcess(
+    nmap_agent_mcp_server: nmap_agent.NmapAgent, mocker: plugin.MockerFixture
+) -> None:
+    popen_mock = mocker.patch("agent.mcp.runner.subprocess.Popen")
+
+    nmap_agent_mcp_server.start()
+
+    environment = popen_mock.call_args.kwargs["env"]
+    assert environment["NMAP_MCP_CACHE_TTL"] == "600"
+    assert environment["NMAP_MCP_CACHE_PATH"] == "/tmp/nmap_mcp_cache.json"
+    assert environment["NMAP_MCP_CACHE_MAX_ENTRIES"] == "256"
+    assert environment["NMAP_MCP_MAX_CONCURRENT_SCANS"] == "4"
+    assert environment["NMAP_MCP_MAX_PENDING_SCANS"] == "64"
+
+
+def testNmapAgent_withDefaultArgs_usesTheDefaultNumberOfScanWorkers(
+    nmap_test_agent: nmap_agent.NmapAgent,
+) -> None:
+    assert nmap_test_agent.args["scan_workers"] == scheduler.DEFAULT_MAX_WORKERS
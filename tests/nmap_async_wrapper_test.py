@@ -0,0 +1,199 @@
+"""Unittests for the asyncio nmap wrapper."""
+
+import asyncio
+import contextlib
+import os
+import pathlib
+import subprocess
+import sys
+import textwrap
+import time
+from typing import Iterator, List, Tuple
+
+import pytest
+from pytest_mock import plugin
+
+from agent import models
+from agent import nmap_async_wrapper
+from agent import nmap_options
+from agent import workspace
+
+FAKE_NMAP = textwrap.dedent(
+    """
+    import sys, time
+    xml_output_path, normal_output_path, pid_path, duration = sys.argv[1:]
+    import os
+    # Written aside then renamed, so the tests never read a partially written pid.
+    open(f"{pid_path}.{os.getpid()}", "w").write(str(os.getpid()))
+    os.replace(f"{pid_path}.{os.getpid()}", pid_path)
+    print("SYN Stealth Scan Timing: About 45.50% done; ETC: 15:32 (0:00:36 remaining)", flush=True)
+    time.sleep(float(duration))
+    print("Service scan Timing: About 100.00% done", flush=True)
+    open(xml_output_path, "w").write(
+        '<?xml version="1.0"?><nmaprun><host><address addr="10.0.0.1" addrtype="ipv4"/></host></nmaprun>'
+    )
+    open(normal_output_path, "w").write("Nmap done")
+    """
+)
+
+
+def _fake_nmap_command(
+    mocker: plugin.MockerFixture, pid_path: pathlib.Path, duration: float
+) -> None:
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.construct_command_host",
+        side_effect=lambda hosts, mask, scan_workspace: [
+            sys.executable,
+            "-c",
+            FAKE_NMAP,
+            scan_workspace.xml_output_path,
+            scan_workspace.normal_output_path,
+            str(pid_path),
+            str(duration),
+        ],
+    )
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def testParseProgress_whenLineReportsProgress_returnsIt() -> None:
+    progress = nmap_async_wrapper.parse_progress(
+        "SYN Stealth Scan Timing: About 45.50% done; ETC: 15:32 (0:00:36 remaining)\n"
+    )
+
+    assert progress == nmap_async_wrapper.ScanProgress(
+        task="SYN Stealth Scan", percent=45.5, remaining="0:00:36"
+    )
+    assert nmap_async_wrapper.parse_progress("Nmap scan report for 10.0.0.1") is None
+
+
+def testAsyncScanHosts_withProgressCallback_reportsProgressAndReturnsResults(
+    mocker: plugin.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    _fake_nmap_command(mocker, tmp_path / "pid", duration=0)
+    client = nmap_async_wrapper.AsyncNmapWrapper(nmap_options.NmapOptions(scripts=None))
+    progress: List[nmap_async_wrapper.ScanProgress] = []
+
+    scan_result, normal_results = asyncio.run(
+        client.scan_hosts("10.0.0.1", 32, progress_callback=progress.append)
+    )
+
+    assert [p.percent for p in progress] == [45.5, 100.0]
+    assert [host.address for host in scan_result.hosts] == ["10.0.0.1"]
+    assert normal_results == "Nmap done"
+
+
+def testAsyncScanHosts_whenTimeoutExpires_killsNmapAndRaises(
+    mocker: plugin.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    pid_path = tmp_path / "pid"
+    _fake_nmap_command(mocker, pid_path, duration=30)
+    client = nmap_async_wrapper.AsyncNmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    started_at = time.monotonic()
+    with pytest.raises(nmap_async_wrapper.ScanTimeoutError):
+        asyncio.run(client.scan_hosts("10.0.0.1", 32, timeout=0.5))
+
+    assert time.monotonic() - started_at < 5
+    assert _is_running(int(pid_path.read_text())) is False
+
+
+def testAsyncScanHosts_whenCancelled_killsNmapAndRemovesWorkspace(
+    mocker: plugin.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    pid_path = tmp_path / "pid"
+    _fake_nmap_command(mocker, pid_path, duration=30)
+    workspaces = []
+    original_open = workspace.ScanWorkspace.open
+
+    def _open(scan_workspace: workspace.ScanWorkspace) -> None:
+        original_open(scan_workspace)
+        workspaces.append(scan_workspace.path)
+
+    mocker.patch.object(workspace.ScanWorkspace, "open", _open)
+    client = nmap_async_wrapper.AsyncNmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    async def _scan_then_cancel() -> None:
+        task = asyncio.create_task(client.scan_hosts("10.0.0.1", 32))
+        while pid_path.exists() is False:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_scan_then_cancel())
+
+    assert _is_running(int(pid_path.read_text())) is False
+    assert os.path.exists(workspaces[0]) is False
+
+
+def testAsyncScanHosts_whenManyScansGathered_runsThemConcurrently(
+    mocker: plugin.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    _fake_nmap_command(mocker, tmp_path / "pid", duration=1)
+    client = nmap_async_wrapper.AsyncNmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    async def _scan_all() -> List[Tuple[models.ScanResult, str]]:
+        return list(
+            await asyncio.gather(*[client.scan_hosts("10.0.0.1", 32) for _ in range(8)])
+        )
+
+    started_at = time.monotonic()
+    results = asyncio.run(_scan_all())
+
+    assert len(results) == 8
+    assert time.monotonic() - started_at < 5
+
+
+def testAsyncScanHosts_whenNmapFails_raisesCalledProcessError(
+    mocker: plugin.MockerFixture,
+) -> None:
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.construct_command_host",
+        return_value=[sys.executable, "-c", "import sys; sys.exit(1)"],
+    )
+    client = nmap_async_wrapper.AsyncNmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(client.scan_hosts("10.0.0.1", 32))
+
+
+def testAsyncScanHosts_whenScriptsAreDownloading_keepsTheEventLoopRunning(
+    mocker: plugin.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    _fake_nmap_command(mocker, tmp_path / "pid", duration=0)
+
+    @contextlib.contextmanager
+    def _slow_checkout(
+        options: nmap_options.NmapOptions,
+    ) -> Iterator[nmap_options.NmapOptions]:
+        time.sleep(1)
+        yield options
+
+    mocker.patch.object(nmap_options.NmapOptions, "checkout_scripts", _slow_checkout)
+    client = nmap_async_wrapper.AsyncNmapWrapper(
+        nmap_options.NmapOptions(scripts=["https://example.com/script.nse"])
+    )
+    ticks = 0
+
+    async def _tick() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.05)
+
+    async def _scan_while_ticking() -> None:
+        ticker = asyncio.create_task(_tick())
+        await client.scan_hosts("10.0.0.1", 32)
+        ticker.cancel()
+
+    asyncio.run(_scan_while_ticking())
+
+    # The download takes a second, during which the loop keeps ticking every 50ms.
+    assert ticks > 10
@@ -0,0 +1,62 @@
+"""Unittests for the index of the nmap normal output."""
+
+import pathlib
+
+from agent import nmap_normal
+
+NORMAL_OUTPUT = """# Nmap 7.94 scan initiated Mon Mar 28 15:05:11 2022 as: nmap -sV -oN normal 10.0.0.0/30
+Nmap scan report for 10.0.0.1
+Host is up (0.0061s latency).
+PORT   STATE SERVICE VERSION
+22/tcp open  ssh     OpenSSH 8.9
+
+Nmap scan report for router.example.com (10.0.0.2)
+Host is up (0.0042s latency).
+PORT   STATE SERVICE VERSION
+80/tcp open  http    nginx
+
+# Nmap done at Mon Mar 28 15:06:11 2022 -- 4 IP addresses (2 hosts up) scanned in 60.00 seconds
+"""
+
+
+def testNormalOutputSection_whenFileIsMapped_returnsTheSectionOfEachHost(
+    tmp_path: pathlib.Path,
+) -> None:
+    normal_path = tmp_path / "normal"
+    normal_path.write_text(NORMAL_OUTPUT)
+
+    with nmap_normal.NormalOutput.open(str(normal_path)) as normal_output:
+        first_section = normal_output.section("10.0.0.1")
+        second_section = normal_output.section("10.0.0.2")
+        command = normal_output.command
+
+    assert first_section == (
+        "Nmap scan report for 10.0.0.1\n"
+        "Host is up (0.0061s latency).\n"
+        "PORT   STATE SERVICE VERSION\n"
+        "22/tcp open  ssh     OpenSSH 8.9"
+    )
+    assert second_section is not None
+    assert second_section.startswith(
+        "Nmap scan report for router.example.com (10.0.0.2)"
+    )
+    assert second_section.endswith("80/tcp open  http    nginx")
+    assert command == "nmap -sV -oN normal 10.0.0.0/30"
+
+
+def testNormalOutputSection_whenHostIsNotReported_returnsNone() -> None:
+    normal_output = nmap_normal.NormalOutput.from_text(NORMAL_OUTPUT)
+
+    assert normal_output.section("10.0.0.3") is None
+    assert list(normal_output.sections) == ["10.0.0.1", "10.0.0.2"]
+
+
+def testNormalOutputOpen_whenFileIsEmpty_hasNoSections(
+    tmp_path: pathlib.Path,
+) -> None:
+    normal_path = tmp_path / "normal"
+    normal_path.write_text("")
+
+    with nmap_normal.NormalOutput.open(str(normal_path)) as normal_output:
+        assert normal_output.sections == {}
+        assert normal_output.text == ""
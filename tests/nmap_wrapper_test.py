@@ -1,11 +1,21 @@
 """Nmap wrapper unit tests"""
 
 import pathlib
+import subprocess
+import sys
+import textwrap
+import time
 from unittest import mock
 
+import pytest
+import requests_mock as rq_mock
+from pytest_mock import plugin
+
 import agent.nmap_agent
 from agent import nmap_options
 from agent import nmap_wrapper
+from agent import script_cache
+from agent import workspace
 
 
 def testNmapWrapper_whenFastMode_returnCommand(
@@ -25,7 +35,10 @@ def testNmapWrapper_whenFastMode_returnCommand(
     )
     client = nmap_wrapper.NmapWrapper(options)
 
-    command = client.construct_command_host("127.0.0.1", 24)
+    with workspace.ScanWorkspace() as scan_workspace:
+        command = client.construct_command_host("127.0.0.1", 24, scan_workspace)
+        xml_output_path = scan_workspace.xml_output_path
+        normal_output_path = scan_workspace.normal_output_path
 
     assert command == [
         "nmap",
@@ -39,9 +52,9 @@ def testNmapWrapper_whenFastMode_returnCommand(
         "banner",
         "-sC",
         "-oX",
-        "/tmp/xmloutput",
+        xml_output_path,
         "-oN",
-        "/tmp/normal",
+        normal_output_path,
         "127.0.0.1/24",
     ]
 
@@ -63,7 +76,10 @@ def testNmapWrapper_whenTopPortsUsed_returnCommand(
     )
     client = nmap_wrapper.NmapWrapper(options)
 
-    command = client.construct_command_host("127.0.0.1", 24)
+    with workspace.ScanWorkspace() as scan_workspace:
+        command = client.construct_command_host("127.0.0.1", 24, scan_workspace)
+        xml_output_path = scan_workspace.xml_output_path
+        normal_output_path = scan_workspace.normal_output_path
 
     assert command == [
         "nmap",
@@ -78,9 +94,9 @@ def testNmapWrapper_whenTopPortsUsed_returnCommand(
         "banner",
         "-sC",
         "-oX",
-        "/tmp/xmloutput",
+        xml_output_path,
         "-oN",
-        "/tmp/normal",
+        normal_output_path,
         "127.0.0.1/24",
     ]
 
@@ -102,7 +118,10 @@ def testNmapWrapper_whenAllTopPortsUsed_returnCommand(
     )
     client = nmap_wrapper.NmapWrapper(options)
 
-    command = client.construct_command_host("127.0.0.1", 24)
+    with workspace.ScanWorkspace() as scan_workspace:
+        command = client.construct_command_host("127.0.0.1", 24, scan_workspace)
+        xml_output_path = scan_workspace.xml_output_path
+        normal_output_path = scan_workspace.normal_output_path
 
     assert command == [
         "nmap",
@@ -117,9 +136,9 @@ def testNmapWrapper_whenAllTopPortsUsed_returnCommand(
         "banner",
         "-sC",
         "-oX",
-        "/tmp/xmloutput",
+        xml_output_path,
         "-oN",
-        "/tmp/normal",
+        normal_output_path,
         "127.0.0.1/24",
     ]
 
@@ -210,7 +229,10 @@ def testNmapWrapper_whenTcpSynPingPortsIsUsed_returnCommand(
     )
     client = nmap_wrapper.NmapWrapper(options)
 
-    command = client.construct_command_host("127.0.0.1", 24)
+    with workspace.ScanWorkspace() as scan_workspace:
+        command = client.construct_command_host("127.0.0.1", 24, scan_workspace)
+        xml_output_path = scan_workspace.xml_output_path
+        normal_output_path = scan_workspace.normal_output_path
 
     assert command == [
         "nmap",
@@ -225,8 +247,162 @@ def testNmapWrapper_whenTcpSynPingPortsIsUsed_returnCommand(
         "banner",
         "-sC",
         "-oX",
-        "/tmp/xmloutput",
+        xml_output_path,
         "-oN",
-        "/tmp/normal",
+        normal_output_path,
         "127.0.0.1/24",
     ]
+
+
+def testScanWorkspace_whenOpenedConcurrently_allocatesIsolatedPathsAndCleansUp() -> (
+    None
+):
+    with workspace.ScanWorkspace() as first, workspace.ScanWorkspace() as second:
+        assert first.xml_output_path != second.xml_output_path
+        assert first.normal_output_path != second.normal_output_path
+        pathlib.Path(first.normal_output_path).write_text("first")
+        pathlib.Path(second.normal_output_path).write_text("second")
+        assert first.read_normal_output() == "first"
+        first_path = pathlib.Path(first.path)
+
+    assert first_path.exists() is False
+    with pytest.raises(workspace.WorkspaceNotOpenedError):
+        _ = first.xml_output_path
+
+
+def testNmapWrapperScanHosts_always_writesOutputsToAFreshWorkspace(
+    mocker: plugin.MockerFixture,
+) -> None:
+    xml_output = (pathlib.Path(__file__).parent / "fake_output.xml").read_text()
+    commands = []
+
+    def _run(command: list[str], check: bool) -> None:
+        commands.append(command)
+        pathlib.Path(command[command.index("-oX") + 1]).write_text(xml_output)
+        pathlib.Path(command[command.index("-oN") + 1]).write_text("normal output")
+
+    mocker.patch("subprocess.run", side_effect=_run)
+    client = nmap_wrapper.NmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    scan_result, normal_results = client.scan_hosts(hosts="127.0.0.1", mask=32)
+    client.scan_hosts(hosts="127.0.0.1", mask=32)
+
+    assert normal_results == "normal output"
+    assert [host.address for host in scan_result.hosts] == ["45.33.32.156"]
+    first_xml_output = commands[0][commands[0].index("-oX") + 1]
+    assert first_xml_output != commands[1][commands[1].index("-oX") + 1]
+    assert pathlib.Path(first_xml_output).exists() is False
+
+
+def testNmapWrapperScanHosts_whenScriptIsRemote_keepsItCachedWhileNmapRuns(
+    mocker: plugin.MockerFixture,
+    tmp_path: pathlib.Path,
+    requests_mock: rq_mock.mocker.Mocker,
+) -> None:
+    requests_mock.get("https://example.com/first.nse", content=b"a" * 10)
+    requests_mock.get("https://example.com/second.nse", content=b"b" * 10)
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path), max_size=15)
+    xml_output = (pathlib.Path(__file__).parent / "fake_output.xml").read_text()
+    scripts_during_scan = []
+
+    def _run(command: list[str], check: bool) -> None:
+        script_path = command[command.index("--script") + 1]
+        # Another scan fetching a script while nmap runs exceeds the size of the cache.
+        cache.get("https://example.com/second.nse")
+        scripts_during_scan.append(pathlib.Path(script_path).read_bytes())
+        pathlib.Path(command[command.index("-oX") + 1]).write_text(xml_output)
+        pathlib.Path(command[command.index("-oN") + 1]).write_text("")
+
+    mocker.patch("subprocess.run", side_effect=_run)
+    client = nmap_wrapper.NmapWrapper(
+        nmap_options.NmapOptions(
+            scripts=["https://example.com/first.nse"], scripts_cache=cache
+        )
+    )
+
+    client.scan_hosts(hosts="127.0.0.1", mask=32)
+
+    assert scripts_during_scan == [b"a" * 10]
+
+
+def testNmapWrapperIterScanHosts_whenNmapIsRunning_yieldsHostsBeforeItExits(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Hosts are yielded as soon as their closing tag is flushed, not when the process exits."""
+    fake_nmap = textwrap.dedent(
+        """
+        import sys, time
+        xml_output = open(sys.argv[1], "w")
+        xml_output.write('<?xml version="1.0"?><nmaprun>')
+        for index in range(3):
+            xml_output.write(f'<host><address addr="10.0.0.{index}" addrtype="ipv4"/></host>')
+            xml_output.flush()
+            time.sleep(0.3)
+        xml_output.write("</nmaprun>")
+        """
+    )
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.construct_command_host",
+        side_effect=lambda hosts, mask, scan_workspace: [
+            sys.executable,
+            "-c",
+            fake_nmap,
+            scan_workspace.xml_output_path,
+        ],
+    )
+    mocker.patch("agent.nmap_xml.TAIL_POLL_INTERVAL", 0.05)
+    client = nmap_wrapper.NmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    with workspace.ScanWorkspace() as scan_workspace:
+        started_at = time.monotonic()
+        hosts = client.iter_scan_hosts("10.0.0.0", 30, scan_workspace)
+        first_host = next(hosts)
+        first_host_delay = time.monotonic() - started_at
+        other_hosts = list(hosts)
+
+    assert first_host.address == "10.0.0.0"
+    assert first_host_delay < 0.6
+    assert [host.address for host in other_hosts] == [
+        "10.0.0.1",
+        "10.0.0.2",
+    ]
+
+
+def testNmapWrapperIterScanHosts_whenNmapFails_raisesCalledProcessError(
+    mocker: plugin.MockerFixture,
+) -> None:
+    mocker.patch(
+        "agent.nmap_wrapper.NmapWrapper.construct_command_host",
+        return_value=[sys.executable, "-c", "import sys; sys.exit(1)"],
+    )
+    client = nmap_wrapper.NmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    with workspace.ScanWorkspace() as scan_workspace:
+        with pytest.raises(subprocess.CalledProcessError):
+            list(client.iter_scan_hosts("10.0.0.0", 30, scan_workspace))
+
+
+def testNmapWrapperConstructCommandTargets_always_passesTargetsAsInputList() -> None:
+    client = nmap_wrapper.NmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    with workspace.ScanWorkspace() as scan_workspace:
+        command = client.construct_command_targets(
+            ["2001:db8::/126", "2001:db8::4/126"], scan_workspace
+        )
+        targets = pathlib.Path(scan_workspace.targets_path).read_text()
+        targets_path = scan_workspace.targets_path
+
+    assert command[-3:] == ["-6", "-iL", targets_path]
+    assert targets.splitlines() == ["2001:db8::/126", "2001:db8::4/126"]
+
+
+def testNmapWrapperConstructCommandTargets_whenIpVersionsAreMixed_raisesValueError() -> (
+    None
+):
+    client = nmap_wrapper.NmapWrapper(nmap_options.NmapOptions(scripts=None))
+
+    with workspace.ScanWorkspace() as scan_workspace:
+        with pytest.raises(ValueError):
+            client.construct_command_targets(
+                ["10.0.0.0/30", "2001:db8::/126"], scan_workspace
+            )
@@ -0,0 +1,63 @@
+"""Unittests for the incremental nmap XML parser."""
+
+import pathlib
+
+import pytest
+import xmltodict
+
+from agent import nmap_xml
+
+FIXTURES_PATH = pathlib.Path(__file__).parent
+
+
+@pytest.mark.parametrize(
+    "fixture_name",
+    [
+        "fake_output.xml",
+        "fake_output_range.xml",
+        "fake_output_crash_1.xml",
+        "fake_output_crash_2.xml",
+        "fake_output_with_down_host.xml",
+        "nmap_product_output.xml",
+    ],
+)
+def testIterHosts_always_yieldsSameHostsAsXmltodict(fixture_name: str) -> None:
+    xml_output_path = FIXTURES_PATH / fixture_name
+    expected_hosts = xmltodict.parse(xml_output_path.read_text())["nmaprun"].get(
+        "host", []
+    )
+    if isinstance(expected_hosts, dict):
+        expected_hosts = [expected_hosts]
+
+    hosts = list(nmap_xml.iter_hosts(str(xml_output_path)))
+
+    assert hosts == expected_hosts
+
+
+def testIterHosts_whenOutputIsTruncated_yieldsCompleteHostsOnly(
+    tmp_path: pathlib.Path,
+) -> None:
+    xml_output = (FIXTURES_PATH / "fake_output_range.xml").read_text()
+    third_host_offset = xml_output.index(
+        "<host starttime", xml_output.index("<host starttime", 2000) + 1
+    )
+    truncated_output = xml_output[:third_host_offset] + "<host><status"
+    xml_output_path = tmp_path / "xmloutput"
+    xml_output_path.write_text(truncated_output)
+
+    hosts = list(nmap_xml.iter_hosts(str(xml_output_path)))
+
+    assert len(hosts) == 2
+    assert all("address" in host for host in hosts) is True
+
+
+def testHostStreamParser_whenFedByteByByte_yieldsEachHostOnce() -> None:
+    xml_output = (FIXTURES_PATH / "fake_output_range.xml").read_bytes()
+    parser = nmap_xml.HostStreamParser()
+
+    hosts = []
+    for index in range(len(xml_output)):
+        hosts.extend(parser.feed(xml_output[index : index + 1]))
+    hosts.extend(parser.close())
+
+    assert len(hosts) == 32
@@ -0,0 +1,120 @@
+"""Unittests for the technical reports of the scans."""
+
+from agent import models
+from agent import nmap_normal
+from agent import process_scans
+
+NORMAL_OUTPUT = """# Nmap 7.94 scan initiated Mon Mar 28 15:05:11 2022 as: nmap -sV -oN normal 10.0.0.0/30
+Nmap scan report for 10.0.0.1
+Host is up (0.0061s latency).
+PORT   STATE SERVICE VERSION
+22/tcp open  ssh     OpenSSH 8.9
+
+Nmap scan report for router.example.com (10.0.0.2)
+Host is up (0.0042s latency).
+PORT   STATE SERVICE VERSION
+80/tcp open  http    nginx
+
+# Nmap done at Mon Mar 28 15:06:11 2022 -- 4 IP addresses (2 hosts up) scanned in 60.00 seconds
+"""
+
+
+def _host(address: str, port: int) -> models.Host:
+    return models.Host(
+        address=address,
+        addr_type="ipv4",
+        ports=(
+            models.Port(
+                port_id=str(port),
+                protocol="tcp",
+                state="open",
+                service=models.Service(name="http"),
+            ),
+        ),
+    )
+
+
+def testGetHostTechnicalDetails_whenOutputReportsManyHosts_keepsOnlyTheHostSection() -> (
+    None
+):
+    normal_output = nmap_normal.NormalOutput.from_text(NORMAL_OUTPUT)
+
+    technical_detail = process_scans.get_host_technical_details(
+        _host("10.0.0.2", 80), normal_output
+    )
+
+    assert "Nmap scan report for router.example.com (10.0.0.2)" in technical_detail
+    assert "80/tcp open  http    nginx" in technical_detail
+    assert "10.0.0.1" not in technical_detail
+    assert "# Nmap done" not in technical_detail
+
+
+def testGetHostTechnicalDetails_whenHostOutputIsTooLong_truncatesItAndPointsToTheWholeSection() -> (
+    None
+):
+    banner = "".join(f"|_  banner line {index}\n" for index in range(100))
+    normal_output = nmap_normal.NormalOutput.from_text(
+        NORMAL_OUTPUT.replace("OpenSSH 8.9\n", f"OpenSSH 8.9\n{banner}")
+    )
+    table = process_scans.get_technical_details(
+        models.ScanResult(hosts=(_host("10.0.0.1", 22),))
+    )
+
+    technical_detail = process_scans.get_host_technical_details(
+        _host("10.0.0.1", 22), normal_output, max_length=1000
+    )
+
+    assert len(technical_detail) == 1000
+    assert technical_detail.startswith(
+        f"{table}\n```xml\nNmap scan report for 10.0.0.1"
+    )
+    assert "banner line 99" not in technical_detail
+    assert technical_detail.endswith(
+        "```\nTruncated from 2130 to 1000 characters. The whole nmap output of 10.0.0.1 is at bytes 88 to 2101 of "
+        "the normal output (-oN) of the scan."
+    )
+    whole_section = normal_output.section("10.0.0.1") or ""
+    assert normal_output.sections["10.0.0.1"] == (88, 2101)
+    assert whole_section.endswith("banner line 99")
+
+
+def testGetHostTechnicalDetails_whenTableIsTooLong_keepsTheWholeReportWithinTheLimit() -> (
+    None
+):
+    host = models.Host(
+        address="10.0.0.1",
+        addr_type="ipv4",
+        ports=tuple(
+            models.Port(
+                port_id=str(port),
+                protocol="tcp",
+                state="open",
+                service=models.Service(name="http"),
+            )
+            for port in range(1, 1001)
+        ),
+    )
+    normal_output = nmap_normal.NormalOutput.from_text(NORMAL_OUTPUT)
+
+    technical_detail = process_scans.get_host_technical_details(
+        host, normal_output, max_length=1000
+    )
+
+    assert len(technical_detail) <= 1000
+    assert technical_detail.startswith("|Host|Version|Port|Protocol|State|Service|")
+    assert "```xml" not in technical_detail
+    rows = technical_detail.split("\n\nTruncated from")[0].splitlines()
+    assert rows[-1].endswith("|open|http|  ")
+    assert "bytes 88 to 211 of the normal output (-oN)" in technical_detail
+
+
+def testGetHostTechnicalDetails_whenHostIsNotReported_returnsTheServicesOnly() -> None:
+    normal_output = nmap_normal.NormalOutput.from_text(NORMAL_OUTPUT)
+
+    technical_detail = process_scans.get_host_technical_details(
+        _host("10.0.0.3", 443), normal_output
+    )
+
+    assert technical_detail == process_scans.get_technical_details(
+        models.ScanResult(hosts=(_host("10.0.0.3", 443),))
+    )
@@ -0,0 +1,135 @@
+"""Unittests for the scan results parser."""
+
+import sys
+import types
+from typing import Any, Callable, Optional
+
+from pytest_mock import plugin
+
+from agent import markdown
+from agent import models
+from agent import result_parser
+
+PORTS_PER_HOST = 4
+
+
+def _synthetic_scan_results(hosts_count: int) -> dict[str, Any]:
+    """Build scan results of `hosts_count` hosts, each exposing `PORTS_PER_HOST` ports with a product and banner."""
+    hosts = []
+    for index in range(hosts_count):
+        hosts.append(
+            {
+                "status": {"@state": "up"},
+                "address": {
+                    "@addr": f"10.{index // 65536}.{index // 256 % 256}.{index % 256}",
+                    "@addrtype": "ipv4",
+                },
+                "hostnames": None,
+                "ports": {
+                    "port": [
+                        {
+                            "@protocol": "tcp",
+                            "@portid": str(8000 + port),
+                            "state": {"@state": "open"},
+                            "service": {
+                                "@name": "http",
+                                "@product": "nginx",
+                                "@version": "1.25",
+                            },
+                            "script": {"@id": "banner", "@output": "nginx banner"},
+                        }
+                        for port in range(PORTS_PER_HOST)
+                    ]
+                },
+            }
+        )
+    return {"nmaprun": {"host": hosts}}
+
+
+def _synthetic_scan_result(hosts_count: int) -> models.ScanResult:
+    return models.ScanResult.from_dict(_synthetic_scan_results(hosts_count))
+
+
+def _executed_lines(
+    module: types.ModuleType, function: Callable[[Any], None], argument: Any
+) -> int:
+    """Number of lines of `module` executed by `function`, a measure of its work that does not depend on timing."""
+    executed = 0
+
+    def _trace(
+        frame: types.FrameType, event: str, arg: Any
+    ) -> Optional[Callable[..., Any]]:
+        nonlocal executed
+        if frame.f_code.co_filename != module.__file__:
+            return None
+        if event == "line":
+            executed += 1
+        return _trace
+
+    previous_trace = sys.gettrace()
+    sys.settrace(_trace)
+    try:
+        function(argument)
+    finally:
+        sys.settrace(previous_trace)
+    return executed
+
+
+def testGetPortServices_withManyHosts_attachesEachServiceToItsOwnHost() -> None:
+    scan_result = _synthetic_scan_result(3)
+
+    services = result_parser.get_port_services(scan_result)
+
+    assert len(services) == 3 * PORTS_PER_HOST
+    assert all(service["host"] == service["address"] for service in services) is True
+
+
+def testGetServiceLibraries_withManyHosts_attachesEachLibraryToItsOwnHost() -> None:
+    scan_result = _synthetic_scan_result(3)
+
+    libraries = result_parser.get_service_libraries(scan_result)
+
+    # One fingerprint for the product and one for the banner of every port.
+    assert len(libraries) == 3 * PORTS_PER_HOST * 2
+    assert [library["host"] for library in libraries[:: PORTS_PER_HOST * 2]] == [
+        "10.0.0.0",
+        "10.0.0.1",
+        "10.0.0.2",
+    ]
+
+
+def testExtractors_with4096Hosts_parseEachPortOnce(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Benchmark on synthetic 4096-host results: services, fingerprints and report rows share a single extraction."""
+    hosts_count = 4096
+    port_extraction = mocker.spy(models.Port, "from_dict")
+
+    scan_result = models.ScanResult.from_dict(_synthetic_scan_results(hosts_count))
+    services = result_parser.get_port_services(scan_result)
+    libraries = result_parser.get_service_libraries(scan_result)
+    os_fingerprints = result_parser.get_os_fingerprints(scan_result)
+    rows = markdown.prepare_data_for_markdown_formatting(scan_result)
+
+    assert len(services) == hosts_count * PORTS_PER_HOST
+    assert len(libraries) == hosts_count * PORTS_PER_HOST * 2
+    assert os_fingerprints == []
+    assert len(rows) == hosts_count * PORTS_PER_HOST
+    assert port_extraction.call_count == hosts_count * PORTS_PER_HOST
+
+
+def testExtractors_whenHostsQuadruple_workScalesLinearly() -> None:
+    """4096 hosts must execute about 4 times the extractor lines of 1024 hosts, the quadratic implementation ran 16
+    times as many."""
+    small_scan_result = models.ScanResult.from_dict(_synthetic_scan_results(1024))
+    large_scan_result = models.ScanResult.from_dict(_synthetic_scan_results(4096))
+
+    def _extract(scan_result: models.ScanResult) -> None:
+        result_parser.get_port_services(scan_result)
+        result_parser.get_service_libraries(scan_result)
+
+    small_work = _executed_lines(result_parser, _extract, small_scan_result)
+    large_work = _executed_lines(result_parser, _extract, large_scan_result)
+
+    assert small_work > 0
+    assert large_work <= 4 * small_work
@@ -0,0 +1,107 @@
+"""Unittests for the durable scan plans."""
+
+import ipaddress
+from typing import Dict, Union
+
+from agent import ip_coverage
+from agent import scan_plan
+
+
+class _Persist:
+    """In memory hash backend."""
+
+    def __init__(self) -> None:
+        self.hashes: Dict[Union[bytes, str], Dict[bytes, bytes]] = {}
+
+    def hash_add(
+        self,
+        hash_name: Union[bytes, str],
+        mapping: Dict[Union[bytes, str], Union[bytes, str]],
+    ) -> bool:
+        self.hashes.setdefault(hash_name, {}).update(
+            {
+                key if isinstance(key, bytes) else key.encode(): value
+                if isinstance(value, bytes)
+                else value.encode()
+                for key, value in mapping.items()
+            }
+        )
+        return True
+
+    def hash_get_all(self, hash_name: Union[bytes, str]) -> Dict[bytes, bytes]:
+        return dict(self.hashes.get(hash_name, {}))
+
+    def delete(self, key: Union[bytes, str]) -> bool:
+        return self.hashes.pop(key, None) is not None
+
+
+def testScanPlanLoad_whenScanWasInterrupted_returnsUnfinishedSubnets() -> None:
+    persist = _Persist()
+    network = ipaddress.ip_network("10.0.0.0/24")
+    plan = scan_plan.ScanPlan.create(
+        persist,
+        network,
+        scan_plan.PlanKind.SPLIT,
+        [("10.0.0.0", 26), ("10.0.0.64", 26), ("10.0.0.128", 26), ("10.0.0.192", 26)],
+    )
+    batches = plan.track(iter([[("10.0.0.0", 26)], [("10.0.0.64", 26)]]))
+    plan.mark(next(batches), scan_plan.SubnetState.DONE)
+    next(batches)
+
+    resumed_plan = scan_plan.ScanPlan.load(persist, network)
+
+    assert resumed_plan is not None
+    assert resumed_plan.kind is scan_plan.PlanKind.SPLIT
+    assert resumed_plan.unfinished_subnets() == [
+        ("10.0.0.64", 26),
+        ("10.0.0.128", 26),
+        ("10.0.0.192", 26),
+    ]
+
+
+def testScanPlanUnfinishedNetworks_withAdaptivePlan_coversTheSpaceNotScanned() -> None:
+    persist = _Persist()
+    network = ipaddress.ip_network("10.0.0.0/24")
+    plan = scan_plan.ScanPlan.create(persist, network, scan_plan.PlanKind.ADAPTIVE)
+    plan.mark([("10.0.0.0", 26)], scan_plan.SubnetState.DONE)
+    plan.mark([("10.0.0.64", 27)], scan_plan.SubnetState.RUNNING)
+
+    resumed_plan = scan_plan.ScanPlan.load(persist, network)
+
+    assert resumed_plan is not None
+    assert resumed_plan.unfinished_networks() == [
+        ipaddress.ip_network("10.0.0.64/27"),
+        ipaddress.ip_network("10.0.0.96/27"),
+        ipaddress.ip_network("10.0.0.128/25"),
+    ]
+
+
+def testScanPlanUnfinishedNetworks_whenSpaceWasCoveredBefore_onlyKeepsInterruptedAndUncoveredSpace() -> (
+    None
+):
+    persist = _Persist()
+    network = ipaddress.ip_network("10.0.0.0/24")
+    plan = scan_plan.ScanPlan.create(persist, network, scan_plan.PlanKind.ADAPTIVE)
+    plan.mark([("10.0.0.0", 26)], scan_plan.SubnetState.RUNNING)
+    # Covered before the plan was created, and the interrupted subnet marked covered when handed to a worker.
+    coverage = ip_coverage.CoverageIndex.from_members(["10.0.0.128/25", "10.0.0.0/26"])
+
+    resumed_plan = scan_plan.ScanPlan.load(persist, network)
+
+    assert resumed_plan is not None
+    assert resumed_plan.unfinished_networks(coverage) == [
+        ipaddress.ip_network("10.0.0.0/26"),
+        ipaddress.ip_network("10.0.0.64/26"),
+    ]
+
+
+def testScanPlanDelete_whenScanCompleted_forgetsThePlan() -> None:
+    persist = _Persist()
+    network = ipaddress.ip_network("10.0.0.0/24")
+    plan = scan_plan.ScanPlan.create(
+        persist, network, scan_plan.PlanKind.SPLIT, [("10.0.0.0", 24)]
+    )
+
+    plan.delete()
+
+    assert scan_plan.ScanPlan.load(persist, network) is None
@@ -0,0 +1,159 @@
+"""Unittests for the scan scheduler."""
+
+import threading
+import time
+from typing import Iterator, List
+
+import pytest
+
+from agent import scheduler
+
+
+def testScanScheduler_whenManyTargets_neverExceedsMaxWorkers() -> None:
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def _scan(target: int) -> int:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return target * 2
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=3)
+
+    results = {
+        target: future.result()
+        for target, future in scan_scheduler.run(_scan, range(20))
+    }
+
+    assert results == {target: target * 2 for target in range(20)}
+    assert peak == 3
+
+
+def testScanScheduler_whenScanFails_errorIsRaisedOnResult() -> None:
+    def _scan(target: int) -> int:
+        if target == 1:
+            raise RuntimeError("scan failed")
+        return target
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=2)
+
+    outcomes = dict(scan_scheduler.run(_scan, [0, 1, 2]))
+
+    assert outcomes[0].result() == 0
+    assert outcomes[2].result() == 2
+    with pytest.raises(RuntimeError):
+        outcomes[1].result()
+
+
+def testScanScheduler_whenMaxWorkersIsZero_raisesValueError() -> None:
+    with pytest.raises(ValueError):
+        scheduler.ScanScheduler(max_workers=0)
+
+
+def testScanSchedulerStream_whenScansProduceItems_yieldsThemWhileScansRun() -> None:
+    release = threading.Event()
+
+    def _scan(target: int) -> Iterator[int]:
+        yield target
+        release.wait(timeout=5)
+        yield target + 100
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=2)
+    stream = scan_scheduler.stream(_scan, [1, 2])
+
+    first_items = {next(stream)[1], next(stream)[1]}
+    release.set()
+    remaining_items = {item for _, item in stream}
+
+    assert first_items == {1, 2}
+    assert remaining_items == {101, 102}
+
+
+def testScanSchedulerStream_whenScanFails_raisesAfterItsItems() -> None:
+    def _scan(target: int) -> Iterator[int]:
+        yield target
+        raise RuntimeError("scan failed")
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=1)
+    items = []
+
+    with pytest.raises(RuntimeError):
+        for _, item in scan_scheduler.stream(_scan, [1]):
+            items.append(item)
+
+    assert items == [1]
+
+
+def testScanSchedulerStream_whenConsumerStops_closesRunningScans() -> None:
+    closed = threading.Event()
+
+    def _scan(target: int) -> Iterator[int]:
+        try:
+            while True:
+                yield target
+        finally:
+            closed.set()
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=1)
+    stream = scan_scheduler.stream(_scan, [1])
+    next(stream)
+    stream.close()
+
+    assert closed.wait(timeout=5) is True
+
+
+def testScanSchedulerStream_whenScanFailsBeforeProducingItems_raisesItsError() -> None:
+    def _scan(target: int) -> Iterator[int]:
+        raise RuntimeError(f"scan of {target} failed")
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=1)
+    errors: List[BaseException] = []
+
+    def _consume() -> None:
+        try:
+            list(scan_scheduler.stream(_scan, [1]))
+        except RuntimeError as e:
+            errors.append(e)
+
+    # Consumed on a daemon thread, so a stream waiting forever fails the test instead of hanging it.
+    consumer = threading.Thread(target=_consume, daemon=True)
+    consumer.start()
+    consumer.join(timeout=5)
+
+    assert [str(error) for error in errors] == ["scan of 1 failed"]
+
+
+def testScanSchedulerStream_whenConsumerStops_closesBufferedItems() -> None:
+    class _Item:
+        def __init__(self) -> None:
+            self.closed = False
+
+        def close(self) -> None:
+            self.closed = True
+
+    produced: List[_Item] = []
+    scan_completed = threading.Event()
+
+    def _scan(target: int) -> Iterator[_Item]:
+        for _ in range(scheduler.STREAM_BUFFER_SIZE + 2):
+            produced.append(_Item())
+            yield produced[-1]
+        scan_completed.set()
+
+    scan_scheduler = scheduler.ScanScheduler(max_workers=1)
+    stream = scan_scheduler.stream(_scan, [1])
+    _, consumed_item = next(stream)
+    # The buffer holds all the items but the consumed one and the one the scan is blocked on.
+    while len(produced) < scheduler.STREAM_BUFFER_SIZE + 2:
+        time.sleep(0.01)
+    stream.close()
+
+    assert consumed_item.closed is False
+    assert all(item.closed for item in produced[1:]) is True
+    assert scan_completed.is_set() is False
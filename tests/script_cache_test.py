@@ -0,0 +1,175 @@
+"""Unittests for the NSE scripts cache."""
+
+import os
+import pathlib
+import threading
+from typing import Any, List
+
+import pytest
+import requests
+import requests_mock as rq_mock
+from pytest_mock import plugin
+
+from agent import script_cache
+
+SCRIPT_URL = "https://raw.githubusercontent.com/nmap-scripts/main/test1"
+OTHER_SCRIPT_URL = "https://raw.githubusercontent.com/nmap-scripts/main/test2"
+THIRD_SCRIPT_URL = "https://raw.githubusercontent.com/nmap-scripts/main/test3"
+
+
+def testScriptCacheGet_whenCalledRepeatedly_downloadsScriptOnce(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(SCRIPT_URL, content=b"script content")
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path))
+
+    paths = {cache.get(SCRIPT_URL) for _ in range(1024)}
+
+    assert requests_mock.call_count == 1
+    assert len(paths) == 1
+    assert pathlib.Path(paths.pop()).read_bytes() == b"script content"
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def testScriptCacheGet_whenUrlsServeSameContent_storesItOnce(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(SCRIPT_URL, content=b"script content")
+    requests_mock.get(OTHER_SCRIPT_URL, content=b"script content")
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path))
+
+    assert cache.get(SCRIPT_URL) == cache.get(OTHER_SCRIPT_URL)
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def testScriptCacheGet_whenExpiredAndNotModified_revalidatesWithEtag(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(
+        SCRIPT_URL,
+        [
+            {"content": b"script content", "headers": {"ETag": '"v1"'}},
+            {"status_code": 304},
+        ],
+    )
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path), ttl=0)
+
+    first_path = cache.get(SCRIPT_URL)
+    second_path = cache.get(SCRIPT_URL)
+
+    assert requests_mock.call_count == 2
+    assert requests_mock.request_history[1].headers["If-None-Match"] == '"v1"'
+    assert second_path == first_path
+    assert pathlib.Path(second_path).read_bytes() == b"script content"
+
+
+def testScriptCacheGet_whenMaxSizeExceeded_evictsLeastRecentlyUsedScript(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(SCRIPT_URL, content=b"a" * 10)
+    requests_mock.get(OTHER_SCRIPT_URL, content=b"b" * 10)
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path), max_size=15)
+
+    first_path = cache.get(SCRIPT_URL)
+    second_path = cache.get(OTHER_SCRIPT_URL)
+
+    assert os.path.exists(first_path) is False
+    assert os.path.exists(second_path) is True
+
+
+def testScriptCacheGet_whenDownloadFailsWithoutCopy_raisesScriptDownloadError(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(SCRIPT_URL, status_code=404)
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path))
+
+    with pytest.raises(script_cache.ScriptDownloadError):
+        cache.get(SCRIPT_URL)
+
+
+def testScriptCacheGet_whenRevalidationFails_returnsStaleCopy(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(
+        SCRIPT_URL,
+        [
+            {"content": b"script content"},
+            {"exc": requests.exceptions.ConnectTimeout},
+        ],
+    )
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path), ttl=0)
+
+    first_path = cache.get(SCRIPT_URL)
+
+    assert cache.get(SCRIPT_URL) == first_path
+
+
+def testScriptCacheGet_whenADownloadIsSlow_servesOtherUrlsWithoutWaiting(
+    tmp_path: pathlib.Path, mocker: plugin.MockerFixture
+) -> None:
+    slow_download_started = threading.Event()
+    release_slow_download = threading.Event()
+
+    def _get(url: str, **kwargs: Any) -> requests.Response:
+        if url == SCRIPT_URL:
+            slow_download_started.set()
+            release_slow_download.wait(timeout=10)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = url.encode()
+        return response
+
+    requests_get_mock = mocker.patch("requests.get", side_effect=_get)
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path))
+    slow_paths: List[str] = []
+    slow_gets = [
+        threading.Thread(target=lambda: slow_paths.append(cache.get(SCRIPT_URL)))
+        for _ in range(4)
+    ]
+    for slow_get in slow_gets:
+        slow_get.start()
+    slow_download_started.wait(timeout=10)
+
+    other_path = cache.get(OTHER_SCRIPT_URL)
+    slow_download_was_pending = release_slow_download.is_set() is False
+    release_slow_download.set()
+    for slow_get in slow_gets:
+        slow_get.join()
+
+    assert slow_download_was_pending is True
+    assert pathlib.Path(other_path).read_bytes() == OTHER_SCRIPT_URL.encode()
+    assert len(set(slow_paths)) == 1
+    assert requests_get_mock.call_count == 2
+
+
+def testScriptCacheCheckout_whenMaxSizeExceeded_keepsCheckedOutScriptUntilReleased(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(SCRIPT_URL, content=b"a" * 10)
+    requests_mock.get(OTHER_SCRIPT_URL, content=b"b" * 10)
+    requests_mock.get(THIRD_SCRIPT_URL, content=b"c" * 5)
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path), max_size=15)
+
+    with cache.checkout(SCRIPT_URL) as checked_out_path:
+        second_path = cache.get(OTHER_SCRIPT_URL)
+        checked_out_script_kept = os.path.exists(checked_out_path)
+    cache.get(THIRD_SCRIPT_URL)
+
+    assert checked_out_script_kept is True
+    assert os.path.exists(second_path) is True
+    assert os.path.exists(checked_out_path) is False
+
+
+def testScriptCacheCheckout_whenScriptChangesWhileCheckedOut_removesOldCopyOnRelease(
+    tmp_path: pathlib.Path, requests_mock: rq_mock.mocker.Mocker
+) -> None:
+    requests_mock.get(SCRIPT_URL, [{"content": b"v1"}, {"content": b"v2"}])
+    cache = script_cache.ScriptCache(cache_dir=str(tmp_path), ttl=0)
+
+    with cache.checkout(SCRIPT_URL) as old_path:
+        new_path = cache.get(SCRIPT_URL)
+        old_script_kept = pathlib.Path(old_path).read_bytes()
+
+    assert old_script_kept == b"v1"
+    assert pathlib.Path(new_path).read_bytes() == b"v2"
+    assert os.listdir(tmp_path) == [os.path.basename(new_path)]
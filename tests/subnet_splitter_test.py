@@ -0,0 +1,87 @@
+"""Unittests for the adaptive subnet splitter."""
+
+import ipaddress
+from typing import Iterator, List, Tuple
+
+import pytest
+from pytest_mock import plugin
+
+from agent import subnet_splitter
+
+
+class _Clock:
+    """Monotonic clock advanced by the tests."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(mocker: plugin.MockerFixture) -> Iterator[_Clock]:
+    clock = _Clock()
+    mocker.patch.object(subnet_splitter, "time", clock)
+    yield clock
+
+
+def _scan(
+    splitter: subnet_splitter.AdaptiveSplitter,
+    clock: _Clock,
+    duration: float,
+    live_hosts: int,
+) -> List[Tuple[str, int]]:
+    """Scan every chunk, each one taking `duration` seconds and finding `live_hosts` hosts up."""
+    chunks = []
+    for chunk in splitter:
+        clock.now += duration
+        splitter.record([chunk], live_hosts=live_hosts)
+        chunks.append(chunk)
+    return chunks
+
+
+def testAdaptiveSplitter_withoutObservations_splitsAtMaxPrefix() -> None:
+    splitter = subnet_splitter.AdaptiveSplitter(
+        [ipaddress.ip_network("10.0.0.0/24")], max_prefix=26
+    )
+
+    assert next(iter(splitter)) == ("10.0.0.0", 26)
+
+
+def testAdaptiveSplitter_whenRangeIsSparse_growsChunks(
+    clock: _Clock,
+) -> None:
+    splitter = subnet_splitter.AdaptiveSplitter(
+        [ipaddress.ip_network("10.0.0.0/16")], max_prefix=26, target_duration=300
+    )
+
+    chunks = _scan(splitter, clock, duration=10, live_hosts=0)
+
+    # Chunks double at each step, as large as allowed by their alignment.
+    assert [mask for _, mask in chunks] == [26, 26, 25, 24, 23, 22, 21, 20, 19, 18, 17]
+
+
+def testAdaptiveSplitter_whenRangeIsDense_keepsSmallChunks(clock: _Clock) -> None:
+    splitter = subnet_splitter.AdaptiveSplitter(
+        [ipaddress.ip_network("10.0.0.0/22")], max_prefix=26, target_duration=300
+    )
+
+    chunks = _scan(splitter, clock, duration=600, live_hosts=64)
+
+    assert all(mask == 26 for _, mask in chunks) is True
+    assert len(chunks) == 16
+
+
+def testAdaptiveSplitter_whenChunksGrow_coversTheNetworkWithAlignedChunks(
+    clock: _Clock,
+) -> None:
+    network = ipaddress.ip_network("10.0.0.0/20")
+    splitter = subnet_splitter.AdaptiveSplitter(
+        [network], max_prefix=28, target_duration=300
+    )
+
+    chunks = _scan(splitter, clock, duration=1, live_hosts=1)
+
+    subnets = [ipaddress.ip_network(f"{host}/{mask}") for host, mask in chunks]
+    assert sorted(address for subnet in subnets for address in subnet) == list(network)